@@ -20,7 +20,6 @@
 from contextlib import suppress
 import wx
 import globalPluginHandler
-import appModuleHandler
 import scriptHandler
 import NVDAObjects
 import gui
@@ -28,10 +27,15 @@ import speech
 import controlTypes
 import globalCommands
 import eventHandler
+import ui
+import config
+from config import post_configSave, post_configReset, post_configProfileSwitch
+from logHandler import log
 
 from .handler import AudioThemesHandler, SpecialProps
-from .settings import AudioThemesSettingsPanel
-from .studio import AudioThemesStudioStartupDialog
+from .scheduler import EventSource, OrderCache
+from .navigator import NavigatorTracker
+from .unspoken.latency import tracker as latency
 
 import api
 
@@ -39,18 +43,33 @@ import addonHandler
 addonHandler.initTranslation()
 
 
+class AudioThemesSettingsPanelProxy(gui.settingsDialogs.SettingsPanel):
+    """Stands in for AudioThemesSettingsPanel in NVDA's settings dialog.
+
+    The settings module is only imported when the panel is first shown.
+    """
+
+    # Translators: Title for the settings panel in NVDA's multi-category settings
+    title = _("Audio Themes")
+
+    def __new__(cls, *args, **kwargs):
+        from .settings import AudioThemesSettingsPanel
+
+        return AudioThemesSettingsPanel(*args, **kwargs)
+
+
 class GlobalPlugin(globalPluginHandler.GlobalPlugin):
 
-    browser_apps = ["firefox", "iexplore", "chrome", "opera", "edge"]
+    browser_apps = frozenset(["firefox", "iexplore", "chrome", "opera", "edge"])
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.handler = AudioThemesHandler()
         gui.settingsDialogs.NVDASettingsDialog.categoryClasses.append(
-            AudioThemesSettingsPanel
+            AudioThemesSettingsPanelProxy
         )
         self._previous_mouse_object = None
-        self._last_navigator_object = None
+        self.order_cache = OrderCache()
         # Add the menu item for the audio themes studio
         self.studioMenuItem = gui.mainFrame.sysTrayIcon.menu.Insert(
             2,
@@ -61,86 +80,130 @@ class GlobalPlugin(globalPluginHandler.GlobalPlugin):
         gui.mainFrame.sysTrayIcon.Bind(
             wx.EVT_MENU, self.on_studio_item_clicked, self.studioMenuItem
         )
-        self._navigation_timer = wx.Timer()
-        self._navigation_timer.Bind(wx.EVT_TIMER, self._onNavigationTimer)
-        self._navigation_timer.Start(100)  # Check every 100ms
+        self.navigator_tracker = NavigatorTracker(self._onNavigatorChanged)
+        self._onConfigChanged()
+        for action in (post_configSave, post_configReset, post_configProfileSwitch):
+            action.register(self._onConfigChanged)
+        focus = api.getFocusObject()
+        if focus is not None:
+            self.navigator_tracker.track_focus(focus)
+        foreground = api.getForegroundObject()
+        if foreground is not None:
+            self.handler.apps.set_foreground(foreground)
+        self.handler.startup_timer.end_inline()
 
     def terminate(self):
         with suppress(Exception):
+            for action in (post_configSave, post_configReset, post_configProfileSwitch):
+                action.unregister(self._onConfigChanged)
+            self.navigator_tracker.terminate()
             gui.settingsDialogs.NVDASettingsDialog.categoryClasses.remove(
-                AudioThemesSettingsPanel
+                AudioThemesSettingsPanelProxy
             )
             gui.mainFrame.sysTrayIcon.menu.RemoveItem(self.studioMenuItem)
             self.handler.close()
-            self._navigation_timer.Stop()
-
-    def _onNavigationTimer(self, event):
-        try:
-            current_nav = api.getNavigatorObject()
-            # Check if treeInterceptor is not None, then check its passThrough property.
-            if current_nav.treeInterceptor and not current_nav.treeInterceptor.passThrough:
-                if current_nav and current_nav != self._last_navigator_object:
-                    self._last_navigator_object = current_nav
-                    self.playObject(current_nav)
-        except:
-            pass
+
+    def _onConfigChanged(self, *args, **kwargs):
+        self.navigator_tracker.active_interval = (
+            config.conf["audiothemes"]["navigator_poll_interval"] / 1000.0
+        )
+
+    def _onNavigatorChanged(self, obj):
+        latency.begin()
+        self.playObject(obj, EventSource.timer)
 
     def on_studio_item_clicked(self, event):
+        from .studio import AudioThemesStudioStartupDialog
+
         # Translators: title for the audio themes studio dialog
         with AudioThemesStudioStartupDialog(self, _("Audio Themes Studio")) as dlg:
             dlg.ShowModal()
 
     def script_speakObject(self, gesture):
+        latency.begin()
         if scriptHandler.getLastScriptRepeatCount() == 0:
-            self.playObject(NVDAObjects.api.getFocusObject())
+            self.playObject(NVDAObjects.api.getFocusObject(), EventSource.focus)
         globalCommands.commands.script_reportCurrentFocus(gesture)
 
     script_speakObject.__doc__ = (
         globalCommands.GlobalCommands.script_reportCurrentFocus.__doc__
     )
 
+    def event_foreground(self, obj, nextHandler):
+        self.handler.apps.set_foreground(obj)
+        nextHandler()
+
     def event_gainFocus(self, obj, nextHandler):
+        latency.begin()
+        self.navigator_tracker.track_focus(obj)
         # Prevent firing when browse mode is active.
         # Check if treeInterceptor is not None, then check its passThrough property.
         if not (obj.treeInterceptor and not obj.treeInterceptor.passThrough):
-            self.playObject(obj)
+            self.playObject(obj, EventSource.focus)
         nextHandler()
 
     def event_becomeNavigatorObject(self, obj, nextHandler, isFocus=False):
+        latency.begin()
         # Prevent firing when browse mode is active.
         # Check if treeInterceptor is not None, then check its passThrough property.
         if not (obj.treeInterceptor and not obj.treeInterceptor.passThrough):
-            self.playObject(obj)
+            self.playObject(obj, EventSource.focus if isFocus else EventSource.navigator)
         nextHandler()
 
     def event_mouseMove(self, obj, nextHandler, x, y):
+        latency.begin()
         if obj is not self._previous_mouse_object:
             self._previous_mouse_object = obj
-            self.playObject(obj)
+            self.playObject(obj, EventSource.mouse)
         nextHandler()
 
     def event_show(self, obj, nextHandler):
+        latency.begin()
         if obj.role == controlTypes.ROLE_HELPBALLOON:
             obj.snd = SpecialProps.notify
-            self.playObject(obj)
+            self.playObject(obj, EventSource.notification)
         nextHandler()
 
     def event_documentLoadComplete(self, obj, nextHandler):
-        if appModuleHandler.getAppNameFromProcessID(obj.processID) in self.browser_apps:
-            self.playObject(obj)
+        latency.begin()
+        if self.handler.apps.name_for_process(obj.processID) in self.browser_apps:
+            self.playObject(obj, EventSource.focus)
         nextHandler()
 
-    def playObject(self, obj):
-        order = self.getOrder(obj)
+    def playObject(self, obj, source=EventSource.focus):
+        if not self.handler.startup.ready:
+            self.handler.startup.hold(self.playObject, obj, source)
+            return
+        resolution = self.handler.resolution
+        if not resolution.sounds or not self.handler.enabled:
+            return
+        if not self.handler.scheduler.request(obj, source):
+            return
+        latency.mark("event")
         if getattr(obj, "snd", None) is None:
-            if 16384 in obj.states:
-                obj.snd = SpecialProps.protected
-            elif order:
-                obj.snd = order
-            else:
-                obj.snd = obj.role
+            sound = self.resolveSound(obj, resolution)
+            if sound is None:
+                return
+            obj.snd = sound
+        latency.mark("resolve")
         self.handler.play(obj, obj.snd)
 
+    def resolveSound(self, obj, resolution):
+        """Return the sound of the active theme for obj, or None if the theme has none.
+
+        Properties are only read when the theme has a sound they could lead to.
+        """
+        role = obj.role
+        if not resolution.special:
+            return role if role in resolution.sounds else None
+        if resolution.protected and 16384 in obj.states:
+            return SpecialProps.protected
+        if resolution.ordered:
+            order = self.order_cache.get(obj, self.getOrder)
+            if order in resolution.sounds:
+                return order
+        return role if role in resolution.sounds else None
+
     def getOrder(self, obj, parrole=14, chrole=15):
         if obj.parent and obj.parent.role != parrole:
             return None
@@ -149,6 +212,25 @@ class GlobalPlugin(globalPluginHandler.GlobalPlugin):
         elif (obj.next is None) or (obj.next.role != chrole):
             return SpecialProps.last
 
+    def script_logLatencySummary(self, gesture):
+        if scriptHandler.getLastScriptRepeatCount() > 0:
+            if self.handler.toggle_latency_instrumentation():
+                # Translators: message announced when audio themes latency instrumentation is turned on
+                ui.message(_("Audio themes latency instrumentation on"))
+            else:
+                # Translators: message announced when audio themes latency instrumentation is turned off
+                ui.message(_("Audio themes latency instrumentation off"))
+            return
+        log.info("Audio themes latency summary:\n" + self.handler.latency_summary_text())
+        # Translators: message announced after the audio themes latency summary was written to the log
+        ui.message(_("Latency summary written to the log"))
+
+    # Translators: description of the script that writes the audio themes latency summary to the log
+    script_logLatencySummary.__doc__ = _(
+        "Writes a summary of audio themes latency to the log. Press twice to turn latency instrumentation on or off"
+    )
+
     __gestures = {
         "kb:nvda+tab": "speakObject",
+        "kb:nvda+shift+control+l": "logLatencySummary",
     }
\ No newline at end of file
@@ -0,0 +1,134 @@
+# coding: utf-8
+
+# This file is covered by the GNU General Public License.
+
+import appModuleHandler
+from logHandler import log
+
+# Per-application settings, and how to parse their values
+OVERRIDE_FIELDS = {
+    "volume": lambda value: min(max(int(value), 0), 100),
+    "audio3d": lambda value: _parse_bool(value),
+    "reverb": lambda value: _parse_bool(value),
+}
+
+
+def _parse_bool(value):
+    value = value.lower()
+    if value in ("on", "true", "yes", "1"):
+        return True
+    if value in ("off", "false", "no", "0"):
+        return False
+    raise ValueError(value)
+
+
+def parse_app_list(text):
+    """Parse a comma separated list of application names."""
+    return frozenset(app.strip() for app in text.split(",") if app.strip())
+
+
+def parse_app_overrides(text):
+    """Parse per-application settings into {app: {setting: value}}.
+
+    Entries are separated by semicolons, and look like "winword: volume=40 audio3d=off".
+    Malformed settings are logged and skipped.
+    """
+    overrides = {}
+    for entry in text.split(";"):
+        app, sep, settings = entry.partition(":")
+        app = app.strip()
+        if not sep or not app:
+            if entry.strip():
+                log.warning(f"Ignoring audio themes application override {entry.strip()!r}")
+            continue
+        values = {}
+        for setting in settings.split():
+            name, sep, value = setting.partition("=")
+            try:
+                values[name] = OVERRIDE_FIELDS[name](value)
+            except (KeyError, ValueError):
+                log.warning(f"Ignoring audio themes setting {setting!r} for {app}")
+        if values:
+            overrides.setdefault(app, {}).update(values)
+    return overrides
+
+
+class AppPolicy:
+    """Settings for the sounds played while each application is in the foreground.
+
+    Disabled applications and the snapshots for applications with overrides are kept in one
+    dict, so checking the foreground application is a single lookup.
+    """
+
+    def __init__(self, disabled_apps=frozenset(), overrides=None):
+        self.disabled_apps = frozenset(disabled_apps)
+        self.overrides = dict(overrides or {})
+        self._default = None
+        self._by_app = {}
+
+    def bind(self, settings):
+        """Derive the per-application snapshots from the player's PlayerSettings."""
+        self._default = settings
+        by_app = {}
+        for app, values in self.overrides.items():
+            if "volume" in values:
+                # A fixed volume for the application, whatever the synth's volume is
+                values = dict(values, use_synth_volume=False)
+            by_app[app] = settings.replace(**values)
+        for app in self.disabled_apps:
+            by_app[app] = None
+        self._by_app = by_app
+
+    def settings_for(self, app):
+        """Return the settings to play sounds with for app, or None if it plays no sounds."""
+        return self._by_app.get(app, self._default)
+
+
+class AppNameCache:
+    """Application names by process ID, and the name of the foreground application.
+
+    An entry is valid as long as NVDA keeps the same app module for its process: once the
+    process exits, or its ID is reused, the name is looked up again. The foreground
+    application is updated by the plugin's foreground event handler.
+    """
+
+    def __init__(self):
+        # processID: (app module, name)
+        self._names = {}
+        self._foreground_window = None
+        self.foreground_app = None
+
+    def name_for_process(self, processID):
+        app_module = appModuleHandler.runningTable.get(processID)
+        entry = self._names.get(processID)
+        if entry is not None and entry[0] is app_module:
+            return entry[1]
+        if app_module is not None:
+            name = app_module.appName
+        else:
+            name = appModuleHandler.getAppNameFromProcessID(processID)
+        self._names[processID] = (app_module, name)
+        return name
+
+    def set_foreground(self, obj):
+        window = getattr(obj, "windowHandle", None)
+        if window is not None and window == self._foreground_window:
+            return
+        self._foreground_window = window
+        self.prune()
+        try:
+            self.foreground_app = self.name_for_process(obj.processID)
+        except Exception:
+            log.debugWarning("Could not get the foreground application", exc_info=True)
+            self.foreground_app = None
+
+    def prune(self):
+        """Forget the processes NVDA no longer has an app module for."""
+        running = appModuleHandler.runningTable
+        for processID in [pid for pid in self._names if pid not in running]:
+            del self._names[processID]
+
+    def clear(self):
+        self._names.clear()
+        self._foreground_window = None
+        self.foreground_app = None
@@ -4,32 +4,48 @@
 # This file is covered by the GNU General Public License.
 
 from enum import IntEnum
-from collections import OrderedDict
-from dataclasses import dataclass, field, asdict
+from collections import OrderedDict, Counter
+from dataclasses import dataclass, field, fields
 from zipfile import ZipFile, ZIP_DEFLATED
 from uuid import uuid4
 import os
+import threading
 import ctypes
 import shutil
 import copy
 import json
 import config
 import controlTypes
+import core
 import extensionPoints
 from config import post_configSave, post_configReset, post_configProfileSwitch
-from .unspoken import UnspokenPlayer
+from .unspoken import UnspokenPlayer, FOCUS_GROUP, NOTIFICATION_GROUP, unspoken_config_defaults
+from .unspoken.player_settings import PlayerSettings
+from .unspoken.prerender import PrerenderWorker
+from .unspoken.pcm_cache import PCMCache
+from .unspoken.sound_bank import SoundBank
+from .unspoken.latency import tracker as latency
+from .scheduler import EventScheduler
+from .startup import StartupGate, StartupTimer
+from .apps import AppNameCache, AppPolicy, parse_app_list, parse_app_overrides
 import globalVars
+from logHandler import log
 
 import NVDAObjects
 
 import speech
-from speech.sayAll import SayAllHandler
 
 import addonHandler
 addonHandler.initTranslation()
 
 THEMES_DIR = os.path.join(globalVars.appArgs.configPath, "audio-themes")
 INFO_FILE_NAME = "info.json"
+# How often each sound was played, kept across sessions to prioritize pre-rendering
+ROLE_USAGE_FILE = os.path.join(THEMES_DIR, "role-usage.json")
+# Decoded theme sounds, memory-mapped instead of decoding the files on every theme load
+PCM_CACHE_DIR = os.path.join(THEMES_DIR, ".pcm-cache")
+# Seconds close waits for the startup thread before leaving it to finish on its own
+STARTUP_JOIN_TIMEOUT = 2.0
 SUPPORTED_FILE_TYPES = OrderedDict()
 # Translators: The file type to be shown in a dialog used to browse for audio files.
 SUPPORTED_FILE_TYPES["ogg"] = _("Ogg audio files")
@@ -49,7 +65,23 @@ audiothemes_config_defaults = {
     "volume": "integer(default=100)",
     "migrated_to_named_files": "boolean(default=False)",
     "disabled_apps": "string(default='')",
+    "app_overrides": "string(default='')",
     "default_theme_deleted": "boolean(default=False)",
+    "prerender": "boolean(default=False)",
+    "prerender_azimuth_step": "integer(default=15, min=5, max=90)",
+    "prerender_elevation_step": "integer(default=10, min=5, max=90)",
+    "prerender_memory": "integer(default=8, min=1, max=256)",
+    "latency_instrumentation": "boolean(default=False)",
+    "event_coalesce_window": "integer(default=100, min=0, max=1000)",
+    "navigator_poll_interval": "integer(default=100, min=20, max=1000)",
+    # Megabytes of decoded sounds kept on disk, 0 to decode theme files on every load
+    "pcm_cache_size": "integer(default=64, min=0, max=1024)",
+    # What happens to sounds requested while the add-on is starting, see StartupGate
+    "startup_plays": 'option("queue", "drop", default="queue")',
+    # Decode each sound when it is first played instead of when the theme loads
+    "lazy_sounds": "boolean(default=True)",
+    # Megabytes of decoded sounds kept in memory while decoding on first play
+    "sound_memory": "integer(default=16, min=1, max=512)",
 }
 
 
@@ -90,6 +122,25 @@ for member in SpecialProps:
 role_name_to_int = {v: k for k, v in role_int_to_name.items()}
 
 
+class ResolutionTable:
+    """The sounds a theme provides, to resolve objects to sounds with as few property reads as possible.
+
+    Special sounds the theme does not provide fall back to the object's role.
+    """
+
+    __slots__ = ("sounds", "protected", "ordered")
+
+    def __init__(self, sounds=()):
+        self.sounds = frozenset(sounds)
+        self.protected = SpecialProps.protected in self.sounds
+        # Whether finding first and last items, and walking siblings for it, is worth it
+        self.ordered = SpecialProps.first in self.sounds or SpecialProps.last in self.sounds
+
+    @property
+    def special(self):
+        return self.protected or self.ordered
+
+
 @dataclass(order=True)
 class AudioTheme:
     name: str
@@ -97,7 +148,7 @@ class AudioTheme:
     author: str
     summary: str
     is_active: bool = False
-    sounds: dict = field(default_factory=dict)
+    sounds: SoundBank = field(default_factory=SoundBank)
 
     @property
     def info_file_path(self):
@@ -111,21 +162,34 @@ class AudioTheme:
         return os.path.isdir(self.directory)
 
     def todict(self):
-        data = asdict(self)
-        for unwanted_key in ("is_active", "directory", "sounds"):
-            data.pop(unwanted_key)
-        return data
-
-    def load(self, player):
+        # Avoid asdict here, it would deep copy the decoded sounds.
+        return {
+            f.name: getattr(self, f.name)
+            for f in fields(self)
+            if f.name not in ("is_active", "directory", "sounds")
+        }
+
+    def load(self, player, lazy=False, max_bytes=None, paths=None):
+        """Index this theme's sounds, decoding them now unless lazy is set.
+
+        Lazily loaded sounds are decoded on first use, and the least recently used
+        are dropped once they take more than max_bytes. paths maps roles to sound
+        files, the theme's directory is scanned for them when it is not given.
+        """
         if self.sounds:
             self.unload()
-        if not os.path.isdir(self.directory):
-            return
-        for filename in os.listdir(self.directory):
-            path = os.path.join(self.directory, filename)
-            rep_role = self.is_valid_audio_file(path)
-            if rep_role is not None:
-                self.sounds[rep_role] = player.make_sound_object(path)
+        if paths is None:
+            if not os.path.isdir(self.directory):
+                return
+            paths = self.scan_sound_files(self.directory)
+        self.sounds = SoundBank(
+            paths,
+            player.make_sound_object,
+            max_bytes=max_bytes if lazy else None,
+            on_evict=player.discard_sounds,
+        )
+        if not lazy:
+            self.sounds.preload()
 
     def unload(self):
         self.sounds.clear()
@@ -135,12 +199,17 @@ class AudioTheme:
         self.unload()
         self.is_active = False
 
-    @staticmethod
-    def is_valid_audio_file(filepath):
+    @classmethod
+    def is_valid_audio_file(cls, filepath):
         """Return the role that this file represent (if any) else None."""
-        filename = os.path.split(filepath)[-1]
+        if os.path.isfile(filepath):
+            return cls.role_from_filename(os.path.split(filepath)[-1])
+
+    @staticmethod
+    def role_from_filename(filename):
+        """Return the role a sound file's name represents (if any) else None."""
         fnrole, ext = os.path.splitext(filename)
-        if os.path.isfile(filepath) and ext[1:] in SUPPORTED_FILE_TYPES.keys():
+        if ext[1:] in SUPPORTED_FILE_TYPES.keys():
             try:
                 key = int(fnrole)
                 if key in theme_roles:
@@ -151,6 +220,128 @@ class AudioTheme:
             if key in theme_roles:
                 return key
 
+    @classmethod
+    def scan_sound_files(cls, directory):
+        """Map the roles of the sound files in directory to their paths."""
+        paths = {}
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                role = cls.role_from_filename(entry.name)
+                if role is not None and entry.is_file():
+                    paths[role] = entry.path
+        return paths
+
+
+class _CatalogEntry:
+    __slots__ = ("mtime_ns", "info", "paths")
+
+    def __init__(self, mtime_ns, info):
+        self.mtime_ns = mtime_ns
+        # Parsed info file, None if the folder is not a theme
+        self.info = info
+        # Sound files by role, scanned on first use
+        self.paths = None
+
+
+class ThemeCatalog:
+    """The installed themes' information and sound files, read again only when they change.
+
+    Each theme folder is revalidated by its modification time, which changes when files are
+    added to, removed from or renamed in it. Info files rewritten in place do not change it,
+    so whatever writes them calls invalidate.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        # Info files parsed, for the benchmarks
+        self.parses = 0
+        # folder: _CatalogEntry
+        self._entries = {}
+        # Used from the startup thread as well as NVDA's main thread
+        self._lock = threading.Lock()
+
+    def themes(self):
+        """Return the installed themes, in directory order."""
+        try:
+            with os.scandir(self.directory) as scan:
+                found = [
+                    (entry.name, entry.stat().st_mtime_ns)
+                    for entry in scan
+                    if entry.is_dir()
+                ]
+        except FileNotFoundError:
+            found = []
+        with self._lock:
+            entries = {folder: self._validate(folder, mtime_ns) for folder, mtime_ns in found}
+            self._entries = entries
+        return [
+            self._make_theme(folder, entry)
+            for folder, entry in entries.items()
+            if entry.info is not None
+        ]
+
+    def get(self, folder):
+        """Return the theme in folder, or None if there is none."""
+        entry = self._entry(folder)
+        if entry is not None and entry.info is not None:
+            return self._make_theme(folder, entry)
+
+    def sound_paths(self, folder):
+        """Return the sound files of the theme in folder by role."""
+        entry = self._entry(folder)
+        if entry is None:
+            return {}
+        with self._lock:
+            if entry.paths is None:
+                entry.paths = AudioTheme.scan_sound_files(os.path.join(self.directory, folder))
+            return dict(entry.paths)
+
+    def invalidate(self, folder=None):
+        """Forget one theme folder, or all of them."""
+        with self._lock:
+            if folder is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(folder, None)
+
+    def folder_of(self, path):
+        """Return the theme folder path is in, or None if it is not in one of the catalog's."""
+        directory = os.path.dirname(os.path.abspath(path))
+        if os.path.normcase(os.path.dirname(directory)) != os.path.normcase(
+            os.path.abspath(self.directory)
+        ):
+            return None
+        return os.path.basename(directory)
+
+    def _entry(self, folder):
+        try:
+            mtime_ns = os.stat(os.path.join(self.directory, folder)).st_mtime_ns
+        except OSError:
+            return None
+        with self._lock:
+            entry = self._entries[folder] = self._validate(folder, mtime_ns)
+            return entry
+
+    def _validate(self, folder, mtime_ns):
+        entry = self._entries.get(folder)
+        if entry is not None and entry.mtime_ns == mtime_ns:
+            return entry
+        info_file = os.path.join(self.directory, folder, INFO_FILE_NAME)
+        info = None
+        if os.path.isfile(info_file):
+            self.parses += 1
+            try:
+                info = AudioThemesHandler.load_info_file(info_file)
+            except (OSError, ValueError):
+                log.debugWarning(f"Could not read the audio theme info in {info_file}", exc_info=True)
+        return _CatalogEntry(mtime_ns, info)
+
+    def _make_theme(self, folder, entry):
+        return AudioTheme(directory=os.path.join(self.directory, folder), **entry.info)
+
+
+theme_catalog = ThemeCatalog(THEMES_DIR)
+
 
 def migrate_theme_to_named_files(theme_directory):
     for filename in os.listdir(theme_directory):
@@ -173,22 +364,141 @@ class AudioThemesHandler:
     """Query and manage audio themes."""
 
     def __init__(self):
+        """Register with NVDA, and start the player and load the active theme in the background.
+
+        Only Steam Audio, the audio device and decoding are left to the background thread,
+        everything touching the configuration or NVDA happens here or in _finish_startup.
+        Plays are held back by self.startup until that is done.
+        """
+        self.startup_timer = StartupTimer()
         config.conf.spec["audiothemes"] = audiothemes_config_defaults
+        config.conf.spec["unspoken"] = unspoken_config_defaults
         self.enabled = True
-        self.player = UnspokenPlayer()
+        # Set once started, see _finish_startup
+        self.player = None
+        self.startup = StartupGate(config.conf["audiothemes"]["startup_plays"])
+        # Set once startup has finished or failed
+        self.started = threading.Event()
+        # The player and the decoded active theme, while being started in the background
+        self._starting_player = None
+        self._starting_theme = None
+        # Set by close, the startup thread stops at the end of its current phase
+        self._closed = False
         self.active_theme = None
-        self.ensure_themes_dir()
-        self.migrate_all_themes_to_named_files()
+        # Which sounds the active theme plays, empty while no theme plays anything
+        self.resolution = ResolutionTable()
+        # Roles NVDA should not announce, as the active theme plays a sound for them
+        self.suppressed_roles = frozenset()
+        self.app_policy = AppPolicy()
+        self.apps = AppNameCache()
+        # Filters the play requests of the plugin's event handlers
+        self.scheduler = EventScheduler()
+        self._prerender_worker = None
+        # The render cache's budget before start_prerender raised it, restored by stop_prerender
+        self._render_cache_bytes = None
+        self.pcm_cache = PCMCache(PCM_CACHE_DIR)
+        # Loaded in the background, see _start
+        self.role_usage = None
+        with self.startup_timer.phase("registration"):
+            for action in (
+                post_configSave,
+                post_configReset,
+                post_configProfileSwitch,
+                audiotheme_changed,
+            ):
+                action.register(self._on_config_changed)
+            self._NVDA_getSpeechTextForProperties = speech.speech.getPropertiesSpeech
+            speech.speech.getPropertiesSpeech = self._hook_getSpeechTextForProperties
+        with self.startup_timer.phase("themes directory"):
+            self.ensure_themes_dir()
+        with self.startup_timer.phase("migration"):
+            self.migrate_all_themes_to_named_files()
+        user_config = config.conf["audiothemes"]
+        self._startup_thread = threading.Thread(
+            target=self._start,
+            kwargs={
+                "settings": self.player_settings(),
+                "render_server": UnspokenPlayer.render_server_from_config(),
+                "theme_folder": (
+                    user_config["active_theme"] if user_config["enable_audio_themes"] else None
+                ),
+                "lazy": user_config["lazy_sounds"],
+                "max_bytes": user_config["sound_memory"] * 1024 * 1024,
+                "pcm_cache_bytes": user_config["pcm_cache_size"] * 1024 * 1024,
+            },
+            name="AudioThemesStartup",
+            daemon=True,
+        )
+        self._startup_thread.start()
+
+    def _start(self, settings, render_server, theme_folder, lazy, max_bytes, pcm_cache_bytes):
+        """Initialize Steam Audio, open the audio device and decode the active theme.
+
+        Takes what it needs from the configuration as arguments, read on NVDA's main thread.
+        Phases are skipped once close has been called.
+        """
+        timer = self.startup_timer
+        failed = False
+        try:
+            with timer.phase("player"):
+                player = self._starting_player = UnspokenPlayer(
+                    settings, render_server, observe=False
+                )
+            if not self._closed:
+                with timer.phase("role usage"):
+                    self.role_usage = self.load_role_usage()
+            if not self._closed:
+                with timer.phase("theme"):
+                    self.pcm_cache.max_bytes = pcm_cache_bytes
+                    player.pcm_cache = self.pcm_cache if pcm_cache_bytes else None
+                    if theme_folder is not None:
+                        self._starting_theme = self._load_starting_theme(theme_folder, lazy, max_bytes)
+        except Exception:
+            log.error("Audio themes failed to start", exc_info=True)
+            failed = True
+        if self._closed:
+            # close may have stopped waiting for this thread: terminate the player here.
+            player, self._starting_player = self._starting_player, None
+            if player is not None:
+                player.terminate()
+            return
+        core.callLater(0, self._startup_failed if failed else self._finish_startup)
+
+    def _load_starting_theme(self, folder, lazy, max_bytes):
+        """Decode the theme in folder, or the Default theme if it is gone, for configure to activate."""
+        theme = self.get_theme_from_folder(folder) or self.get_theme_from_folder("Default")
+        if theme is None or not theme.exists():
+            return None
+        self._load_theme(theme, lazy, max_bytes)
+        return theme
+
+    def _finish_startup(self):
+        if self._closed:
+            return
+        with self.startup_timer.phase("configure"):
+            self.player = self._starting_player
+            self._starting_player = None
+            self.player.observe()
+            # Applies any configuration change made while starting as well.
+            self.configure(starting_theme=self._starting_theme)
+            self._starting_theme = None
+        log.info(self.startup_timer.summary())
+        self.started.set()
+        self.startup.open()
+
+    def _startup_failed(self):
+        self.startup.fail()
+        self.started.set()
+
+    def wait_for_startup(self, timeout=None):
+        """Block until startup has finished or failed, not from NVDA's main thread."""
+        return self.started.wait(timeout)
+
+    def _on_config_changed(self, *args, **kwargs):
+        if not self.startup.ready:
+            # _finish_startup configures from the configuration as it is then.
+            return
         self.configure()
-        for action in (
-            post_configSave,
-            post_configReset,
-            post_configProfileSwitch,
-            audiotheme_changed,
-        ):
-            action.register(self.configure)
-        self._NVDA_getSpeechTextForProperties = speech.speech.getPropertiesSpeech
-        speech.speech.getPropertiesSpeech = self._hook_getSpeechTextForProperties
 
     def ensure_themes_dir(self):
         if not os.path.isdir(THEMES_DIR):
@@ -210,28 +520,51 @@ class AudioThemesHandler:
                 )
 
     def close(self):
+        self._closed = True
+        for action in (
+            post_configSave,
+            post_configReset,
+            post_configProfileSwitch,
+            audiotheme_changed,
+        ):
+            action.unregister(self._on_config_changed)
+        speech.speech.getPropertiesSpeech = self._NVDA_getSpeechTextForProperties
+        self._startup_thread.join(STARTUP_JOIN_TIMEOUT)
+        if self._startup_thread.is_alive():
+            log.warning(
+                f"Audio themes startup still running after {STARTUP_JOIN_TIMEOUT} seconds,"
+                " leaving it to stop on its own"
+            )
+            # The startup thread terminates the player it is starting, see _start.
+            starting_player = None
+        else:
+            starting_player = self._starting_player
+        self.stop_prerender()
+        if self.role_usage is not None:
+            self.save_role_usage()
         if self.active_theme is not None:
             self.active_theme.deactivate()
-        speech.speech.getPropertiesSpeech = self._NVDA_getSpeechTextForProperties
+        for player in (self.player, starting_player):
+            if player is not None:
+                player.terminate()
 
     def shouldNukeRoleSpeech(self):
-        if self.player.use_in_say_all and SayAllHandler.isRunning():
+        settings = self.player.settings
+        if settings.use_in_say_all and self.player.say_all.running:
             return False
-        if self.player.speak_roles:
+        if settings.speak_roles:
             return False
         return True
 
     def _hook_getSpeechTextForProperties(
         self, reason=NVDAObjects.controlTypes.OutputReason.QUERY, *args, **kwargs
     ):
-        role = kwargs.get("role", None)
-        if role:
-            if self.active_theme and role in self.active_theme.sounds and self.shouldNukeRoleSpeech():
-                # NVDA will not announce roles if we put it in as _role.
-                kwargs["_role"] = kwargs["role"]
-                del kwargs["role"]
+        # This runs for all of NVDA's speech, keep the common case to a set lookup.
+        if kwargs.get("role") in self.suppressed_roles and self.shouldNukeRoleSpeech():
+            # NVDA will not announce roles if we put it in as _role.
+            kwargs["_role"] = kwargs.pop("role")
         return self._NVDA_getSpeechTextForProperties(reason, *args, **kwargs)
-        
+
     def migrate_all_themes_to_named_files(self):
         if config.conf["audiothemes"].get("migrated_to_named_files"):
             return
@@ -239,7 +572,11 @@ class AudioThemesHandler:
             migrate_theme_to_named_files(theme.directory)
         config.conf["audiothemes"]["migrated_to_named_files"] = True
 
-    def get_active_theme(self):
+    def get_active_theme(self, starting_theme=None):
+        """Load and return the active theme, None if disabled.
+
+        starting_theme is a theme decoded while starting, used if it is the active one.
+        """
         if not config.conf["audiothemes"]["enable_audio_themes"]:
             return
         theme = self.get_theme_from_folder(config.conf["audiothemes"]["active_theme"])
@@ -247,60 +584,182 @@ class AudioThemesHandler:
             config.conf["audiothemes"]["active_theme"] = "Default"
             theme = self.get_theme_from_folder("Default")
         if theme.exists():
-            theme.load(self.player)
+            user_config = config.conf["audiothemes"]
+            lazy = user_config["lazy_sounds"]
+            max_bytes = user_config["sound_memory"] * 1024 * 1024
+            if (
+                starting_theme is not None
+                and starting_theme.folder == theme.folder
+                and starting_theme.sounds.max_bytes == (max_bytes if lazy else None)
+            ):
+                theme = starting_theme
+            else:
+                self._load_theme(theme, lazy, max_bytes)
             theme.is_active = True
             return theme
 
-    def configure(self, *args, **kwargs):
+    def _load_theme(self, theme, lazy, max_bytes):
+        theme.load(
+            self.player or self._starting_player,
+            lazy=lazy,
+            max_bytes=max_bytes,
+            paths=theme_catalog.sound_paths(theme.folder),
+        )
+
+    def player_settings(self):
+        """Return the PlayerSettings the configuration asks for."""
+        user_config = config.conf["audiothemes"]
+        return PlayerSettings.from_config(
+            audio3d=user_config["audio3d"],
+            use_in_say_all=user_config["use_in_say_all"],
+            speak_roles=user_config["speak_roles"],
+            use_synth_volume=user_config["use_synth_volume"],
+            volume=user_config["volume"],
+        )
+
+    def configure(self, *args, starting_theme=None, **kwargs):
         user_config = config.conf["audiothemes"]
+        self.stop_prerender()
         if self.active_theme is not None:
+            self.player.discard_sounds(self.active_theme.sounds.loaded())
             self.active_theme.deactivate()
         self.enabled = user_config["enable_audio_themes"]
-        self.active_theme = self.get_active_theme()
+        latency.enabled = user_config["latency_instrumentation"]
+        self.scheduler.window = user_config["event_coalesce_window"] / 1000.0
+        # Steam Audio's reverb is reconfigured and the render cache invalidated at most once for
+        # the whole change, and not at all when the settings are as they were.
+        with self.player.batch_update():
+            self.player.apply_settings(self.player_settings())
+        self.app_policy = AppPolicy(
+            parse_app_list(user_config["disabled_apps"]),
+            parse_app_overrides(user_config["app_overrides"]),
+        )
+        self.app_policy.bind(self.player.settings)
+        self.pcm_cache.max_bytes = user_config["pcm_cache_size"] * 1024 * 1024
+        self.player.pcm_cache = self.pcm_cache if self.pcm_cache.max_bytes else None
+        self.active_theme = self.get_active_theme(starting_theme)
+        self.pcm_cache.prune()
         if self.active_theme is None:
+            self.resolution = ResolutionTable()
+            self.suppressed_roles = frozenset()
             return
-        self.player.audio3d = user_config["audio3d"]
-        self.player.use_in_say_all = user_config["use_in_say_all"]
-        self.player.speak_roles = user_config["speak_roles"]
-        self.player.use_synth_volume = user_config["use_synth_volume"]
-        self.player.volume = user_config["volume"]
-        unspoken_config = config.conf["unspoken"]
-        self.player.reverb = unspoken_config["Reverb"]
-        self.player.room_size = unspoken_config["RoomSize"]
-        self.player.damping = unspoken_config["Damping"]
-        self.player.wet_level = unspoken_config["WetLevel"]
-        self.player.dry_level = unspoken_config["DryLevel"]
-        self.player.width = unspoken_config["Width"]
-        self.disabled_apps = user_config["disabled_apps"].split(',') if user_config["disabled_apps"] else []
+        self.resolution = ResolutionTable(self.active_theme.sounds)
+        self.suppressed_roles = (
+            frozenset() if self.player.settings.speak_roles else self.resolution.sounds
+        )
+        if user_config["prerender"]:
+            self.start_prerender()
+
+    def start_prerender(self):
+        """Render the active theme's sounds across the audio display in the background."""
+        self.stop_prerender()
+        user_config = config.conf["audiothemes"]
+        if self.player.settings.audio3d:
+            positions = self.player.prerender_positions(
+                user_config["prerender_azimuth_step"], user_config["prerender_elevation_step"]
+            )
+        else:
+            positions = [(0, 0)]
+        sounds = self.active_theme.sounds
+        # Most frequently played sounds first
+        roles = sorted(sounds, key=lambda role: self.role_usage[role], reverse=True)
+        memory_cap = user_config["prerender_memory"] * 1024 * 1024
+        # Leave room in the render cache for live plays next to the pre-rendered sounds.
+        render_cache = self.player.render_cache
+        self._render_cache_bytes = render_cache.max_bytes
+        render_cache.max_bytes = max(render_cache.max_bytes, memory_cap * 2)
+        # Only as many lazily loaded sounds as stay in memory, the rest would be evicted
+        # along with their renders. They are decoded on the worker's threads.
+        settings = self.player.settings
+        self._prerender_worker = PrerenderWorker(
+            self.player,
+            sounds.iter_preload(roles),
+            positions,
+            memory_cap,
+            volume=self.player.compute_volume(settings),
+            settings=settings,
+        )
+        self._prerender_worker.start()
+
+    def stop_prerender(self):
+        if self._prerender_worker is not None:
+            self._prerender_worker.stop()
+            self._prerender_worker.join()
+            self._prerender_worker = None
+        if self._render_cache_bytes is not None:
+            self.player.render_cache.resize(self._render_cache_bytes)
+            self._render_cache_bytes = None
+
+    @staticmethod
+    def load_role_usage():
+        usage = Counter()
+        try:
+            with open(ROLE_USAGE_FILE, "r", encoding="utf8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return usage
+        except (OSError, ValueError):
+            log.debugWarning("Could not read audio themes role usage", exc_info=True)
+            return usage
+        for role_name, count in data.items():
+            role = role_name_to_int.get(role_name)
+            if role is not None:
+                usage[role] = count
+        return usage
+
+    def save_role_usage(self):
+        data = {
+            role_int_to_name[role]: count
+            for role, count in self.role_usage.items()
+            if role in role_int_to_name
+        }
+        try:
+            with open(ROLE_USAGE_FILE, "w", encoding="utf8") as f:
+                json.dump(data, f)
+        except OSError:
+            log.debugWarning("Could not save audio themes role usage", exc_info=True)
 
     def play(self, obj, sound):
         if not self.enabled or (self.active_theme is None):
             return
-        
-        foreground_app = _get_foreground_app_name()
-        if foreground_app and foreground_app in self.disabled_apps:
+        settings = self.app_policy.settings_for(self.apps.foreground_app)
+        if settings is None:
             return
+        latency.mark("foreground")
 
         sound_obj = self.active_theme.sounds.get(sound)
         if sound_obj is None:
             return
-        self.player.play(obj, sound_obj)
+        self.role_usage[sound] += 1
+        if sound in (SpecialProps.notify, SpecialProps.loaded):
+            # Let notifications play over focus sounds instead of cutting them off.
+            self.player.play(obj, sound_obj, group=NOTIFICATION_GROUP, priority=1, settings=settings)
+        else:
+            self.player.play(obj, sound_obj, group=FOCUS_GROUP, settings=settings)
+
+    def latency_stats(self):
+        """Return per-stage latency percentiles of the play path, see LatencyTracker.summary."""
+        return latency.summary()
+
+    def latency_summary_text(self):
+        return latency.format_summary()
+
+    def toggle_latency_instrumentation(self):
+        """Turn latency instrumentation on or off, returning the new state."""
+        enabled = not config.conf["audiothemes"]["latency_instrumentation"]
+        config.conf["audiothemes"]["latency_instrumentation"] = enabled
+        latency.enabled = enabled
+        if enabled:
+            latency.reset()
+        return enabled
 
-    @classmethod
-    def get_theme_from_folder(cls, folderpath):
-        expected = os.path.join(THEMES_DIR, folderpath)
-        info_file = os.path.join(expected, INFO_FILE_NAME)
-        if os.path.isfile(info_file):
-            info = cls.load_info_file(info_file)
-            return AudioTheme(directory=expected, **info)
+    @staticmethod
+    def get_theme_from_folder(folderpath):
+        return theme_catalog.get(folderpath)
 
-    @classmethod
-    def get_installed_themes(cls):
-        for folder in os.listdir(THEMES_DIR):
-            theme = cls.get_theme_from_folder(folder)
-            if theme is None:
-                continue
-            yield theme
+    @staticmethod
+    def get_installed_themes():
+        return iter(theme_catalog.themes())
 
     @classmethod
     def install_audio_themePackage(cls, theme_pack):
@@ -320,6 +779,8 @@ class AudioThemesHandler:
             if os.path.isdir(default_theme_path):
                 shutil.rmtree(default_theme_path)
             os.rename(identified_path, default_theme_path)
+            theme_catalog.invalidate("Default")
+        # A new theme folder is found by the next scan of the themes directory.
 
     @classmethod
     def _install_legacy(cls, pack, final_dst):
@@ -343,6 +804,7 @@ class AudioThemesHandler:
         theme.deactivate()
         if theme.directory:
             shutil.rmtree(theme.directory)
+        theme_catalog.invalidate(theme.folder)
 
     @staticmethod
     def load_info_file(info_file):
@@ -353,6 +815,9 @@ class AudioThemesHandler:
     def write_info_file(file_path, data):
         with open(file_path, "w", encoding="utf8") as f:
             json.dump(data, f)
+        folder = theme_catalog.folder_of(file_path)
+        if folder is not None:
+            theme_catalog.invalidate(folder)
 
     @staticmethod
     def make_zip_file(output_filename, source_dir):
@@ -361,12 +826,3 @@ class AudioThemesHandler:
                 file = os.path.join(source_dir, filename)
                 if os.path.isfile(file):
                     zip.write(file, filename)
-
-def _get_foreground_app_name():
-    try:
-        foreground_object = NVDAObjects.api.getForegroundObject()
-        if foreground_object and foreground_object.appModule:
-            return foreground_object.appModule.appName
-    except:
-        pass
-    return None
@@ -0,0 +1,117 @@
+# coding: utf-8
+
+# This file is covered by the GNU General Public License.
+
+import time
+
+import wx
+import api
+from logHandler import log
+
+try:
+    from inputCore import decide_executeGesture
+except ImportError:
+    decide_executeGesture = None
+
+# Poll cadence once the navigator object has not moved for IDLE_AFTER seconds
+IDLE_INTERVAL = 1.0
+IDLE_AFTER = 5.0
+# Delay between a gesture and the poll looking for the navigator movement it caused,
+# when polling had backed off to IDLE_INTERVAL
+GESTURE_POLL_DELAY = 0.03
+
+
+class NavigatorTracker:
+    """Reports navigator object changes in browse mode documents.
+
+    In browse mode, moving through a document does not reach the plugin's
+    becomeNavigatorObject handler, so the navigator object is polled instead. Polling
+    only runs while the focus is inside a document. It runs every active_interval
+    seconds while the navigator keeps moving, and backs off to IDLE_INTERVAL once it
+    has been still for IDLE_AFTER seconds. Any gesture brings the fast cadence back.
+    """
+
+    def __init__(self, on_change, active_interval=0.1):
+        self.on_change = on_change
+        self.active_interval = active_interval
+        self.polls = 0
+        self.changes = 0
+        self._last_object = None
+        self._last_activity = 0.0
+        # Delay of the pending poll, None while polling is stopped
+        self._interval = None
+        # Set by _on_gesture until _wake runs on the main thread
+        self._wake_pending = False
+        self._timer = wx.Timer()
+        self._timer.Bind(wx.EVT_TIMER, self._on_timer)
+        if decide_executeGesture is not None:
+            decide_executeGesture.register(self._on_gesture)
+
+    @property
+    def polling(self):
+        return self._interval is not None
+
+    def track_focus(self, obj):
+        """Start or stop polling as the focus moves into or out of a document."""
+        if obj.treeInterceptor is not None:
+            if not self.polling:
+                self._last_activity = time.monotonic()
+                self._schedule(self.active_interval)
+        elif self.polling:
+            self.stop()
+
+    def stop(self):
+        self._timer.Stop()
+        self._interval = None
+        self._last_object = None
+
+    def terminate(self):
+        self.stop()
+        if decide_executeGesture is not None:
+            decide_executeGesture.unregister(self._on_gesture)
+
+    def _schedule(self, interval):
+        self._interval = interval
+        self._timer.StartOnce(max(int(interval * 1000), 1))
+
+    def _on_gesture(self, gesture=None):
+        # Runs on NVDA's input threads: the timer and the tracker's state belong to the main thread.
+        if self.polling and not self._wake_pending:
+            self._wake_pending = True
+            wx.CallAfter(self._wake)
+        # Never block the gesture
+        return True
+
+    def _wake(self):
+        """Bring back the fast cadence after a gesture, on the main thread."""
+        self._wake_pending = False
+        if not self.polling:
+            return
+        self._last_activity = time.monotonic()
+        if self._interval > self.active_interval:
+            self._schedule(min(GESTURE_POLL_DELAY, self.active_interval))
+
+    def _on_timer(self, event):
+        self.polls += 1
+        now = time.monotonic()
+        try:
+            focus = api.getFocusObject()
+            if focus is None or focus.treeInterceptor is None:
+                self.stop()
+                return
+            current_nav = api.getNavigatorObject()
+            tree_interceptor = current_nav.treeInterceptor if current_nav else None
+            if (
+                tree_interceptor
+                and not tree_interceptor.passThrough
+                and current_nav is not self._last_object
+                and current_nav != self._last_object
+            ):
+                self._last_object = current_nav
+                self._last_activity = now
+                self.changes += 1
+                self.on_change(current_nav)
+        except Exception:
+            log.debugWarning("Error tracking the navigator object", exc_info=True)
+        idle = now - self._last_activity >= IDLE_AFTER
+        self._schedule(IDLE_INTERVAL if idle else self.active_interval)
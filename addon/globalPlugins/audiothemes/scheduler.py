@@ -0,0 +1,117 @@
+# coding: utf-8
+
+# This file is covered by the GNU General Public License.
+
+import time
+from enum import IntEnum
+
+
+class EventSource(IntEnum):
+    """Where a play request came from. Higher values win over lower ones."""
+
+    timer = 0
+    mouse = 1
+    navigator = 2
+    focus = 3
+    # Notifications have their own lane, they neither suppress nor get suppressed by the others.
+    notification = 4
+
+
+def object_key(obj):
+    """Return a cheap identity for obj, without cross-process calls.
+
+    Objects created for an accessibility event carry the event's window, object and child IDs,
+    which identify the same control across the NVDAObject instances NVDA makes for it.
+    Anything else is identified by its window and the instance itself.
+    """
+    window = getattr(obj, "windowHandle", None)
+    child_id = getattr(obj, "event_childID", None)
+    if child_id is not None:
+        return (window, getattr(obj, "event_objectID", None), child_id)
+    return (window, id(obj))
+
+
+class _LastPlay:
+    __slots__ = ("key", "source", "time", "obj")
+
+    def __init__(self, key, source, time, obj):
+        self.key = key
+        self.source = source
+        self.time = time
+        # Keeps the object alive, so its id() can not be reused while the key is compared.
+        self.obj = obj
+
+
+class EventScheduler:
+    """Decides which play requests from the event handlers reach the audio themes handler.
+
+    Within window seconds of a play, a request for the same object is coalesced into it, and
+    a request from a lower priority source is dropped as stale: a mouse move or a navigator
+    poll landing right after a focus change would only repeat or cut off the focus sound.
+    """
+
+    def __init__(self, window=0.1):
+        self.window = window
+        self.played = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self._last = {}
+
+    def request(self, obj, source):
+        """Return True if a sound should be played for obj, reported by source."""
+        now = time.monotonic()
+        lane = source == EventSource.notification
+        key = object_key(obj)
+        last = self._last.get(lane)
+        if last is not None and now - last.time < self.window:
+            if key == last.key:
+                self.coalesced += 1
+                return False
+            if source < last.source:
+                self.dropped += 1
+                return False
+        self._last[lane] = _LastPlay(key, source, now, obj)
+        self.played += 1
+        return True
+
+    def reset(self):
+        self._last.clear()
+
+    def stats(self):
+        return {"played": self.played, "coalesced": self.coalesced, "dropped": self.dropped}
+
+
+class OrderCache:
+    """Remembers the first or last item result of an object for ttl seconds.
+
+    Finding it walks the object's parent and siblings, so moving the mouse back and forth
+    over a list item, or reaching it through several events, only does it once.
+    """
+
+    def __init__(self, ttl=0.5, max_entries=64):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+
+    def get(self, obj, compute):
+        """Return compute(obj), cached under obj's object_key."""
+        now = time.monotonic()
+        key = object_key(obj)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > now:
+            self.hits += 1
+            return entry[2]
+        self.misses += 1
+        result = compute(obj)
+        if len(self._entries) >= self.max_entries:
+            self._entries = {k: v for k, v in self._entries.items() if v[0] > now}
+            if len(self._entries) >= self.max_entries:
+                self._entries.clear()
+        # The object is kept alive, so its id() can not be reused while the entry is valid.
+        self._entries[key] = (now + self.ttl, obj, result)
+        return result
+
+    def clear(self):
+        self._entries.clear()
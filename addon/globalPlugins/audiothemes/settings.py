@@ -53,6 +53,10 @@ class AudioThemesSettingsPanel(SettingsPanel):
         self.useSynthVolumeCheckbox = wx.CheckBox(
             innerPanel, -1, _("Use speech synthesizer volume")
         )
+        # Translators: label for a checkbox to toggle rendering the theme's sounds ahead of time
+        self.prerenderCheckbox = wx.CheckBox(
+            innerPanel, -1, _("Pre-render sounds in the background when a theme is activated")
+        )
         # Translators: label for a slider to set the volume of this add-on
         volumeLabel = wx.StaticText(innerPanel, -1, _("Audio themes volume:"))
         self.volumeSlider = wx.Slider(
@@ -85,6 +89,7 @@ class AudioThemesSettingsPanel(SettingsPanel):
                 (self.speakRoleCheckbox, 1, wx.ALL, 5),
                 (self.useInSayAllCheckbox, 1, wx.ALL, 5),
                 (self.useSynthVolumeCheckbox, 1, wx.ALL, 5),
+                (self.prerenderCheckbox, 1, wx.ALL, 5),
                 (volumeLabel, 1, wx.TOP | wx.LEFT | wx.RIGHT, 10),
                 (self.volumeSlider, 1, wx.BOTTOM | wx.LEFT | wx.RIGHT, 5),
             ]
@@ -174,6 +179,7 @@ class AudioThemesSettingsPanel(SettingsPanel):
         self.speakRoleCheckbox.SetValue(conf["speak_roles"])
         self.useInSayAllCheckbox.SetValue(conf["use_in_say_all"])
         self.useSynthVolumeCheckbox.SetValue(conf["use_synth_volume"])
+        self.prerenderCheckbox.SetValue(conf["prerender"])
         self.volumeSlider.SetValue(conf["volume"])
         unspoken_conf = config.conf["unspoken"]
         self.enableReverbCheckbox.SetValue(unspoken_conf["Reverb"])
@@ -204,6 +210,7 @@ class AudioThemesSettingsPanel(SettingsPanel):
         conf["speak_roles"] = self.speakRoleCheckbox.IsChecked()
         conf["use_in_say_all"] = self.useInSayAllCheckbox.IsChecked()
         conf["use_synth_volume"] = self.useSynthVolumeCheckbox.IsChecked()
+        conf["prerender"] = self.prerenderCheckbox.IsChecked()
         conf["volume"] = self.volumeSlider.GetValue()
         unspoken_conf = config.conf["unspoken"]
         unspoken_conf["Reverb"] = self.enableReverbCheckbox.IsChecked()
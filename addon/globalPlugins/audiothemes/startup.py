@@ -0,0 +1,79 @@
+# coding: utf-8
+
+# This file is covered by the GNU General Public License.
+
+import time
+from collections import deque
+from contextlib import contextmanager
+from logHandler import log
+
+
+class StartupTimer:
+    """Times the phases of the add-on's startup, for the log."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        # Seconds NVDA waited on the add-on's constructor, see end_inline
+        self.inline = None
+        # (phase, seconds) in the order they ran
+        self.phases = []
+
+    def end_inline(self):
+        """Mark the end of the work done while NVDA waits."""
+        self.inline = time.perf_counter() - self.started
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - started))
+
+    def summary(self):
+        total = time.perf_counter() - self.started
+        phases = ", ".join(f"{name} {seconds * 1000:.1f} ms" for name, seconds in self.phases)
+        summary = f"Audio themes started in {total * 1000:.1f} ms"
+        if self.inline is not None:
+            summary += f", {self.inline * 1000:.1f} ms of it inline"
+        return f"{summary} ({phases})"
+
+
+class StartupGate:
+    """Holds back plays requested before the add-on is ready to play them.
+
+    With the queue policy, the most recent request is kept and made once the gate opens: older
+    ones would only be cut off by it. With the drop policy, requests are ignored until then.
+    """
+
+    def __init__(self, policy="queue", max_queued=1):
+        self.ready = False
+        self.failed = False
+        self.policy = policy
+        self.dropped = 0
+        self._queued = deque(maxlen=max_queued)
+
+    def hold(self, func, *args):
+        if self.policy != "queue" or self.failed:
+            self.dropped += 1
+            return
+        if len(self._queued) == self._queued.maxlen:
+            self.dropped += 1
+        self._queued.append((func, args))
+
+    def open(self):
+        """Mark the add-on ready and make the queued requests."""
+        self.ready = True
+        queued = list(self._queued)
+        self._queued.clear()
+        for func, args in queued:
+            try:
+                func(*args)
+            except Exception:
+                log.debugWarning("Could not make a play request queued during startup", exc_info=True)
+
+    def fail(self):
+        """Drop queued and future requests, the add-on will not become ready."""
+        self.failed = True
+        self.dropped += len(self._queued)
+        self._queued.clear()
@@ -166,6 +166,7 @@ class AudioThemesStudioStartupDialog(BaseDialog):
                 _("Creating New Theme - {name}").format(name=theme_info["name"]),
                 theme=new_theme,
                 editing=False,
+                player=self.plugin.handler.player,
             )
             with self.audio_theme_muted():
                 with dlg:
@@ -193,6 +194,7 @@ class AudioThemesStudioStartupDialog(BaseDialog):
             # Translators: title for create new theme dialog
             _("Editing Audio Theme: {name}").format(name=selected_theme.name),
             theme=selected_theme,
+            player=self.plugin.handler.player,
         )
         with self.audio_theme_muted():
             with dlg:
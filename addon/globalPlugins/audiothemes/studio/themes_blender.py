@@ -10,7 +10,6 @@ import os
 import shutil
 import wx
 import gui
-from ..unspoken import UnspokenPlayer
 from ..handler import AudioTheme, AudioThemesHandler, theme_roles, SUPPORTED_FILE_TYPES, role_int_to_name
 
 import addonHandler
@@ -156,10 +155,11 @@ class BaseDialog(wx.Dialog):
 class ThemeBlenderDialog(BaseDialog):
     """Dialog for editing and creating audio themes."""
 
-    def __init__(self, title, theme, editing=True):
+    def __init__(self, title, theme, editing=True, player=None):
         self.theme_state = ThemeState(theme)
         self.editing = editing
-        self.player = UnspokenPlayer()
+        # The add-on's player, shared for previews; None while it is not started
+        self.player = player
         super().__init__(title)
 
     def addControls(self, sizer, parent):
@@ -314,7 +314,7 @@ class ThemeBlenderDialog(BaseDialog):
 
     def onEntriesListSelectionChanged(self, event):
         selected_sound = self.selected_sound
-        if selected_sound is not None:
+        if selected_sound is not None and self.player is not None:
             self.player.play_file(selected_sound.src)
         self.editButton.Enable(selected_sound is not None)
         self.removeButton.Enable(selected_sound is not None)
@@ -373,7 +373,7 @@ class AudioSelectorDialog(BaseDialog):
         self.previewButton.Enable(self.selected_audio is not None)
 
     def onPreviewClicked(self, event):
-        if self.selected_audio is not None:
+        if self.selected_audio is not None and self.Parent.player is not None:
             self.Parent.player.play_file(self.selected_audio)
 
     def should_return_id_ok(self):
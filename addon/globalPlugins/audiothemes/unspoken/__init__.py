@@ -7,15 +7,11 @@ import os
 import os.path
 import sys
 import time
-import threading
-import wave
-import struct
+from collections import deque
+from contextlib import contextmanager
 import globalPluginHandler
-import NVDAObjects
 import config
-import speech
 import controlTypes
-from speech.sayAll import SayAllHandler
 from logHandler import log
 import gui
 import api
@@ -30,6 +26,15 @@ try:
 except ImportError as e:
 	log.error(f"Failed to load Steam Audio: {e}")
 	raise
+from .sound_buffer import SoundBuffer
+from .render_cache import RenderCache
+from .prerender import grid_positions
+from .output import SAMPLE_RATE, AudioOutputWorker
+from .latency import tracker as latency
+from .player_settings import PlayerSettings, SayAllObserver, SynthVolumeObserver
+from .spatial import SpatialMapper
+from .render_cost import RenderCost
+from .stream_renderer import StreamRenderer
 
 UNSPOKEN_ROOT_PATH = os.path.abspath(os.path.dirname(__file__))
 
@@ -40,6 +45,36 @@ UNSPOKEN_SOUNDS_PATH = os.path.join(UNSPOKEN_ROOT_PATH, "sounds")
 
 sounds = dict()  # For holding instances in RAM.
 
+# Mixer groups: a new sound only fades out the previous sound of its own group.
+FOCUS_GROUP = "focus"
+NOTIFICATION_GROUP = "notification"
+PREVIEW_GROUP = "preview"
+# Sounds longer than this many Steam Audio frames are rendered and played in streaming mode.
+STREAM_MIN_BLOCKS = 4
+# How much longer than estimated each part of a streamed sound is allowed to take to render
+STREAM_MARGIN = 1.5
+# Most Steam Audio frames rendered in one part of a streamed sound. Larger parts save little
+# once the per call cost is paid, and keep other threads waiting on the render for longer.
+STREAM_MAX_PART_BLOCKS = 16
+
+
+# Configuration spec, registered by whoever creates the player
+unspoken_config_defaults = {
+	"sayAll": "boolean(default=False)",
+	"speakRoles": "boolean(default=False)",
+	"noSounds": "boolean(default=False)",
+	"HRTF": "boolean(default=True)",
+	"volumeAdjust": "boolean(default=True)",
+	"Reverb": "boolean(default=True)",
+	"RoomSize": "integer(default=10, min=0, max=100)",
+	"Damping": "integer(default=100, min=0, max=100)",
+	"WetLevel": "integer(default=9, min=0, max=100)",
+	"DryLevel": "integer(default=30, min=0, max=100)",
+	"Width": "integer(default=100, min=0, max=100)",
+	"RenderServer": "boolean(default=False)",
+	"RenderServerPython": "string(default='')",
+}
+
 
 # taken from Stackoverflow. Don't ask.
 def clamp(my_value, min_value, max_value):
@@ -47,130 +82,147 @@ def clamp(my_value, min_value, max_value):
 
 
 class UnspokenPlayer:
-	def __init__(self, *args, **kwargs):
-		super(UnspokenPlayer, self).__init__(*args, **kwargs)
-		config.conf.spec["unspoken"] = {
-			"sayAll": "boolean(default=False)",
-			"speakRoles": "boolean(default=False)",
-			"noSounds": "boolean(default=False)",
-			"HRTF": "boolean(default=True)",
-			"volumeAdjust": "boolean(default=True)",
-			"Reverb": "boolean(default=True)",
-			"RoomSize": "integer(default=10, min=0, max=100)",
-			"Damping": "integer(default=100, min=0, max=100)",
-			"WetLevel": "integer(default=9, min=0, max=100)",
-			"DryLevel": "integer(default=30, min=0, max=100)",
-			"Width": "integer(default=100, min=0, max=100)",
-		}
+	def __init__(self, settings=None, render_server=None, observe=True):
+		"""
+		Args:
+		    settings: The PlayerSettings to start with. If None, they and render_server are
+		        read from config.conf["unspoken"], which is registered if it is not yet.
+		    render_server: The Python to run the render server with, "" for the default one,
+		        or None to render in NVDA's process
+		    observe: Whether to call observe now. Otherwise it must be called on NVDA's main
+		        thread before playing, and the rest of the player can be set up on any thread.
+		"""
+		if settings is None:
+			if "unspoken" not in config.conf.spec:
+				config.conf.spec["unspoken"] = unspoken_config_defaults
+			settings = PlayerSettings.from_config()
+			render_server = self.render_server_from_config()
 		log.debug("Initializing Steam Audio", exc_info=True)
-		self.steam_audio = steam_audio.get_steam_audio()
+		self.steam_audio = self._start_engine(render_server)
 		if not self.steam_audio.initialize():
 			log.error("Failed to initialize Steam Audio")
 			raise RuntimeError("Steam Audio initialization failed")
 
-		# Configure reverb settings
-		self.steam_audio.set_reverb_settings(
-			room_size=config.conf["unspoken"]["RoomSize"] / 100.0,
-			damping=config.conf["unspoken"]["Damping"] / 100.0,
-			wet_level=config.conf["unspoken"]["WetLevel"] / 100.0,
-			dry_level=config.conf["unspoken"]["DryLevel"] / 100.0,
-			width=config.conf["unspoken"]["Width"] / 100.0,
-		)
-
-		# Initialize WavePlayer for audio output (stereo, 44100Hz, 16-bit)
-		self.create_wave_player()
-		self._last_played_object = None
-		self._last_played_time = 0
-		self._last_navigator_object = None
-
-		# these are in degrees.
-		self._display_width = 180.0
-		self._display_height_min = -40.0
-		self._display_height_magnitude = 50.0
+		# Everything the play path reads from the configuration, replaced by apply_settings
+		self.settings = settings
+		# Settings recorded by apply_settings inside batch_update, applied when it ends
+		self._pending_settings = None
+		self._batch_depth = 0
+		# Set by observe
+		self.synth_volume = None
+		self.say_all = None
+		self.spatial = None
+		self._update_reverb_settings()
+
+		# Decoded sounds kept on disk across sessions, see PCMCache
+		self.pcm_cache = None
+		# Final renders of recently played sounds
+		self.render_cache = RenderCache()
+		# Start long sounds before they are fully rendered, see _play_streamed
+		self.stream_rendering = True
+		# Seconds from the start of rendering to queueing the first block, for recent streamed sounds
+		self.first_block_times = deque(maxlen=64)
+		# How long renders on the play path take, to size the parts of streamed sounds
+		self.render_cost = RenderCost()
+
+		# The output worker owns the WavePlayer for audio output (stereo, 44100Hz, 16-bit)
+		self._output = AudioOutputWorker(self.create_wave_player)
+		self._output.start()
+		# Renders all but the first part of streamed sounds, see _play_streamed
+		self._stream_renderer = StreamRenderer()
+		self._stream_renderer.start()
+		if observe:
+			self.observe()
+
+	def observe(self):
+		"""Start following the synthesizer, say all and the display. Call on NVDA's main thread."""
+		self.synth_volume = SynthVolumeObserver()
+		self.say_all = SayAllObserver()
+		# Maps object locations to angles on the audio display
+		self.spatial = SpatialMapper()
 		synthChanged.register(self.on_synthChanged)
-		self.audio3d = True
-		self.use_in_say_all = True
-		self.speak_roles = False
-		self.use_synth_volume = True
-		self.volume = 100
-		self._reverb = config.conf["unspoken"]["Reverb"]
-		self._room_size = config.conf["unspoken"]["RoomSize"]
-		self._damping = config.conf["unspoken"]["Damping"]
-		self._wet_level = config.conf["unspoken"]["WetLevel"]
-		self._dry_level = config.conf["unspoken"]["DryLevel"]
-		self._width = config.conf["unspoken"]["Width"]
-
-	@property
-	def reverb(self):
-		return self._reverb
-
-	@reverb.setter
-	def reverb(self, value):
-		if self._reverb != value:
-			self._reverb = value
-			self._update_reverb_settings()
-
-	@property
-	def room_size(self):
-		return self._room_size
-
-	@room_size.setter
-	def room_size(self, value):
-		if self._room_size != value:
-			self._room_size = value
-			self._update_reverb_settings()
-
-	@property
-	def damping(self):
-		return self._damping
-
-	@damping.setter
-	def damping(self, value):
-		if self._damping != value:
-			self._damping = value
-			self._update_reverb_settings()
-
-	@property
-	def wet_level(self):
-		return self._wet_level
-
-	@wet_level.setter
-	def wet_level(self, value):
-		if self._wet_level != value:
-			self._wet_level = value
-			self._update_reverb_settings()
-
-	@property
-	def dry_level(self):
-		return self._dry_level
 
-	@dry_level.setter
-	def dry_level(self, value):
-		if self._dry_level != value:
-			self._dry_level = value
-			self._update_reverb_settings()
+	@staticmethod
+	def render_server_from_config():
+		"""Return the render_server argument the configuration asks for, see __init__."""
+		unspoken_config = config.conf["unspoken"]
+		if not unspoken_config["RenderServer"]:
+			return None
+		return unspoken_config["RenderServerPython"]
 
-	@property
-	def width(self):
-		return self._width
+	def _start_engine(self, python):
+		"""Return the render server when python is given and it starts, else the in-process Steam Audio."""
+		if python is not None:
+			# Pulls in multiprocessing and subprocess, only imported when enabled.
+			from . import render_server
 
-	@width.setter
-	def width(self, value):
-		if self._width != value:
-			self._width = value
+			try:
+				return render_server.get_render_server(python)
+			except Exception:
+				log.error("Could not start the audio render server, rendering in NVDA", exc_info=True)
+		return steam_audio.get_steam_audio()
+
+	def discard_sounds(self, sounds):
+		"""Forget what is kept for sounds that will not be played again."""
+		sounds = list(sounds)
+		self.render_cache.discard_sounds(sounds)
+		self.steam_audio.forget_sounds(sounds)
+
+	def apply_settings(self, settings):
+		"""Switch to a new PlayerSettings snapshot, or record it inside batch_update."""
+		if self._batch_depth:
+			self._pending_settings = settings
+			return
+		previous = self.settings
+		# The synth's volume may have been saved along with the configuration.
+		if self.synth_volume is not None:
+			self.synth_volume.invalidate()
+		if settings == previous:
+			# Keep the current snapshot and its version.
+			return
+		self.settings = settings
+		if settings.reverb_params != previous.reverb_params:
 			self._update_reverb_settings()
+			# Renders without reverb are unaffected.
+			self.render_cache.invalidate(lambda key: key.reverb is not None)
+
+	def update(self, **changes):
+		"""Apply the current settings with changes, e.g. update(room_size=20)."""
+		self.apply_settings((self._pending_settings or self.settings).replace(**changes))
+
+	@contextmanager
+	def batch_update(self):
+		"""Apply all settings changes made in the block at once, when it ends.
+
+		Steam Audio's reverb is reconfigured and the render cache invalidated at most once,
+		and not at all when the settings end up as they were. Blocks can be nested. If the
+		block raises, the changes made in it are discarded.
+		"""
+		pending = self._pending_settings
+		self._batch_depth += 1
+		try:
+			yield self
+		except BaseException:
+			self._pending_settings = pending
+			raise
+		finally:
+			self._batch_depth -= 1
+		if not self._batch_depth and self._pending_settings is not None:
+			settings, self._pending_settings = self._pending_settings, None
+			self.apply_settings(settings)
 
 	def _update_reverb_settings(self):
+		settings = self.settings
 		self.steam_audio.set_reverb_settings(
-			room_size=self._room_size / 100.0,
-			damping=self._damping / 100.0,
-			wet_level=self._wet_level / 100.0,
-			dry_level=self._dry_level / 100.0,
-			width=self._width / 100.0,
+			room_size=settings.room_size / 100.0,
+			damping=settings.damping / 100.0,
+			wet_level=settings.wet_level / 100.0,
+			dry_level=settings.dry_level / 100.0,
+			width=settings.width / 100.0,
 		)
 
 	def create_wave_player(self):
-		self.wave_player = nvwave.WavePlayer(
+		return nvwave.WavePlayer(
 			channels=2,
 			samplesPerSec=44100,
 			bitsPerSample=16,
@@ -178,177 +230,237 @@ class UnspokenPlayer:
 		)
 
 	def make_sound_object(self, path):
-		"""Load sound files for Steam Audio processing."""
-		log.debug("Loading sound files for Steam Audio", exc_info=True)
+		"""Load a sound file for Steam Audio processing."""
 		log.debug("Loading " + path, exc_info=True)
 		try:
-			# Load WAV file and convert to float32 mono
-			with wave.open(path, "rb") as wav_file:
-				frames = wav_file.readframes(wav_file.getnframes())
-				sample_width = wav_file.getsampwidth()
-				channels = wav_file.getnchannels()
-				sample_rate = wav_file.getframerate()
-
-				# Convert to float32 samples
-				if sample_width == 2:  # 16-bit
-					import struct
-
-					samples = struct.unpack(f"<{len(frames) // 2}h", frames)
-					float_samples = [s / 32768.0 for s in samples]
-				else:
-					log.error(f"Unsupported sample width: {sample_width}")
-					return None
-
-				# Convert to mono if stereo
-				if channels == 2:
-					float_samples = [
-						float_samples[i] for i in range(0, len(float_samples), 2)
-					]
-
-				return {"data": float_samples, "sample_rate": sample_rate}
-
+			if self.pcm_cache is not None:
+				return self.pcm_cache.load(path)
+			return SoundBuffer.from_wave(path)
 		except Exception as e:
 			log.error(f"Failed to load {path}: {e}")
 			return None
 
-	def _compute_volume(self):
-		if not self.use_synth_volume:
-			return self.volume / 100.0
-		driver = speech.speech.getSynth()
-		volume = getattr(driver, "volume", 100) / 100.0  # nvda reports as percent.
+	def compute_volume(self, settings=None):
+		"""Return the gain sounds are rendered at. Reads the synth's volume, call on NVDA's main thread."""
+		settings = settings or self.settings
+		if not settings.use_synth_volume:
+			return settings.volume / 100.0
+		volume = self.synth_volume.volume / 100.0  # nvda reports as percent.
 		volume = clamp(volume, 0.0, 1.0)
-		return volume if not config.conf["unspoken"]["HRTF"] else volume + 0.25
-
-	def _play_audio_data(self, audio_bytes):
-		"""Play processed audio data using nvwave.WavePlayer in a thread"""
-
-		def play_in_thread():
-			try:
-				self.wave_player.feed(audio_bytes)
-			except Exception as e:
-				log.error(f"Failed to play audio: {e}")
+		return volume if not settings.hrtf else volume + 0.25
 
-		# Play audio in a separate thread to avoid blocking
-		threading.Thread(target=play_in_thread, daemon=True).start()
+	def _play_audio_data(self, audio_bytes, group=FOCUS_GROUP, priority=0):
+		"""Play processed audio data, replacing whatever is currently playing in the same group"""
+		self._output.play(audio_bytes, priority=priority, group=group)
 
-	def play(self, obj, sound):
-		if config.conf["unspoken"]["noSounds"]:
-			return
-		if self.use_in_say_all and SayAllHandler.isRunning():
+	def play(self, obj, sound, group=FOCUS_GROUP, priority=0, settings=None):
+		"""Play sound at obj's location, with settings in place of the player's own if given."""
+		settings = settings or self.settings
+		if settings.no_sounds:
 			return
-		curtime = time.time()
-		if self._last_played_object and (curtime - self._last_played_time < 0.2 and obj.name == self._last_played_object.name):
+		if settings.use_in_say_all and self.say_all.running:
 			return
-		self._last_played_object = obj
-		self._last_played_time = curtime
-		role = obj.role
-		if self.audio3d:
-			# Get coordinate bounds of desktop.
-			desktop = NVDAObjects.api.getDesktopObject()
-			desktop_max_x = desktop.location[2]
-			desktop_max_y = desktop.location[3]
-			# Get location of the object.
-			if obj.location != None:
-				# Object has a location. Get its center.
-				obj_x = obj.location[0] + (obj.location[2] / 2.0)
-				obj_y = obj.location[1] + (obj.location[3] / 2.0)
-			else:
-				# Objects without location are assumed in the center of the screen.
-				obj_x = desktop_max_x / 2.0
-				obj_y = desktop_max_y / 2.0
-			# Scale object position to audio display.
-			angle_x = (
-				(obj_x - desktop_max_x / 2.0) / desktop_max_x
-			) * self._display_width
-			# angle_y is a bit more involved.
-			percent = (desktop_max_y - obj_y) / desktop_max_y
-			angle_y = (
-				self._display_height_magnitude * percent + self._display_height_min
-			)
-			# clamp these to Libaudioverse's internal ranges.
-			angle_x = clamp(angle_x, -90.0, 90.0)
-			angle_y = clamp(angle_y, -90.0, 90.0)
+		if settings.audio3d:
+			angle_x, angle_y = self.spatial.angles(obj.location)
 		else:
 			angle_x = 0
 			angle_y = 0
-		# Process audio with Steam Audio
-		sound_data = sound
-		audio_data = sound_data["data"]
-		# Adjust volume
-		volume = self._compute_volume()
-		adjusted_audio = [sample * volume for sample in audio_data]
-
-		# Process with Steam Audio for 3D positioning (without reverb)
-		processed_audio = self.steam_audio.process_sound(
-			adjusted_audio, angle_x, angle_y
-		)
-		if not processed_audio:
+		latency.mark("location")
+		key = self._render_key(sound, angle_x, angle_y, settings)
+		final_audio = self.render_cache.get(key)
+		latency.mark("gain")
+		if final_audio is None:
+			if self.stream_rendering and len(sound) > STREAM_MIN_BLOCKS * self.steam_audio.frame_size:
+				first_part = self._first_stream_part(len(sound))
+				if first_part:
+					self._play_streamed(key, group, priority, first_part)
+					return
+			start = time.perf_counter()
+			final_audio = self._render(key)
+			self.render_cost.record(len(sound), time.perf_counter() - start)
+			latency.mark("render")
+			if not final_audio:
+				return
+
+		# Play the final audio
+		self._play_audio_data(final_audio, group, priority)
+		latency.finish("queue")
+
+	def _play_streamed(self, key, group, priority, first_part):
+		"""Render and play a sound part by part, starting it once its first part is rendered.
+
+		Only the first part is rendered here, the stream renderer renders the rest while it
+		plays, see _stream_rest.
+		"""
+		start = time.perf_counter()
+		first_block = self._render_part(key, key.sound.samples[:first_part])
+		latency.mark("render")
+		if not first_block:
 			return
+		stream = self._output.open_stream(first_block, priority=priority, group=group)
+		latency.finish("queue")
+		queued_at = time.perf_counter()
+		self.first_block_times.append(queued_at - start)
+		log.debug(f"First block of a streamed sound queued in {self.first_block_times[-1] * 1000:.2f} ms")
+		self._stream_renderer.submit(self._stream_rest(key, stream, first_block, first_part, queued_at), group)
+
+	def _stream_rest(self, key, stream, first_block, rendered, queued_at):
+		"""Render the rest of a streamed sound, one part per step. Runs on the stream renderer.
+
+		Parts are whole numbers of Steam Audio frames, rendered in order, so the effects carry
+		their state from one part to the next as within a single render. Each part is sized to
+		render before the audio queued ahead of it runs out, see _next_stream_part. The parts
+		are joined into the render cache once the last one is rendered.
+		"""
+		samples = key.sound.samples
+		length = len(samples)
+		parts = [first_block]
+		try:
+			while rendered < length:
+				if stream.voice is not None and stream.voice.fading:
+					# Superseded by another sound, the rest would never be heard.
+					return
+				ahead = rendered / SAMPLE_RATE - (time.perf_counter() - queued_at)
+				# Rendering fell behind playback: render the rest at once, in as few calls as possible.
+				part = self._next_stream_part(ahead, length - rendered) or length - rendered
+				audio = self._render_part(key, samples[rendered : rendered + part])
+				if not audio:
+					return
+				parts.append(audio)
+				rendered += part
+				self._output.extend_stream(stream, audio, final=rendered >= length)
+				yield
+			self.render_cache.put(key, b"".join(parts))
+		finally:
+			if rendered < length:
+				self._output.extend_stream(stream, b"", final=True)
+
+	def _render_part(self, key, samples):
+		"""Render part of the sound described by key, recording how long it took."""
+		start = time.perf_counter()
+		audio = self.steam_audio.render(
+			samples, key.volume, key.angle_x, key.angle_y, reverb=key.reverb is not None
+		)
+		self.render_cost.record(len(samples), time.perf_counter() - start)
+		return audio
+
+	def _first_stream_part(self, length):
+		"""Return how many samples of a sound to render before starting it, or None to render it at once.
 
-		# Apply reverb if enabled
-		final_audio = processed_audio
-		if config.conf["unspoken"]["Reverb"]:
-			reverb_audio = self.steam_audio.apply_reverb(processed_audio)
-			if reverb_audio:
-				final_audio = reverb_audio
+		The first part is the shortest number of frames after which the rest of the sound is
+		estimated to render in parts that keep ahead of playback. Sounds are not streamed
+		before anything was rendered, or when the first part would be most of the sound.
+		"""
+		if not self.render_cost.known:
+			return None
+		first = self.steam_audio.frame_size
+		while first * 2 <= length:
+			ahead = first / SAMPLE_RATE
+			rendered = first
+			while rendered < length:
+				part = self._next_stream_part(ahead, length - rendered)
+				if not part:
+					break
+				ahead += part / SAMPLE_RATE - self.render_cost.estimate(part) * STREAM_MARGIN
+				rendered += part
 			else:
-				pass
+				return first
+			first *= 2
+		return None
+
+	def _next_stream_part(self, ahead, remaining):
+		"""Return the most samples, in whole frames and up to remaining, that render in time.
+
+		ahead is the audio, in seconds, queued for the sound but not yet played. The output
+		mixes that much of it in advance, and the rest must allow for the part to render with
+		STREAM_MARGIN to spare. Returns 0 if not even one frame would.
+		"""
+		frame_size = self.steam_audio.frame_size
+		budget = (ahead - self._output.lead) / STREAM_MARGIN - self.render_cost.per_call
+		if budget <= 0:
+			return 0
+		per_sample = self.render_cost.per_sample
+		if per_sample <= 0:
+			return min(remaining, STREAM_MAX_PART_BLOCKS * frame_size)
+		part = min(int(budget / per_sample) // frame_size, STREAM_MAX_PART_BLOCKS) * frame_size
+		if part >= remaining:
+			return remaining
+		return part
+
+	def _render_key(self, sound, angle_x, angle_y, settings=None):
+		settings = settings or self.settings
+		return self.render_cache.make_key(
+			sound,
+			angle_x,
+			angle_y,
+			self.compute_volume(settings),
+			settings.reverb_key,
+			settings.audio3d,
+		)
 
-		# Play the final audio
-		self.wave_player.stop()
-		self._play_audio_data(final_audio)
+	def _render(self, key):
+		"""Render the sound described by key with Steam Audio and cache the result."""
+		# Apply volume, 3D positioning and reverb
+		final_audio = self.steam_audio.render(
+			key.sound, key.volume, key.angle_x, key.angle_y, reverb=key.reverb is not None
+		)
+		if final_audio:
+			self.render_cache.put(key, final_audio)
+		return final_audio
+
+	def prerender(self, sound, angle_x, angle_y, volume, settings):
+		"""Render a sound at the given position into the render cache, unless already there.
+
+		volume and settings are taken on NVDA's main thread, see compute_volume, as this runs
+		on the pre-rendering threads. Returns True if the sound was rendered.
+		"""
+		key = self.render_cache.make_key(
+			sound, angle_x, angle_y, volume, settings.reverb_key, settings.audio3d
+		)
+		if key in self.render_cache:
+			return False
+		return bool(self._render(key))
+
+	def prerender_positions(self, azimuth_step, elevation_step):
+		"""Return a grid of positions covering the audio display, see prerender.grid_positions."""
+		return grid_positions(
+			azimuth_step,
+			elevation_step,
+			self.spatial.height_min,
+			self.spatial.height_min + self.spatial.height_magnitude,
+		)
 
 	def play_file(self, path):
 		sound = self.make_sound_object(path)
 		if not sound:
 			return
-		# Process audio with Steam Audio
-		audio_data = sound["data"]
-		# Adjust volume
-		volume = self._compute_volume()
-		adjusted_audio = [sample * volume for sample in audio_data]
-
-		if self.audio3d:
-			# Process with Steam Audio for 3D positioning (without reverb)
-			processed_audio = self.steam_audio.process_sound(
-				adjusted_audio, 0, 0
-			)
-			if not processed_audio:
+		volume = self.compute_volume()
+		if self.settings.audio3d:
+			final_audio = self.steam_audio.render(sound, volume, 0, 0, reverb=self.settings.reverb)
+			if not final_audio:
 				return
-
-			# Apply reverb if enabled
-			final_audio = processed_audio
-			if config.conf["unspoken"]["Reverb"]:
-				reverb_audio = self.steam_audio.apply_reverb(processed_audio)
-				if reverb_audio:
-					final_audio = reverb_audio
-				else:
-					pass
 		else:
-			# convert to stereo 16-bit
-			final_audio = b""
-			for sample in adjusted_audio:
-				sample = int(sample * 32767)
-				final_audio += struct.pack("<h", sample)
-				final_audio += struct.pack("<h", sample)
+			final_audio = sound.stereo_pcm(volume)
 
 		# Play the final audio
-		self.wave_player.stop()
-		self._play_audio_data(final_audio)
+		self._play_audio_data(final_audio, PREVIEW_GROUP)
 
 	def terminate(self):
+		if hasattr(self, "_stream_renderer"):
+			self._stream_renderer.close(timeout=1.0)
 		# Close WavePlayer
-		if hasattr(self, "wave_player"):
-			try:
-				self.wave_player.close()
-			except:
-				pass
+		if hasattr(self, "_output"):
+			self._output.close(timeout=1.0)
 
 		# Cleanup Steam Audio
 		if hasattr(self, "steam_audio"):
 			self.steam_audio.cleanup()
-		synthChanged.unregister(self.on_synthChanged)
+		# Set by observe
+		if getattr(self, "spatial", None) is not None:
+			synthChanged.unregister(self.on_synthChanged)
+			self.synth_volume.terminate()
+			self.say_all.terminate()
+			self.spatial.terminate()
 
 	def on_synthChanged(self):
-		self.wave_player.close()
-		self.create_wave_player()
+		self._output.reset_device()
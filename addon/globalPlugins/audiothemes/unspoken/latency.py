@@ -0,0 +1,130 @@
+"""
+Latency instrumentation for the event to sound path
+Collects per-stage timings with a monotonic clock and reports their percentiles
+"""
+
+import threading
+import time
+from collections import deque
+
+# Stages of a play, in the order they happen
+STAGES = (
+	"event",  # event handler, up to playObject
+	"resolve",  # sound resolution for the object's role, states and order
+	"foreground",  # foreground application check
+	"location",  # object location and angle computation
+	"gain",  # volume computation and render cache lookup
+	"render",  # Steam Audio positioning and reverb, on a render cache miss
+	"queue",  # handing the audio to the output worker
+	"feed",  # from queueing to the audio being fed to the device, on the output thread
+	"heard",  # from queueing to the audio starting to play, after what the device already held
+	"total",  # from the event to queueing
+)
+PERCENTILES = (50, 95, 99)
+
+
+class StageHistogram:
+	"""Durations of one stage over a sliding window of recent plays."""
+
+	__slots__ = ("samples", "count")
+
+	def __init__(self, window):
+		self.samples = deque(maxlen=window)
+		self.count = 0
+
+	def add(self, seconds):
+		self.samples.append(seconds)
+		self.count += 1
+
+	def percentiles(self, percentiles=PERCENTILES):
+		"""Return {percentile: seconds} using the nearest rank method."""
+		ordered = sorted(self.samples)
+		if not ordered:
+			return {}
+		return {p: ordered[min(len(ordered) - 1, max(0, -(-p * len(ordered) // 100) - 1))] for p in percentiles}
+
+
+class LatencyTracker:
+	"""Times the stages of the play path.
+
+	The path runs on NVDA's main thread: begin is called when an event arrives, and mark at the
+	end of each stage records the time since the previous mark. Stages on other threads report
+	their durations with record. Everything is a no-op while enabled is False.
+	"""
+
+	def __init__(self, window=1024):
+		self.enabled = False
+		self.window = window
+		self._histograms = {}
+		self._start = 0.0
+		self._last = 0.0
+		self._lock = threading.Lock()
+
+	def begin(self):
+		"""Start timing a new play."""
+		if not self.enabled:
+			return
+		self._start = self._last = time.perf_counter()
+
+	def mark(self, stage):
+		"""Record the time since the previous mark (or begin) as the duration of stage."""
+		if not self.enabled or not self._start:
+			return
+		now = time.perf_counter()
+		self.record(stage, now - self._last)
+		self._last = now
+
+	def finish(self, stage):
+		"""Mark stage and record the whole play under "total"."""
+		if not self.enabled or not self._start:
+			return
+		self.mark(stage)
+		self.record("total", self._last - self._start)
+		self._start = 0.0
+
+	def record(self, stage, seconds):
+		"""Record a duration measured elsewhere."""
+		if not self.enabled:
+			return
+		with self._lock:
+			histogram = self._histograms.get(stage)
+			if histogram is None:
+				histogram = self._histograms[stage] = StageHistogram(self.window)
+			histogram.add(seconds)
+
+	def reset(self):
+		with self._lock:
+			self._histograms.clear()
+		self._start = 0.0
+
+	def summary(self):
+		"""Return {stage: {"count": n, "p50": seconds, ...}} for every stage with data."""
+		with self._lock:
+			histograms = dict(self._histograms)
+		ordered = sorted(
+			histograms.items(), key=lambda item: STAGES.index(item[0]) if item[0] in STAGES else len(STAGES)
+		)
+		result = {}
+		for stage, histogram in ordered:
+			stats = {"count": histogram.count}
+			for percentile, seconds in histogram.percentiles().items():
+				stats[f"p{percentile}"] = seconds
+			result[stage] = stats
+		return result
+
+	def format_summary(self):
+		"""Return the summary as a table with durations in milliseconds."""
+		summary = self.summary()
+		if not summary:
+			return "No latency data recorded"
+		header = "{:<12}{:>8}".format("stage", "count") + "".join(f"{f'p{p} ms':>10}" for p in PERCENTILES)
+		lines = [header]
+		for stage, stats in summary.items():
+			line = f"{stage:<12}{stats['count']:>8}"
+			line += "".join(f"{stats[f'p{p}'] * 1000:>10.3f}" for p in PERCENTILES)
+			lines.append(line)
+		return "\n".join(lines)
+
+
+# Shared by the plugin, the handler, the player and the output worker
+tracker = LatencyTracker()
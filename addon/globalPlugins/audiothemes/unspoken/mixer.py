@@ -0,0 +1,198 @@
+"""
+Software mixer for overlapping sounds
+Mixes a small number of voices into one stream of 16-bit stereo blocks
+"""
+
+import itertools
+from array import array
+from collections import deque
+from operator import add, mul
+
+CHANNELS = 2
+# Length of the fade applied to a voice that is stopped or preempted, in frames (about 6 ms at 44.1 kHz)
+FADE_FRAMES = 256
+
+_FADE_RAMP = array(
+	"f", (1.0 - frame / FADE_FRAMES for frame in range(FADE_FRAMES) for _channel in range(CHANNELS))
+)
+
+
+def _clip(samples):
+	"""Convert mixed samples to a 16-bit array, saturating instead of wrapping."""
+	return array(
+		"h",
+		map(int, map(max, itertools.repeat(-32768.0), map(min, itertools.repeat(32767.0), samples))),
+	)
+
+
+class Voice:
+	"""One sound playing in the mixer.
+
+	A streaming voice is still receiving audio through append, and only ends once
+	end_stream has been called and everything appended has played.
+	"""
+
+	__slots__ = (
+		"_segments",
+		"_offset",
+		"position",
+		"length",
+		"end",
+		"streaming",
+		"gain",
+		"priority",
+		"group",
+		"serial",
+		"fade_start",
+	)
+
+	def __init__(self, data, gain, priority, group, serial, streaming=False):
+		self._segments = deque()
+		self._offset = 0
+		self.position = 0
+		self.length = 0
+		self.end = None
+		self.streaming = streaming
+		self.gain = gain
+		self.priority = priority
+		self.group = group
+		self.serial = serial
+		self.fade_start = None
+		self.append(data)
+
+	def append(self, data):
+		"""Queue more 16-bit stereo audio after what this voice already holds."""
+		samples = memoryview(data).cast("B").cast("h")
+		if samples:
+			self._segments.append(samples)
+			self.length += len(samples)
+
+	def end_stream(self):
+		self.streaming = False
+
+	@property
+	def fading(self):
+		return self.fade_start is not None
+
+	@property
+	def limit(self):
+		return self.length if self.end is None else min(self.length, self.end)
+
+	@property
+	def finished(self):
+		return not self.streaming and self.position >= self.limit
+
+	def fade_out(self):
+		"""Fade this voice to silence over FADE_FRAMES, then end it."""
+		if self.fade_start is None:
+			self.fade_start = self.position
+			self.end = self.position + len(_FADE_RAMP)
+			self.streaming = False
+
+	def _read(self, count):
+		parts = []
+		while count > 0 and self._segments:
+			segment = self._segments[0]
+			part = segment[self._offset : self._offset + count]
+			parts.append(part)
+			count -= len(part)
+			self._offset += len(part)
+			if self._offset >= len(segment):
+				self._segments.popleft()
+				self._offset = 0
+		if len(parts) == 1:
+			return parts[0]
+		return memoryview(b"".join(parts)).cast("h")
+
+	def take(self, count):
+		"""Return up to count samples with gain and fading applied, advancing the voice."""
+		start = self.position
+		chunk = self._read(min(count, self.limit - start))
+		self.position += len(chunk)
+		if self.fade_start is not None:
+			offset = start - self.fade_start
+			samples = map(mul, chunk, _FADE_RAMP[offset : offset + len(chunk)])
+		else:
+			samples = chunk
+		if self.gain != 1.0:
+			samples = map(self.gain.__mul__, samples)
+		return list(samples) if samples is not chunk else chunk
+
+
+class Mixer:
+	"""Mixes up to max_voices sounds into blocks of block_frames frames.
+
+	Starting a sound fades out the others of its group. When all voices are busy, the least
+	important one (lowest priority, then oldest) is faded out to make room, unless the new
+	sound is less important than every playing one, in which case it is dropped.
+	"""
+
+	def __init__(self, max_voices=4, block_frames=512):
+		self.max_voices = max_voices
+		self.block_frames = block_frames
+		self.preempted = 0
+		self.dropped = 0
+		self._voices = []
+		self._serial = itertools.count()
+
+	@property
+	def active(self):
+		return bool(self._voices)
+
+	def add(self, data, gain=1.0, priority=0, group=None, streaming=False):
+		"""Start playing data (16-bit stereo PCM). Returns the new Voice, or None if it was dropped.
+
+		With streaming set, the voice keeps waiting for more audio until Voice.end_stream is called.
+		"""
+		live = []
+		for voice in self._voices:
+			if group is not None and voice.group == group:
+				self._preempt(voice)
+			elif not voice.fading:
+				live.append(voice)
+		if len(live) >= self.max_voices:
+			victim = min(live, key=lambda voice: (voice.priority, voice.serial))
+			if victim.priority > priority:
+				self.dropped += 1
+				return None
+			self._preempt(victim)
+		voice = Voice(data, float(gain), priority, group, next(self._serial), streaming)
+		self._voices.append(voice)
+		return voice
+
+	def _preempt(self, voice):
+		if not voice.fading:
+			voice.fade_out()
+			self.preempted += 1
+
+	def stop(self):
+		"""Fade out every voice."""
+		for voice in self._voices:
+			voice.fade_out()
+
+	def clear(self):
+		"""Drop every voice immediately."""
+		self._voices.clear()
+
+	def mix(self):
+		"""Return the next block of mixed audio as bytes, or None when nothing is playing."""
+		voices = self._voices
+		if not voices:
+			return None
+		count = self.block_frames * CHANNELS
+		if len(voices) == 1 and voices[0].gain == 1.0 and not voices[0].fading:
+			# Nothing to mix, pass the audio through untouched.
+			block = voices[0].take(count).tobytes()
+		else:
+			mixed = None
+			for voice in voices:
+				chunk = voice.take(count)
+				if mixed is None:
+					mixed = list(chunk)
+					continue
+				if len(chunk) > len(mixed):
+					mixed, chunk = list(chunk), mixed
+				mixed[: len(chunk)] = map(add, mixed, chunk)
+			block = _clip(mixed).tobytes()
+		self._voices = [voice for voice in voices if not voice.finished]
+		return block
@@ -0,0 +1,250 @@
+"""
+Audio output worker
+A single long-lived thread owns the WavePlayer and the mixer, and receives commands over a bounded queue
+"""
+
+import queue
+import threading
+import time
+
+try:
+	from logHandler import log
+except ImportError:
+	import logging as log
+
+from .mixer import CHANNELS, Mixer
+from .latency import tracker as latency
+
+SAMPLE_RATE = 44100
+# Bytes per second of 16-bit stereo audio
+_BYTE_RATE = SAMPLE_RATE * CHANNELS * 2
+# How far ahead of the device the mixed stream is kept, in seconds. Anything fed is committed,
+# so this is also the longest a new sound waits behind audio that is already queued, and the
+# mixer is fed just in time: STREAM_LEAD keeps one to two 512 frame blocks on the device. The
+# worker doubles the lead, up to STREAM_LEAD_MAX, each time the device runs dry mid-sound
+# because the thread could not run in time, e.g. while NVDA's main thread holds the GIL.
+STREAM_LEAD = 0.015
+STREAM_LEAD_MAX = 0.06
+# Fraction of the extra lead kept after each sound that played without an underrun
+_LEAD_DECAY = 0.5
+
+_PLAY = "play"
+_EXTEND = "extend"
+_STOP = "stop"
+_RESET = "reset"
+_CLOSE = "close"
+
+
+def _timestamp():
+	return time.perf_counter() if latency.enabled else None
+
+
+class AudioStream:
+	"""Handle to a sound that started playing before all of its audio was rendered."""
+
+	__slots__ = ("voice",)
+
+	def __init__(self):
+		# Set by the worker thread once the sound reaches the mixer
+		self.voice = None
+
+
+class AudioOutputWorker(threading.Thread):
+	"""Plays audio on a dedicated thread.
+
+	All access to the WavePlayer happens on this thread. Sounds are added to a Mixer, whose
+	output is fed to the device block by block, a little ahead of real time, for as long as
+	anything is playing. The device is never stopped to start a new sound.
+	"""
+
+	def __init__(self, create_player, max_pending=16, mixer=None):
+		"""
+		Args:
+		    create_player: Callable returning a new nvwave.WavePlayer, called on the worker thread
+		    max_pending: Maximum number of queued commands
+		    mixer: The Mixer to play through, a default one is created if None
+		"""
+		super().__init__(name="AudioThemesOutput", daemon=True)
+		self.create_player = create_player
+		self.mixer = mixer or Mixer()
+		self.wave_player = None
+		self.played = 0
+		self.coalesced = 0
+		self.dropped = 0
+		# Times the device ran dry while a sound was still playing, and the silence that caused
+		self.underruns = 0
+		self.underrun_time = 0.0
+		# Current lead, between STREAM_LEAD and STREAM_LEAD_MAX
+		self.lead = STREAM_LEAD
+		self._queue = queue.Queue(maxsize=max_pending)
+		# Monotonic time at which the audio fed so far will have finished playing
+		self._stream_end = 0.0
+		# Set when a streaming voice ran out of audio before its next part arrived
+		self._starved = False
+		# Whether a sound was still playing after the last feed, and whether one underran since
+		# the device was last idle
+		self._playing = False
+		self._underran = False
+		# Queueing times of sounds not yet fed to the device, when timing latency
+		self._awaiting_feed = []
+
+	def play(self, data, gain=1.0, priority=0, group=None):
+		"""Play data, which must be 16-bit stereo PCM. See Mixer.add for the other arguments."""
+		self._submit(_PLAY, (data, gain, priority, group, None, _timestamp()))
+
+	def open_stream(self, data, gain=1.0, priority=0, group=None):
+		"""Start playing the first part of a sound, returning an AudioStream for the rest.
+
+		The stream must be ended with extend_stream(final=True).
+		"""
+		stream = AudioStream()
+		self._submit(_PLAY, (data, gain, priority, group, stream, _timestamp()))
+		return stream
+
+	def extend_stream(self, stream, data, final=True):
+		"""Append audio to a sound started with open_stream."""
+		# Never dropped, or the sound would wait for the rest forever.
+		self._queue.put((_EXTEND, (stream, data, final)))
+
+	def _submit(self, command, data):
+		try:
+			self._queue.put_nowait((command, data))
+		except queue.Full:
+			# The worker is far behind, this request would be stale by the time it is handled.
+			self.dropped += 1
+
+	def stop(self):
+		"""Fade out everything that is playing and drop pending requests."""
+		self._queue.put((_STOP, None))
+
+	def reset_device(self):
+		"""Close the WavePlayer and open a new one, e.g. after the output device changed."""
+		self._queue.put((_RESET, None))
+
+	def flush(self):
+		"""Wait until every queued command has been handled."""
+		self._queue.join()
+
+	def close(self, timeout=None):
+		"""Stop playback, close the WavePlayer and end the thread."""
+		self._queue.put((_CLOSE, None))
+		self.join(timeout)
+
+	def run(self):
+		while True:
+			timeout = None
+			if self._starved:
+				# Wait for more audio, but not past the next block.
+				timeout = self.mixer.block_frames / SAMPLE_RATE
+			elif self.mixer.active:
+				# Wake up when the stream needs topping up.
+				timeout = max(self._stream_end - self.lead - time.monotonic(), 0.0)
+			commands = []
+			try:
+				commands.append(self._queue.get(timeout=timeout))
+			except queue.Empty:
+				pass
+			# Coalesce everything that piled up while we were busy.
+			while True:
+				try:
+					commands.append(self._queue.get_nowait())
+				except queue.Empty:
+					break
+			try:
+				if not self._handle(commands):
+					return
+				self._feed()
+			except Exception:
+				log.exception("Failed to play audio")
+			finally:
+				for _command in commands:
+					self._queue.task_done()
+
+	def _handle(self, commands):
+		"""Apply a batch of commands. Returns False once the worker should exit."""
+		plays = {}
+		extends = []
+		stop = reset = False
+		for command, data in commands:
+			if command == _PLAY:
+				group = data[3]
+				if group is not None and group in plays:
+					self.coalesced += 1
+				# Plays without a group never supersede each other.
+				plays[group if group is not None else object()] = data
+			elif command == _EXTEND:
+				extends.append(data)
+			elif command == _STOP:
+				plays.clear()
+				stop = True
+			elif command == _RESET:
+				reset = True
+			elif command == _CLOSE:
+				self.mixer.clear()
+				self._close_player()
+				return False
+		if reset:
+			self.mixer.clear()
+			self._close_player()
+		if stop:
+			self.mixer.stop()
+		for data, gain, priority, group, stream, queued_at in plays.values():
+			voice = self.mixer.add(data, gain, priority, group, streaming=stream is not None)
+			if stream is not None:
+				stream.voice = voice
+			if queued_at is not None:
+				self._awaiting_feed.append(queued_at)
+			self.played += 1
+		for stream, data, final in extends:
+			# The voice is None if the sound was superseded before it started.
+			if stream.voice is not None and not stream.voice.fading:
+				stream.voice.append(data)
+				if final:
+					stream.voice.end_stream()
+		return True
+
+	def _feed(self):
+		"""Top up the device with mixed blocks until the stream is self.lead ahead."""
+		now = time.monotonic()
+		if self._stream_end < now:
+			if self._playing:
+				# The device ran dry in the middle of a sound, keep more audio queued from now on.
+				self.underruns += 1
+				self.underrun_time += now - self._stream_end
+				self.lead = min(self.lead * 2, STREAM_LEAD_MAX)
+				self._underran = True
+			# Start again from the present.
+			self._stream_end = now
+		self._starved = False
+		while self.mixer.active and self._stream_end - now < self.lead:
+			block = self.mixer.mix()
+			if not block:
+				self._starved = self.mixer.active
+				break
+			if self.wave_player is None:
+				self.wave_player = self.create_player()
+			self.wave_player.feed(block)
+			if self._awaiting_feed:
+				fed_at = time.perf_counter()
+				# New sounds start at this block, after the audio already on the device.
+				ahead = self._stream_end - now
+				for queued_at in self._awaiting_feed:
+					latency.record("feed", fed_at - queued_at)
+					latency.record("heard", fed_at - queued_at + ahead)
+				self._awaiting_feed.clear()
+			self._stream_end += len(block) / _BYTE_RATE
+			now = time.monotonic()
+		if self._playing and not self.mixer.active:
+			# Everything has been fed, give back some of the extra lead if it was not needed.
+			if not self._underran:
+				self.lead = max(STREAM_LEAD, STREAM_LEAD + (self.lead - STREAM_LEAD) * _LEAD_DECAY)
+			self._underran = False
+		self._playing = self.mixer.active
+
+	def _close_player(self):
+		if self.wave_player is not None:
+			try:
+				self.wave_player.close()
+			except Exception:
+				log.debugWarning("Error closing WavePlayer", exc_info=True)
+			self.wave_player = None
@@ -0,0 +1,137 @@
+"""
+Persistent cache of decoded theme sounds
+Keeps each sound's float32 samples in a file of its own, memory-mapped on later loads instead of decoding the wave file again
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+import sys
+
+from .sound_buffer import SoundBuffer
+
+try:
+	from logHandler import log
+except ImportError:
+	import logging as log
+
+_MAGIC = b"ATPC"
+_VERSION = 1
+# magic, version, sample rate, sample count, source size, source mtime in ns, source content hash
+_HEADER = struct.Struct("<4sIIQQq16s")
+# Samples start here, so the float32 view over the mapping is aligned
+_DATA_OFFSET = 64
+_SUFFIX = ".pcm"
+
+
+def _content_hash(path):
+	digest = hashlib.blake2b(digest_size=16)
+	with open(path, "rb") as f:
+		for chunk in iter(lambda: f.read(1 << 16), b""):
+			digest.update(chunk)
+	return digest.digest()
+
+
+class PCMCache:
+	"""Decoded sounds on disk, keyed by the source file's path, size, modification time and content.
+
+	A sound whose file size and modification time match its entry is memory-mapped straight
+	away. When they do not match, the file's content hash decides whether the entry still
+	holds its samples. Entries are mapped copy-on-write, so they can be handed to Steam
+	Audio without a copy and are never written through. Once the entries take more than
+	max_bytes, prune removes the least recently loaded ones.
+	"""
+
+	def __init__(self, directory, max_bytes=64 * 1024 * 1024):
+		self.directory = directory
+		self.max_bytes = max_bytes
+		self.hits = 0
+		self.misses = 0
+
+	def _entry_path(self, path):
+		key = os.path.normcase(os.path.abspath(path)).encode("utf-8", "surrogatepass")
+		return os.path.join(self.directory, hashlib.sha1(key).hexdigest() + _SUFFIX)
+
+	def load(self, path):
+		"""Return the SoundBuffer for a wave file, from the cache when it is current."""
+		stat = os.stat(path)
+		entry_path = self._entry_path(path)
+		sound = self._map(path, entry_path, stat)
+		if sound is not None:
+			self.hits += 1
+			return sound
+		self.misses += 1
+		sound = SoundBuffer.from_wave(path)
+		try:
+			self._store(entry_path, sound, stat, _content_hash(path))
+		except OSError:
+			log.debugWarning(f"Could not cache the decoded samples of {path}", exc_info=True)
+		return sound
+
+	def _map(self, path, entry_path, stat):
+		try:
+			with open(entry_path, "r+b") as f:
+				header = _HEADER.unpack(f.read(_HEADER.size))
+				magic, version, sample_rate, count, size, mtime_ns, content_hash = header
+				if magic != _MAGIC or version != _VERSION or sys.byteorder != "little":
+					return None
+				if (size, mtime_ns) != (stat.st_size, stat.st_mtime_ns):
+					if _content_hash(path) != content_hash:
+						return None
+					# Same content, touched or copied: remember the new stat.
+					f.seek(0)
+					f.write(_HEADER.pack(magic, version, sample_rate, count, stat.st_size, stat.st_mtime_ns, content_hash))
+				if count == 0 or os.fstat(f.fileno()).st_size < _DATA_OFFSET + count * 4:
+					return None
+				mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+			# Loading counts as using, for prune.
+			os.utime(entry_path)
+		except (OSError, ValueError, struct.error):
+			return None
+		samples = memoryview(mapping)[_DATA_OFFSET : _DATA_OFFSET + count * 4]
+		return SoundBuffer(samples, sample_rate, path=path)
+
+	def _store(self, entry_path, sound, stat, content_hash):
+		os.makedirs(self.directory, exist_ok=True)
+		header = _HEADER.pack(
+			_MAGIC, _VERSION, sound.sample_rate, len(sound), stat.st_size, stat.st_mtime_ns, content_hash
+		)
+		temp_path = entry_path + ".tmp"
+		with open(temp_path, "wb") as f:
+			f.write(header.ljust(_DATA_OFFSET, b"\0"))
+			f.write(sound.samples)
+		# Fails on Windows while the old entry is still mapped, it is then replaced on a later load.
+		try:
+			os.replace(temp_path, entry_path)
+		except OSError:
+			os.remove(temp_path)
+			raise
+
+	def prune(self):
+		"""Remove the least recently loaded entries until they fit in max_bytes."""
+		try:
+			entries = [
+				(entry.stat().st_mtime, entry.stat().st_size, entry.path)
+				for entry in os.scandir(self.directory)
+				if entry.name.endswith(_SUFFIX)
+			]
+		except OSError:
+			return
+		total = sum(size for _, size, _ in entries)
+		for _, size, entry_path in sorted(entries):
+			if total <= self.max_bytes:
+				break
+			try:
+				os.remove(entry_path)
+			except OSError:
+				# Still mapped by a loaded sound
+				continue
+			total -= size
+
+	def clear(self):
+		max_bytes, self.max_bytes = self.max_bytes, 0
+		try:
+			self.prune()
+		finally:
+			self.max_bytes = max_bytes
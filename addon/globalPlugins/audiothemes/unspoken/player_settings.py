@@ -0,0 +1,203 @@
+"""
+Settings snapshot for the play path
+Configuration is read once when it changes, so playing a sound only reads plain attributes
+"""
+
+import dataclasses
+import itertools
+import threading
+import time
+from dataclasses import dataclass, field
+
+import config
+import speech
+from speech.sayAll import SayAllHandler
+from synthDriverHandler import synthChanged
+
+_versions = itertools.count(1)
+
+
+@dataclass(frozen=True, slots=True)
+class PlayerSettings:
+	"""An immutable snapshot of the settings UnspokenPlayer reads while playing.
+
+	Reverb levels are percentages, as stored in the configuration. Every snapshot gets a new
+	version number, so anything derived from the settings can be cached against it.
+	"""
+
+	audio3d: bool = True
+	use_in_say_all: bool = True
+	speak_roles: bool = False
+	use_synth_volume: bool = True
+	volume: int = 100
+	no_sounds: bool = False
+	hrtf: bool = True
+	reverb: bool = True
+	room_size: int = 10
+	damping: int = 100
+	wet_level: int = 9
+	dry_level: int = 30
+	width: int = 100
+	version: int = field(default_factory=lambda: next(_versions), compare=False)
+	# Reverb part of render cache keys: the reverb levels, or None with reverb off
+	reverb_key: tuple | None = field(init=False, compare=False, default=None)
+
+	def __post_init__(self):
+		object.__setattr__(self, "reverb_key", self.reverb_params if self.reverb else None)
+
+	@property
+	def reverb_params(self):
+		return (self.room_size, self.damping, self.wet_level, self.dry_level, self.width)
+
+	def replace(self, **changes):
+		"""Return a new snapshot, with a new version, of these settings with changes."""
+		return dataclasses.replace(self, version=next(_versions), **changes)
+
+	@classmethod
+	def from_config(cls, **overrides):
+		"""Snapshot config.conf["unspoken"], overrides supply the settings stored elsewhere."""
+		unspoken_config = config.conf["unspoken"]
+		values = {
+			"no_sounds": unspoken_config["noSounds"],
+			"hrtf": unspoken_config["HRTF"],
+			"reverb": unspoken_config["Reverb"],
+			"room_size": unspoken_config["RoomSize"],
+			"damping": unspoken_config["Damping"],
+			"wet_level": unspoken_config["WetLevel"],
+			"dry_level": unspoken_config["DryLevel"],
+			"width": unspoken_config["Width"],
+		}
+		values.update(overrides)
+		return cls(**values)
+
+
+class SynthVolumeObserver:
+	"""Keeps the synthesizer's volume at hand without asking the synth on every play.
+
+	The volume is read again after the synthesizer changes or invalidate is called, and
+	otherwise at most every ttl seconds: NVDA does not announce volume changes made with
+	the synth settings ring.
+	"""
+
+	def __init__(self, ttl=0.5):
+		self.ttl = ttl
+		self._volume = 100
+		self._expires = 0.0
+		synthChanged.register(self.invalidate)
+
+	def invalidate(self):
+		self._expires = 0.0
+
+	@property
+	def volume(self):
+		"""The synthesizer's volume in percent."""
+		now = time.monotonic()
+		if now >= self._expires:
+			self._volume = getattr(speech.speech.getSynth(), "volume", 100)
+			self._expires = now + self.ttl
+		return self._volume
+
+	def terminate(self):
+		synthChanged.unregister(self.invalidate)
+
+
+class _SayAllHooks:
+	"""Wraps SayAllHandler's readText, readObjects and stop once, however many observers use them.
+
+	The wrappers are installed by the first acquire and removed by the last release. They keep
+	maybe_running up to date: set when say all starts, cleared when it is stopped.
+	"""
+
+	STARTS = ("readText", "readObjects")
+
+	def __init__(self):
+		self.maybe_running = True
+		# Whether both start notifications are there, see SayAllObserver.running
+		self.hooked = False
+		self._users = 0
+		self._originals = {}
+		self._wrappers = {}
+		self._lock = threading.Lock()
+
+	def acquire(self):
+		with self._lock:
+			self._users += 1
+			if self._users == 1:
+				self._install()
+
+	def release(self):
+		with self._lock:
+			if not self._users:
+				return
+			self._users -= 1
+			if not self._users:
+				self._uninstall()
+
+	def _install(self):
+		for name in self.STARTS + ("stop",):
+			original = getattr(SayAllHandler, name, None)
+			if original is None:
+				continue
+			wrapper = self._wrap(original, name != "stop")
+			self._originals[name] = original
+			self._wrappers[name] = wrapper
+			setattr(SayAllHandler, name, wrapper)
+		# Without both start notifications, always ask SayAllHandler.
+		self.hooked = all(name in self._originals for name in self.STARTS)
+		self.maybe_running = True
+
+	def _uninstall(self):
+		for name, original in self._originals.items():
+			# Leave a wrapper that was wrapped again after us in place, it still calls the original.
+			if getattr(SayAllHandler, name, None) is self._wrappers[name]:
+				setattr(SayAllHandler, name, original)
+		self._originals.clear()
+		self._wrappers.clear()
+		self.hooked = False
+		self.maybe_running = True
+
+	def _wrap(self, original, started):
+		def wrapper(*args, **kwargs):
+			if started:
+				self.maybe_running = True
+			try:
+				return original(*args, **kwargs)
+			finally:
+				if not started:
+					self.maybe_running = False
+
+		return wrapper
+
+
+_say_all_hooks = _SayAllHooks()
+
+
+class SayAllObserver:
+	"""Tells whether say all is running, without asking NVDA while it is known not to be.
+
+	SayAllHandler's readText and readObjects are wrapped to notice say all starting, and its
+	stop to notice it being stopped, once for all observers, see _SayAllHooks. Say all also
+	ends on its own at the end of the text, so while it may be running,
+	SayAllHandler.isRunning has the final say.
+	"""
+
+	def __init__(self):
+		_say_all_hooks.acquire()
+		self._acquired = True
+
+	@property
+	def running(self):
+		hooks = _say_all_hooks
+		if not self._acquired:
+			return SayAllHandler.isRunning()
+		if not hooks.maybe_running:
+			return False
+		running = SayAllHandler.isRunning()
+		if not running and hooks.hooked:
+			hooks.maybe_running = False
+		return running
+
+	def terminate(self):
+		if self._acquired:
+			self._acquired = False
+			_say_all_hooks.release()
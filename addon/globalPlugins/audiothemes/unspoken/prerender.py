@@ -0,0 +1,120 @@
+"""
+Background pre-rendering of theme sounds
+Fills the render cache ahead of time so the first plays at common positions need no DSP
+"""
+
+import ctypes
+import threading
+from contextlib import suppress
+
+try:
+	from logHandler import log
+except ImportError:
+	import logging as log
+
+from .render_cache import ANGLE_STEP, quantize
+
+# Windows THREAD_PRIORITY_LOWEST
+_THREAD_PRIORITY_LOWEST = -2
+# Pause between renders, so live plays always get the DLL and the GIL first.
+_RENDER_INTERVAL = 0.005
+
+
+def grid_positions(azimuth_step, elevation_step, elevation_min, elevation_max):
+	"""Return (angle_x, angle_y) grid points, nearest to the center of the display first.
+
+	Points are snapped to the render cache's angle step, so they are hit by live plays.
+	"""
+	azimuth_step = max(quantize(azimuth_step, ANGLE_STEP), ANGLE_STEP)
+	elevation_step = max(quantize(elevation_step, ANGLE_STEP), ANGLE_STEP)
+	azimuths = _frange(-90.0, 90.0, azimuth_step)
+	elevations = _frange(quantize(elevation_min, ANGLE_STEP), quantize(elevation_max, ANGLE_STEP), elevation_step)
+	elevation_center = (elevation_min + elevation_max) / 2.0
+	positions = {(x, y) for x in azimuths for y in elevations}
+	return sorted(positions, key=lambda pos: (abs(pos[0]) + abs(pos[1] - elevation_center), pos))
+
+
+def _frange(start, stop, step):
+	values = []
+	value = start
+	while value <= stop:
+		values.append(value)
+		value += step
+	if values[-1] != stop:
+		values.append(stop)
+	return values
+
+
+class PrerenderWorker(threading.Thread):
+	"""Renders sounds across a grid of positions on low priority threads.
+
+	Sounds are rendered in the given order, so callers should pass the most frequently
+	played ones first. The worker stops when asked to, or once the render cache holds
+	memory_cap bytes. When Steam Audio renders in engine contexts, threads render
+	concurrently, by default one less than there are contexts so live plays find a free one.
+
+	Sounds are rendered at volume with settings, both taken on NVDA's main thread by the
+	caller: the worker's threads never read the synth or the configuration. sounds is only
+	iterated by the worker's threads, so it can decode them as it goes, see
+	SoundBank.iter_preload.
+	"""
+
+	def __init__(self, player, sounds, positions, memory_cap, volume, settings, threads=None):
+		super().__init__(name="AudioThemesPrerender", daemon=True)
+		self.player = player
+		self.volume = volume
+		self.settings = settings
+		self.sounds = sounds
+		self.positions = positions
+		self.memory_cap = memory_cap
+		if threads is None:
+			contexts = player.steam_audio.contexts
+			threads = contexts.size - 1 if contexts is not None else 1
+		self.threads = max(threads, 1)
+		self.rendered = 0
+		self._stop_event = threading.Event()
+		self._lock = threading.Lock()
+		self._jobs = ((sound, x, y) for sound in sounds for x, y in positions)
+
+	def stop(self):
+		self._stop_event.set()
+
+	@property
+	def stopped(self):
+		return self._stop_event.is_set()
+
+	def run(self):
+		helpers = [
+			threading.Thread(target=self._render_jobs, name=f"{self.name}-{index}", daemon=True)
+			for index in range(1, self.threads)
+		]
+		for helper in helpers:
+			helper.start()
+		self._render_jobs()
+		for helper in helpers:
+			helper.join()
+		log.debug(f"Pre-rendered {self.rendered} sounds")
+
+	def _render_jobs(self):
+		with suppress(AttributeError, OSError):
+			kernel32 = ctypes.windll.kernel32
+			kernel32.SetThreadPriority(kernel32.GetCurrentThread(), _THREAD_PRIORITY_LOWEST)
+		cache = self.player.render_cache
+		while not self._stop_event.wait(_RENDER_INTERVAL):
+			if cache.size >= self.memory_cap:
+				log.debug(f"Pre-rendering stopped at the memory cap after {self.rendered} sounds")
+				self._stop_event.set()
+				return
+			with self._lock:
+				sound, angle_x, angle_y = next(self._jobs, (None, None, None))
+			if sound is None:
+				return
+			try:
+				rendered = self.player.prerender(sound, angle_x, angle_y, self.volume, self.settings)
+			except Exception:
+				log.exception("Error pre-rendering sound")
+				self._stop_event.set()
+				return
+			if rendered:
+				with self._lock:
+					self.rendered += 1
@@ -0,0 +1,132 @@
+"""
+Cache of fully rendered sounds
+Keeps the final stereo PCM of recent renders so repeated plays skip Steam Audio entirely
+"""
+
+import threading
+from collections import OrderedDict, namedtuple
+
+# Renders are cached for positions rounded to this many degrees, and volumes rounded to this step.
+ANGLE_STEP = 5.0
+VOLUME_STEP = 0.05
+# Default budget for the cached audio, in bytes.
+DEFAULT_MAX_BYTES = 16 * 1024 * 1024
+
+
+RenderKey = namedtuple("RenderKey", ("sound", "angle_x", "angle_y", "volume", "reverb", "audio3d"))
+RenderKey.__doc__ = """Identifies one rendering of a sound.
+
+`sound` is the SoundBuffer itself, `reverb` is a tuple of the reverb parameters or None when
+reverb is off. Angles and volume are already quantized, see quantize.
+"""
+
+
+def quantize(value, step):
+	"""Round value to the nearest multiple of step."""
+	return round(value / step) * step
+
+
+class RenderCache:
+	"""Least recently used cache of rendered sounds, bounded by their total size in bytes."""
+
+	def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+		self.max_bytes = max_bytes
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+		self._entries = OrderedDict()
+		self._size = 0
+		self._lock = threading.Lock()
+
+	@staticmethod
+	def make_key(sound, angle_x, angle_y, volume, reverb, audio3d):
+		"""Build a key for a render, quantizing the position and volume.
+
+		The quantized values in the returned key are the ones the sound should be rendered with.
+		"""
+		return RenderKey(
+			sound,
+			quantize(angle_x, ANGLE_STEP),
+			quantize(angle_y, ANGLE_STEP),
+			round(quantize(volume, VOLUME_STEP), 2),
+			reverb,
+			audio3d,
+		)
+
+	def __len__(self):
+		return len(self._entries)
+
+	def __contains__(self, key):
+		return key in self._entries
+
+	@property
+	def size(self):
+		"""Total size of the cached audio, in bytes."""
+		return self._size
+
+	def get(self, key):
+		"""Return the cached audio for key, or None."""
+		with self._lock:
+			data = self._entries.get(key)
+			if data is None:
+				self.misses += 1
+				return None
+			self._entries.move_to_end(key)
+			self.hits += 1
+			return data
+
+	def put(self, key, data):
+		"""Store rendered audio, evicting the least recently used entries to stay within budget."""
+		data = bytes(data)
+		if len(data) > self.max_bytes:
+			return
+		with self._lock:
+			previous = self._entries.pop(key, None)
+			if previous is not None:
+				self._size -= len(previous)
+			self._entries[key] = data
+			self._size += len(data)
+			self._evict()
+
+	def resize(self, max_bytes):
+		"""Change the budget, evicting the least recently used entries at once to stay within it."""
+		with self._lock:
+			self.max_bytes = max_bytes
+			self._evict()
+
+	def _evict(self):
+		while self._size > self.max_bytes:
+			_evicted_key, evicted = self._entries.popitem(last=False)
+			self._size -= len(evicted)
+			self.evictions += 1
+
+	def invalidate(self, predicate):
+		"""Drop every entry whose key satisfies predicate. Returns the number of dropped entries."""
+		with self._lock:
+			stale = [key for key in self._entries if predicate(key)]
+			for key in stale:
+				self._size -= len(self._entries.pop(key))
+		return len(stale)
+
+	def discard_sounds(self, sounds):
+		"""Drop every rendering of the given sounds."""
+		sounds = {id(sound) for sound in sounds}
+		return self.invalidate(lambda key: id(key.sound) in sounds)
+
+	def clear(self):
+		with self._lock:
+			self._entries.clear()
+			self._size = 0
+
+	def stats(self):
+		"""Return the cache counters as a dict."""
+		lookups = self.hits + self.misses
+		return {
+			"hits": self.hits,
+			"misses": self.misses,
+			"evictions": self.evictions,
+			"hit_rate": self.hits / lookups if lookups else 0.0,
+			"entries": len(self._entries),
+			"size": self._size,
+			"max_bytes": self.max_bytes,
+		}
@@ -0,0 +1,65 @@
+"""
+Render cost estimate
+Predicts how long Steam Audio takes to render a number of samples, from recent renders on the play path
+"""
+
+import threading
+
+
+class RenderCost:
+	"""Fits render time as a fixed cost per call plus a cost per sample.
+
+	Recent renders weigh more than old ones, so the estimate follows changes in load and
+	settings. Only renders made on the play path, NVDA's main thread and the stream renderer,
+	should be recorded: pre-rendering threads compete for the CPU and would make calls look
+	slower than they are there.
+	"""
+
+	def __init__(self, decay=0.9):
+		self.decay = decay
+		# Exponentially weighted sums for a least squares fit of seconds against samples
+		self._weight = 0.0
+		self._samples = 0.0
+		self._seconds = 0.0
+		self._samples_sq = 0.0
+		self._product = 0.0
+		self.per_call = 0.0
+		self.per_sample = None
+		# Renders are recorded from NVDA's main thread and from the stream renderer.
+		self._lock = threading.Lock()
+
+	@property
+	def known(self):
+		return self.per_sample is not None
+
+	def record(self, samples, seconds):
+		"""Add a render of samples that took seconds."""
+		with self._lock:
+			self._record(samples, seconds)
+
+	def _record(self, samples, seconds):
+		decay = self.decay
+		self._weight = self._weight * decay + 1.0
+		self._samples = self._samples * decay + samples
+		self._seconds = self._seconds * decay + seconds
+		self._samples_sq = self._samples_sq * decay + samples * samples
+		self._product = self._product * decay + samples * seconds
+		mean_samples = self._samples / self._weight
+		mean_seconds = self._seconds / self._weight
+		variance = self._samples_sq / self._weight - mean_samples * mean_samples
+		per_sample = None
+		if variance > 1e-9 * mean_samples * mean_samples:
+			per_sample = (self._product / self._weight - mean_samples * mean_seconds) / variance
+		if per_sample is None or per_sample < 0.0 or mean_seconds - per_sample * mean_samples < 0.0:
+			# Renders of a single length, or a fit that makes no sense: charge it all per sample.
+			self.per_sample = mean_seconds / mean_samples if mean_samples else 0.0
+			self.per_call = 0.0
+		else:
+			self.per_sample = per_sample
+			self.per_call = mean_seconds - per_sample * mean_samples
+
+	def estimate(self, samples):
+		"""Seconds a render of samples is expected to take, None before anything was recorded."""
+		if self.per_sample is None:
+			return None
+		return self.per_call + self.per_sample * samples
@@ -0,0 +1,410 @@
+"""
+Out-of-process rendering
+Runs Steam Audio and a bank of theme sounds in a separate Python process, so DSP and sample loops
+do not hold NVDA's GIL. Rendered audio comes back through shared memory.
+
+This is not a latency feature: each render is a round trip to the server, and renders wait for
+one another, so plays that miss the render cache are slower than in NVDA's process. It keeps
+heavy rendering, such as pre-rendering, from competing with NVDA for the GIL on machines with
+cores to spare. It is off unless the unspoken RenderServer setting is on.
+
+NVDA does not ship a Python interpreter, so the render server needs the path of a Python 3
+installation of the same architecture as NVDA (see the unspoken RenderServerPython setting).
+"""
+
+import argparse
+import os
+import secrets
+import subprocess
+import sys
+import threading
+import time
+import types
+from multiprocessing import connection, shared_memory
+
+from .sound_buffer import samples_of
+
+try:
+	from logHandler import log
+except ImportError:
+	import logging as log
+
+# Bytes of shared memory rendered audio is returned in, about 24 seconds of output.
+# Longer renders come back through the pipe.
+OUTPUT_SIZE = 4 * 1024 * 1024
+# Seconds to wait for the server to connect after starting it
+START_TIMEOUT = 10.0
+# Seconds to wait for the server to answer a request before giving up on it
+REQUEST_TIMEOUT = 2.0
+_CREATE_NO_WINDOW = 0x08000000
+
+
+class RenderServerClient:
+	"""Drives a render server process, with the rendering API of SteamAudio.
+
+	Requests are sent one at a time: the server renders into the shared output area, and
+	the result is copied out of it before the next request is sent. Sounds are sent to the
+	server once, by path when they were decoded from a file, and rendered from its sound bank
+	afterwards. If the server exits or stops answering, it is killed and sounds are rendered
+	by Steam Audio in this process from then on.
+	"""
+
+	# Renders run in the server, there are no engine contexts in this process.
+	contexts = None
+
+	def __init__(self, process, conn, output, frame_size):
+		self.process = process
+		self.initialized = True
+		self.frame_size = frame_size
+		self.reverb_settings = None
+		self.requests = 0
+		self._conn = conn
+		self._output = output
+		self._lock = threading.Lock()
+		# id(sound): (sound, bank ID), the sound is kept so its id() can not be reused
+		self._bank = {}
+		self._next_sound_id = 1
+		# In-process Steam Audio, once the server is gone
+		self._fallback = None
+
+	@classmethod
+	def start(cls, python, dll_path=None, script=None, server_args=()):
+		"""Start a render server with the given Python interpreter and connect to it.
+
+		script replaces this file as the server's entry point, it should call main.
+		"""
+		if not python or not os.path.isfile(python):
+			raise FileNotFoundError(f"Python interpreter for the render server not found: {python!r}")
+		authkey = secrets.token_bytes(32)
+		listener = connection.Listener(authkey=authkey)
+		output = shared_memory.SharedMemory(create=True, size=OUTPUT_SIZE)
+		command = [
+			python,
+			script or os.path.abspath(__file__),
+			"--address",
+			listener.address,
+			"--authkey",
+			authkey.hex(),
+			"--output",
+			output.name,
+		]
+		if dll_path:
+			command += ["--dll", dll_path]
+		command += list(server_args)
+		process = None
+		try:
+			process = subprocess.Popen(
+				command,
+				stdin=subprocess.DEVNULL,
+				stdout=subprocess.DEVNULL,
+				creationflags=_CREATE_NO_WINDOW if sys.platform == "win32" else 0,
+			)
+			conn = _accept(listener, authkey, process)
+			reply = conn.recv()
+			if reply[0] != "ready":
+				raise RuntimeError(f"Render server failed to start: {reply[1]}")
+		except BaseException:
+			if process is not None and process.poll() is None:
+				process.kill()
+			output.close()
+			output.unlink()
+			raise
+		finally:
+			listener.close()
+		log.debug(f"Render server started, process {process.pid}")
+		return cls(process, conn, output, frame_size=reply[1])
+
+	def initialize(self, sample_rate=44100, frame_size=1024):
+		# The server initializes Steam Audio when it starts.
+		return self.initialized
+
+	def _request(self, *message):
+		with self._lock:
+			return self._request_locked(message)
+
+	def _request_locked(self, message):
+		if not self.initialized:
+			return ("error", "render server stopped")
+		try:
+			self._conn.send(message)
+			self.requests += 1
+			if self._conn.poll(REQUEST_TIMEOUT):
+				return self._conn.recv()
+		except (EOFError, OSError):
+			log.error("Lost the connection to the render server, rendering in NVDA", exc_info=True)
+			self._abandon()
+			return ("error", "connection lost")
+		log.error(f"The render server did not answer within {REQUEST_TIMEOUT} seconds, rendering in NVDA")
+		self._abandon()
+		return ("error", "timed out")
+
+	def _abandon(self):
+		"""Stop using the server. Its late replies would answer the wrong requests, so it is killed."""
+		self.initialized = False
+		if self.process.poll() is None:
+			self.process.kill()
+
+	def _fallback_engine(self):
+		"""Return the in-process Steam Audio that renders once the server is gone, None if it fails."""
+		if self._fallback is None:
+			from . import steam_audio
+
+			try:
+				engine = steam_audio.get_steam_audio()
+				if not engine.initialize(frame_size=self.frame_size):
+					return None
+			except Exception:
+				log.error("Could not start Steam Audio in NVDA", exc_info=True)
+				return None
+			if self.reverb_settings is not None:
+				engine.set_reverb_settings(*self.reverb_settings)
+			self._fallback = engine
+		return self._fallback
+
+	def set_reverb_settings(self, room_size, damping, wet_level, dry_level, width):
+		settings = (room_size, damping, wet_level, dry_level, width)
+		if settings == self.reverb_settings:
+			return True
+		if self.initialized:
+			success = self._request("reverb", settings)[0] == "ok"
+		if not self.initialized:
+			with self._lock:
+				fallback = self._fallback_engine()
+			success = fallback is not None and fallback.set_reverb_settings(*settings)
+		if success:
+			self.reverb_settings = settings
+		return success
+
+	def render(self, input_buffer, gain, angle_x, angle_y, reverb=False, out=None):
+		"""Render a sound in the server, see SteamAudio.render."""
+		with self._lock:
+			if self.initialized:
+				audio = self._render_locked(input_buffer, gain, angle_x, angle_y, reverb, out)
+				if self.initialized:
+					return audio
+			fallback = self._fallback_engine()
+		if fallback is None:
+			return None
+		return fallback.render(input_buffer, gain, angle_x, angle_y, reverb=reverb, out=out)
+
+	def _render_locked(self, input_buffer, gain, angle_x, angle_y, reverb, out):
+		sound_id = self._bank_id(input_buffer)
+		if sound_id is None:
+			message = ("render_samples", bytes(memoryview(samples_of(input_buffer)).cast("B")))
+		else:
+			message = ("render", sound_id)
+		reply = self._request_locked(message + (gain, angle_x, angle_y, reverb))
+		if reply[0] == "output":
+			nbytes = reply[1]
+			view = self._output.buf[:nbytes]
+			try:
+				if out is not None and memoryview(out).nbytes >= nbytes:
+					target = memoryview(out).cast("B")[:nbytes]
+					target[:] = view
+					return target
+				return bytes(view)
+			finally:
+				view.release()
+		if reply[0] == "pcm":
+			return reply[1]
+		if self.initialized:
+			log.error(f"Render server failed to render: {reply[1]}")
+		return None
+
+	def _bank_id(self, sound):
+		"""Return the server's ID for a SoundBuffer, sending it first if needed.
+
+		Other sample buffers, such as the first block of a streamed sound, are sent with the render.
+		"""
+		samples = getattr(sound, "samples", None)
+		if samples is None:
+			return None
+		entry = self._bank.get(id(sound))
+		if entry is not None:
+			return entry[1]
+		sound_id = self._next_sound_id
+		self._next_sound_id += 1
+		if sound.path:
+			reply = self._request_locked(("load", sound_id, sound.path))
+		else:
+			reply = ("error",)
+		if reply[0] != "ok":
+			reply = self._request_locked(("load_samples", sound_id, bytes(samples.cast("B")), sound.sample_rate))
+		if reply[0] != "ok":
+			return None
+		self._bank[id(sound)] = (sound, sound_id)
+		return sound_id
+
+	def forget_sounds(self, sounds):
+		"""Drop sounds from the server's sound bank."""
+		with self._lock:
+			ids = [self._bank.pop(id(sound))[1] for sound in sounds if id(sound) in self._bank]
+			if ids and self.initialized:
+				self._request_locked(("unload", ids))
+			if self._fallback is not None:
+				self._fallback.forget_sounds(sounds)
+
+	def cleanup(self):
+		with self._lock:
+			if self._fallback is not None:
+				self._fallback.cleanup()
+				self._fallback = None
+			if self._conn.closed:
+				return
+			if self.initialized:
+				self._request_locked(("stop",))
+				self.initialized = False
+			self._bank.clear()
+			self._conn.close()
+		try:
+			self.process.wait(timeout=2.0)
+		except subprocess.TimeoutExpired:
+			self.process.kill()
+		self._output.close()
+		self._output.unlink()
+		log.debug("Render server stopped")
+
+
+def _accept(listener, authkey, process):
+	"""Accept the server's connection, giving up after START_TIMEOUT or if it exits."""
+	accepted = []
+	thread = threading.Thread(target=lambda: accepted.append(listener.accept()), daemon=True)
+	thread.start()
+	deadline = time.monotonic() + START_TIMEOUT
+	while thread.is_alive() and time.monotonic() < deadline and process.poll() is None:
+		thread.join(0.05)
+	if not accepted:
+		if thread.is_alive():
+			# Unblock accept with a connection of our own.
+			try:
+				connection.Client(listener.address, authkey=authkey).close()
+			except OSError:
+				pass
+			thread.join(1.0)
+		raise RuntimeError("The render server did not connect")
+	return accepted[0]
+
+
+# Shared client, started on first use
+_render_server_instance = None
+
+
+def get_render_server(python):
+	"""Get the shared render server client, starting the server if it is not running."""
+	global _render_server_instance
+	if _render_server_instance is None or not _render_server_instance.initialized:
+		if _render_server_instance is not None:
+			_render_server_instance.cleanup()
+			_render_server_instance = None
+		_render_server_instance = RenderServerClient.start(python)
+	return _render_server_instance
+
+
+# Server side
+
+
+def serve(address, authkey, output_name, dll_path=None, dll=None):
+	"""Render sounds for the client at address until told to stop."""
+	from .sound_buffer import SoundBuffer
+	from .steam_audio import SteamAudio
+
+	output = shared_memory.SharedMemory(name=output_name)
+	_untrack(output)
+	conn = connection.Client(address, authkey=authkey)
+	try:
+		engine = SteamAudio(dll_path=dll_path, dll=dll)
+		if not engine.initialize():
+			raise RuntimeError("Steam Audio initialization failed")
+	except Exception as e:
+		conn.send(("error", repr(e)))
+		conn.close()
+		output.close()
+		return
+	conn.send(("ready", engine.frame_size))
+	bank = {}
+	try:
+		while True:
+			try:
+				message = conn.recv()
+			except EOFError:
+				break
+			command = message[0]
+			if command == "stop":
+				conn.send(("ok",))
+				break
+			try:
+				if command in ("render", "render_samples"):
+					sound = bank[message[1]] if command == "render" else message[1]
+					conn.send(_render(engine, output, sound, *message[2:]))
+				elif command == "load":
+					bank[message[1]] = SoundBuffer.from_wave(message[2])
+					conn.send(("ok",))
+				elif command == "load_samples":
+					bank[message[1]] = SoundBuffer(bytearray(message[2]), sample_rate=message[3])
+					conn.send(("ok",))
+				elif command == "unload":
+					for sound_id in message[1]:
+						bank.pop(sound_id, None)
+					conn.send(("ok",))
+				elif command == "reverb":
+					conn.send(("ok",) if engine.set_reverb_settings(*message[1]) else ("error", "reverb"))
+				else:
+					conn.send(("error", f"unknown command {command!r}"))
+			except Exception as e:
+				log.exception("Render server request failed")
+				conn.send(("error", repr(e)))
+	finally:
+		engine.cleanup()
+		conn.close()
+		output.close()
+
+
+def _render(engine, output, sound, gain, angle_x, angle_y, reverb):
+	rendered = engine.render(sound, gain, angle_x, angle_y, reverb=reverb, out=output.buf)
+	if not rendered:
+		return ("error", "render failed")
+	if isinstance(rendered, memoryview):
+		nbytes = rendered.nbytes
+		rendered.release()
+		return ("output", nbytes)
+	# Too long for the output area
+	return ("pcm", bytes(rendered))
+
+
+def _untrack(shm):
+	"""Leave the client's shared memory to the client.
+
+	On POSIX, attaching registers the block with this process's resource tracker, which
+	would remove it when the server exits.
+	"""
+	if os.name == "posix":
+		try:
+			from multiprocessing import resource_tracker
+
+			resource_tracker.unregister(shm._name, "shared_memory")
+		except Exception:
+			pass
+
+
+def main(argv=None, dll=None):
+	parser = argparse.ArgumentParser(description="Audio themes render server")
+	parser.add_argument("--address", required=True)
+	parser.add_argument("--authkey", required=True)
+	parser.add_argument("--output", required=True)
+	parser.add_argument("--dll")
+	args, _ = parser.parse_known_args(argv)
+	serve(args.address, bytes.fromhex(args.authkey), args.output, dll_path=args.dll, dll=dll)
+
+
+def _bootstrap():
+	"""Import this module as part of its package, without the package's NVDA dependent __init__."""
+	package = types.ModuleType("unspoken")
+	package.__path__ = [os.path.dirname(os.path.abspath(__file__))]
+	sys.modules["unspoken"] = package
+	from unspoken import render_server
+
+	render_server.main()
+
+
+if __name__ == "__main__":
+	_bootstrap()
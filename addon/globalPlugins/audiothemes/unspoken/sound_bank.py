@@ -0,0 +1,155 @@
+"""
+Lazily decoded theme sounds
+Indexes a theme's sound files when it loads, and decodes each sound the first time it is played
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Mapping
+
+try:
+	from logHandler import log
+except ImportError:
+	import logging as log
+
+
+class SoundBank(Mapping):
+	"""Sounds by role, decoded from their files on first lookup.
+
+	load(path) decodes a file, returning None if it can not be. Once the decoded sounds take
+	more than max_bytes, the least recently used ones are dropped and passed to on_evict,
+	and are decoded again if looked up later. Membership and iteration only need the
+	paths, so they never decode anything.
+
+	The scaled copies renders keep with SoundBuffer.scaled count as well. When one takes
+	the sounds over max_bytes, the copies of the least recently used sounds are freed
+	first; that is safe from any thread, sounds themselves are only evicted on lookup.
+	"""
+
+	def __init__(self, paths=None, load=None, max_bytes=None, on_evict=None):
+		self.paths = dict(paths or {})
+		self.load = load
+		self.max_bytes = max_bytes
+		self.on_evict = on_evict
+		self.nbytes = 0
+		self.evictions = 0
+		# Seconds taken by the first decode of each role
+		self.decode_times = {}
+		# role: (sound, size counted against max_bytes), least recently used first
+		self._loaded = OrderedDict()
+		self._lock = threading.Lock()
+
+	def __getitem__(self, role):
+		sound = self._get(role, evict=True)
+		if sound is None:
+			raise KeyError(role)
+		return sound
+
+	def _get(self, role, evict):
+		"""Return the sound of role, or None if it would not fit in max_bytes without evicting."""
+		with self._lock:
+			entry = self._loaded.get(role)
+			if entry is not None:
+				self._loaded.move_to_end(role)
+				return entry[0]
+			path = self.paths[role]
+			started = time.perf_counter()
+			sound = self.load(path)
+			if sound is None:
+				# Not worth trying again
+				del self.paths[role]
+				raise KeyError(role)
+			if role not in self.decode_times:
+				self.decode_times[role] = elapsed = time.perf_counter() - started
+				log.debug(f"Decoded {path} on first use in {elapsed * 1000:.2f} ms")
+			size = sound.nbytes
+			if not evict and self.max_bytes is not None and self.nbytes + size > self.max_bytes:
+				return None
+			self._loaded[role] = (sound, size)
+			self.nbytes += size
+			sound.on_resize = self._resized
+			evicted = self._evict(keep=role)
+		if evicted and self.on_evict is not None:
+			self.on_evict(evicted)
+		return sound
+
+	def __contains__(self, role):
+		return role in self.paths
+
+	def __iter__(self):
+		return iter(list(self.paths))
+
+	def __len__(self):
+		return len(self.paths)
+
+	def _evict(self, keep):
+		evicted = []
+		if self.max_bytes is None:
+			return evicted
+		# Scaled copies are cheaper to make again than sounds are to decode.
+		self._free_scaled(keep)
+		while self.nbytes > self.max_bytes and len(self._loaded) > 1:
+			role, (sound, size) = next(iter(self._loaded.items()))
+			if role == keep:
+				break
+			del self._loaded[role]
+			self.nbytes -= size
+			self.evictions += 1
+			sound.on_resize = None
+			evicted.append(sound)
+		return evicted
+
+	def _resized(self, sound, delta):
+		"""Count a change in the size of a loaded sound, freeing scaled copies to stay in max_bytes."""
+		with self._lock:
+			role = next((role for role, (loaded, _) in self._loaded.items() if loaded is sound), None)
+			if role is None:
+				return
+			self._loaded[role] = (sound, self._loaded[role][1] + delta)
+			self.nbytes += delta
+			if self.max_bytes is not None:
+				self._free_scaled(keep=role)
+
+	def _free_scaled(self, keep):
+		"""Free the scaled copies of the least recently used sounds but keep's, until within max_bytes."""
+		for role, (sound, size) in list(self._loaded.items()):
+			if self.nbytes <= self.max_bytes:
+				break
+			if role == keep:
+				continue
+			freed = sound.drop_scaled()
+			if freed:
+				self._loaded[role] = (sound, size - freed)
+				self.nbytes -= freed
+
+	def loaded(self):
+		"""Return the sounds decoded so far."""
+		with self._lock:
+			return [sound for sound, _ in self._loaded.values()]
+
+	def preload(self, roles=None):
+		"""Decode the sounds of roles (all by default) in order, until one does not fit in max_bytes.
+
+		Never evicts. Returns the decoded sounds.
+		"""
+		return list(self.iter_preload(roles))
+
+	def iter_preload(self, roles=None):
+		"""Like preload, but decode each sound only when the iteration reaches it."""
+		for role in self if roles is None else roles:
+			try:
+				sound = self._get(role, evict=False)
+			except KeyError:
+				continue
+			if sound is None:
+				return
+			yield sound
+
+	def clear(self):
+		with self._lock:
+			for sound, _ in self._loaded.values():
+				sound.on_resize = None
+			self.paths.clear()
+			self._loaded.clear()
+			self.nbytes = 0
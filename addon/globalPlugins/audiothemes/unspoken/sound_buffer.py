@@ -0,0 +1,136 @@
+"""
+Compact storage for decoded theme sounds
+Samples are kept as contiguous float32 mono data instead of lists of Python floats
+"""
+
+import sys
+import wave
+from array import array
+
+# Scale factor between 16-bit PCM and float samples in the range [-1.0, 1.0).
+_INT16_TO_FLOAT = 1.0 / 32768.0
+
+
+def as_float_view(samples):
+	"""Return a flat float32 memoryview over any object supporting the buffer protocol."""
+	view = memoryview(samples)
+	if view.format != "f" or view.ndim != 1:
+		view = view.cast("B").cast("f")
+	return view
+
+
+def samples_of(sound):
+	"""Return the sample buffer of a SoundBuffer, or sound itself for any other buffer."""
+	if isinstance(sound, SoundBuffer):
+		return sound.samples
+	return sound
+
+
+class SoundBuffer:
+	"""A decoded mono sound ready to be rendered by Steam Audio.
+
+	The samples are stored as a single float32 buffer (four bytes per sample), so a loaded theme
+	stays within a small constant factor of its raw PCM size. The raw 16-bit samples can
+	optionally be kept alongside for paths that bypass spatialization.
+
+	A SoundBuffer is not itself a buffer (the buffer protocol can only be implemented in Python
+	from 3.12 on): code handing its samples to memoryview or ctypes uses .samples, see
+	samples_of.
+	"""
+
+	__slots__ = ("samples", "sample_rate", "pcm", "path", "on_resize", "_scaled_gain", "_scaled")
+
+	def __init__(self, samples, sample_rate=44100, pcm=None, path=None):
+		"""
+		Args:
+		    samples: float32 mono samples, as any object supporting the buffer protocol
+		    sample_rate: Sample rate in Hz
+		    pcm: Optional array of the original 16-bit mono samples
+		    path: The file these samples were decoded from, if any
+		"""
+		self.samples = as_float_view(samples)
+		self.sample_rate = sample_rate
+		self.pcm = pcm
+		self.path = path
+		# Called with the sound and the change in nbytes when a scaled copy is made, see scaled
+		self.on_resize = None
+		self._scaled_gain = None
+		self._scaled = None
+
+	@classmethod
+	def from_wave(cls, path, keep_pcm=False):
+		"""Decode a 16-bit wave file, keeping only its first channel.
+
+		Raises:
+		    ValueError: If the file does not contain 16-bit samples
+		"""
+		with wave.open(path, "rb") as wav_file:
+			sample_width = wav_file.getsampwidth()
+			channels = wav_file.getnchannels()
+			sample_rate = wav_file.getframerate()
+			frames = wav_file.readframes(wav_file.getnframes())
+		if sample_width != 2:
+			raise ValueError(f"Unsupported sample width: {sample_width}")
+		pcm = array("h")
+		pcm.frombytes(frames)
+		if sys.byteorder == "big":
+			pcm.byteswap()
+		if channels > 1:
+			pcm = pcm[::channels]
+		samples = array("f", map(_INT16_TO_FLOAT.__mul__, pcm))
+		return cls(samples, sample_rate, pcm=pcm if keep_pcm else None, path=path)
+
+	def __len__(self):
+		return len(self.samples)
+
+	@property
+	def nbytes(self):
+		"""Memory held by this sound, in bytes."""
+		size = self.samples.nbytes
+		if self.pcm is not None:
+			size += self.pcm.itemsize * len(self.pcm)
+		if self._scaled is not None:
+			size += self._scaled.nbytes
+		return size
+
+	def scaled(self, gain):
+		"""Return the samples multiplied by gain.
+
+		The result for the most recent gain is kept, so repeated plays at the same volume
+		do not touch the samples again. It counts towards nbytes until drop_scaled.
+		"""
+		if gain == 1.0:
+			return self.samples
+		scaled = self._scaled
+		if scaled is None or gain != self._scaled_gain:
+			previous = scaled.nbytes if scaled is not None else 0
+			scaled = memoryview(array("f", map(float(gain).__mul__, self.samples)))
+			self._scaled = scaled
+			self._scaled_gain = gain
+			if self.on_resize is not None:
+				self.on_resize(self, scaled.nbytes - previous)
+		return scaled
+
+	def drop_scaled(self):
+		"""Free the copy kept by scaled, returning the bytes freed."""
+		scaled = self._scaled
+		if scaled is None:
+			return 0
+		self._scaled = None
+		self._scaled_gain = None
+		return scaled.nbytes
+
+	def stereo_pcm(self, gain=1.0):
+		"""Return interleaved 16-bit stereo bytes of this sound, for playback without Steam Audio."""
+		if gain == 1.0 and self.pcm is not None:
+			mono = self.pcm
+		else:
+			mono = array(
+				"h", (max(-32768, min(32767, int(s * 32767))) for s in self.scaled(gain))
+			)
+		stereo = array("h", bytes(len(mono) * 4))
+		stereo[0::2] = mono
+		stereo[1::2] = mono
+		if sys.byteorder == "big":
+			stereo.byteswap()
+		return stereo.tobytes()
@@ -0,0 +1,90 @@
+"""
+Mapping of screen positions to the audio display
+Keeps the desktop geometry and the angle mapping constants, so placing a sound costs a few float operations
+"""
+
+import time
+
+import NVDAObjects
+
+try:
+	from core import post_windowMessageReceipt
+except ImportError:
+	post_windowMessageReceipt = None
+
+try:
+	from logHandler import log
+except ImportError:
+	import logging as log
+
+WM_DISPLAYCHANGE = 0x007E
+# Geometry used until the desktop reports its own
+_FALLBACK_DESKTOP = (0, 0, 1920, 1080)
+
+
+class SpatialMapper:
+	"""Maps object locations to (angle_x, angle_y) in degrees on the audio display.
+
+	The audio display spans display_width degrees of azimuth, centred in front of the
+	listener, and height_magnitude degrees of elevation from height_min at the bottom of
+	the screen. The desktop's geometry is cached, and read again when Windows reports a
+	display change or every refresh_interval seconds.
+	"""
+
+	def __init__(self, display_width=180.0, height_min=-40.0, height_magnitude=50.0, refresh_interval=30.0):
+		self.display_width = display_width
+		self.height_min = height_min
+		self.height_magnitude = height_magnitude
+		self.refresh_interval = refresh_interval
+		self.desktop = _FALLBACK_DESKTOP
+		self._expires = 0.0
+		if post_windowMessageReceipt is not None:
+			post_windowMessageReceipt.register(self._on_window_message)
+
+	def invalidate(self):
+		"""Read the desktop's geometry again on the next use."""
+		self._expires = 0.0
+
+	def _on_window_message(self, msg, **kwargs):
+		if msg == WM_DISPLAYCHANGE:
+			self.invalidate()
+
+	def _refresh(self, now):
+		try:
+			location = NVDAObjects.api.getDesktopObject().location
+		except Exception:
+			log.debugWarning("Could not get the desktop location", exc_info=True)
+			location = None
+		if location and location[2] > 0 and location[3] > 0:
+			self.desktop = tuple(location)
+		left, top, width, height = self.desktop
+		# angle_x = ((x - left) / width - 0.5) * display_width
+		self._x_scale = self.display_width / width
+		self._x_offset = -left * self._x_scale - self.display_width / 2.0
+		# angle_y = (1 - (y - top) / height) * height_magnitude + height_min
+		self._y_scale = -self.height_magnitude / height
+		self._y_offset = self.height_magnitude + self.height_min - top * self._y_scale
+		self._center = (left + width / 2.0, top + height / 2.0)
+		self._expires = now + self.refresh_interval
+
+	def angles(self, location):
+		"""Return the angles of an object's location, a (left, top, width, height) tuple.
+
+		Objects without a location are placed in the centre of the screen.
+		"""
+		now = time.monotonic()
+		if now >= self._expires:
+			self._refresh(now)
+		if location:
+			x = location[0] + location[2] / 2.0
+			y = location[1] + location[3] / 2.0
+		else:
+			x, y = self._center
+		angle_x = x * self._x_scale + self._x_offset
+		angle_y = y * self._y_scale + self._y_offset
+		# clamp these to Steam Audio's ranges.
+		return (min(max(angle_x, -90.0), 90.0), min(max(angle_y, -90.0), 90.0))
+
+	def terminate(self):
+		if post_windowMessageReceipt is not None:
+			post_windowMessageReceipt.unregister(self._on_window_message)
@@ -6,29 +6,186 @@ Provides 3D audio positioning, reverb, and 16-bit sample output
 import ctypes
 import os
 import platform
-import struct
 import threading
+from contextlib import contextmanager
 from ctypes import c_bool, c_int, c_float, POINTER, byref
+from array import array
+from .sound_buffer import SoundBuffer, as_float_view, samples_of
 
 try:
 	from logHandler import log
 except ImportError:
 	import logging as log
 
-# Global mutex for thread-safe DLL access
+# Global mutex for thread-safe DLL access. With engine contexts, renders only use it
+# while creating and destroying contexts.
 _steam_audio_mutex = threading.Lock()
+# Exports of DLL builds that render in independent engine contexts
+_CONTEXT_EXPORTS = ("create_context", "destroy_context", "context_set_reverb_settings", "context_render_sound")
+
+
+class BufferPool:
+	"""A small pool of reusable byte buffers.
+
+	Buffers are handed out with a capacity rounded up to a power of two, so a handful of
+	them can serve sounds of any length without reallocating on every play.
+	"""
+
+	def __init__(self, max_buffers=8):
+		self.max_buffers = max_buffers
+		self._free = []
+		self._lock = threading.Lock()
+
+	def acquire(self, nbytes):
+		"""Return a bytearray of at least nbytes, reusing a released one when possible."""
+		with self._lock:
+			for index, buf in enumerate(self._free):
+				if len(buf) >= nbytes:
+					return self._free.pop(index)
+		return bytearray(1 << max(nbytes - 1, 0).bit_length())
+
+	def release(self, buf):
+		"""Give a buffer obtained from acquire back to the pool."""
+		with self._lock:
+			if len(self._free) < self.max_buffers:
+				self._free.append(buf)
+				self._free.sort(key=len)
+
+	def clear(self):
+		with self._lock:
+			self._free.clear()
+
+
+@contextmanager
+def _input_array(samples, ctype, pool):
+	"""Expose samples to the DLL as a ctypes array, sharing their memory when possible.
+
+	Writable buffers are wrapped in place. Read-only ones (such as bytes) are copied into a
+	pooled staging buffer that is returned to the pool once the DLL call is done.
+	"""
+	if isinstance(samples, list):
+		yield (ctype * len(samples))(*samples)
+		return
+	view = memoryview(samples_of(samples)).cast("B")
+	length = view.nbytes // ctypes.sizeof(ctype)
+	if not view.readonly:
+		yield (ctype * length).from_buffer(view)
+		return
+	staging = pool.acquire(view.nbytes)
+	try:
+		staging[: view.nbytes] = view
+		yield (ctype * length).from_buffer(staging)
+	finally:
+		pool.release(staging)
+
+
+def _scaled_copy(samples, gain):
+	if isinstance(samples, list):
+		return array("f", [sample * gain for sample in samples])
+	return array("f", map(float(gain).__mul__, as_float_view(samples_of(samples))))
+
+
+class EngineContext:
+	"""An engine instance of its own, with its own effect and reverb state."""
+
+	__slots__ = ("handle", "reverb_settings")
+
+	def __init__(self, handle):
+		self.handle = handle
+		# Reverb settings last applied to this context
+		self.reverb_settings = None
+
+
+class ContextPool:
+	"""Hands out engine contexts to rendering threads, one thread per context at a time.
+
+	Contexts are created on first need, up to size of them. Threads wait for a free one
+	beyond that. Each context picks up the engine's reverb settings when handed out.
+	"""
+
+	def __init__(self, engine, size):
+		self.engine = engine
+		self.size = size
+		self._free = []
+		self._contexts = []
+		# Contexts being created, counted against size
+		self._creating = 0
+		self._available = threading.Condition()
+
+	@contextmanager
+	def acquire(self):
+		with self._available:
+			while not self._free and len(self._contexts) + self._creating >= self.size:
+				if not self.size:
+					raise RuntimeError("No Steam Audio context could be created")
+				self._available.wait()
+			context = self._free.pop() if self._free else None
+			if context is None:
+				self._creating += 1
+		if context is None:
+			# Created outside the condition, as creating takes the global mutex.
+			try:
+				context = self.engine._create_context()
+			finally:
+				with self._available:
+					self._creating -= 1
+					if context is not None:
+						self._contexts.append(context)
+					else:
+						# Make do with the contexts there are.
+						self.size = len(self._contexts) + self._creating
+					self._available.notify_all()
+			if context is None:
+				raise RuntimeError("Failed to create a Steam Audio context")
+		try:
+			settings = self.engine.reverb_settings
+			if settings is not None and context.reverb_settings != settings:
+				if self.engine.dll.context_set_reverb_settings(context.handle, *settings):
+					context.reverb_settings = settings
+			yield context
+		finally:
+			with self._available:
+				self._free.append(context)
+				self._available.notify_all()
+
+	def close(self):
+		"""Destroy the contexts, once no thread renders in them any more."""
+		with self._available:
+			while self._creating or len(self._free) < len(self._contexts):
+				self._available.wait()
+			contexts, self._contexts, self._free = self._contexts, [], []
+		with _steam_audio_mutex:
+			for context in contexts:
+				self.engine.dll.destroy_context(context.handle)
+
+	def __len__(self):
+		return len(self._contexts)
 
 
 # Define ctypes for the DLL functions
 class SteamAudio:
-	def __init__(self, dll_path=None):
+	def __init__(self, dll_path=None, dll=None):
 		"""Initialize Steam Audio wrapper
 
 		Args:
 		    dll_path: Path to steam_audio.dll. If None, looks in addon directory.
+		    dll: An already loaded library exposing the same functions, used instead of
+		        steam_audio.dll (e.g. a stand-in when benchmarking away from Windows).
 		"""
 		self.dll = None
 		self.initialized = False
+		# Reverb settings the DLL was last configured with
+		self.reverb_settings = None
+		# Engine contexts renders run in concurrently, when the DLL supports them
+		self.contexts = None
+		self.max_contexts = min(4, os.cpu_count() or 1)
+		# Reusable buffers for staging read-only input and for callers' output
+		self.buffer_pool = BufferPool()
+
+		if dll is not None:
+			self.dll = dll
+			self._setup_function_signatures()
+			return
 
 		paths_to_try = []
 		if dll_path:
@@ -106,6 +263,51 @@ class SteamAudio:
 		self.dll.free_output_sound.argtypes = [POINTER(ctypes.c_int16)]
 		self.dll.free_output_sound.restype = None
 
+		# Newer builds of the DLL render a sound in one call, older ones are handled in Python.
+		self.has_native_render = hasattr(self.dll, "render_sound")
+		if self.has_native_render:
+			# bool render_sound(const float* input_buffer, int input_length, float gain, float angle_x, float angle_y, bool reverb, int16_t** output_buffer, int* output_length)
+			self.dll.render_sound.argtypes = [
+				POINTER(c_float),  # input_buffer
+				c_int,  # input_length
+				c_float,  # gain
+				c_float,  # angle_x
+				c_float,  # angle_y
+				c_bool,  # reverb
+				POINTER(POINTER(ctypes.c_int16)),  # output_buffer
+				POINTER(c_int),  # output_length
+			]
+			self.dll.render_sound.restype = c_bool
+
+		# Builds with engine contexts render outside the global mutex, see ContextPool.
+		self.has_contexts = all(hasattr(self.dll, name) for name in _CONTEXT_EXPORTS)
+		if self.has_contexts:
+			# void* create_context()
+			self.dll.create_context.argtypes = []
+			self.dll.create_context.restype = ctypes.c_void_p
+
+			# void destroy_context(void* context)
+			self.dll.destroy_context.argtypes = [ctypes.c_void_p]
+			self.dll.destroy_context.restype = None
+
+			# bool context_set_reverb_settings(void* context, float room_size, float damping, float wet_level, float dry_level, float width)
+			self.dll.context_set_reverb_settings.argtypes = [ctypes.c_void_p] + [c_float] * 5
+			self.dll.context_set_reverb_settings.restype = c_bool
+
+			# bool context_render_sound(void* context, const float* input_buffer, int input_length, float gain, float angle_x, float angle_y, bool reverb, int16_t** output_buffer, int* output_length)
+			self.dll.context_render_sound.argtypes = [
+				ctypes.c_void_p,  # context
+				POINTER(c_float),  # input_buffer
+				c_int,  # input_length
+				c_float,  # gain
+				c_float,  # angle_x
+				c_float,  # angle_y
+				c_bool,  # reverb
+				POINTER(POINTER(ctypes.c_int16)),  # output_buffer
+				POINTER(c_int),  # output_length
+			]
+			self.dll.context_render_sound.restype = c_bool
+
 	def initialize(self, sample_rate=44100, frame_size=1024):
 		"""Initialize Steam Audio with given parameters
 
@@ -126,6 +328,8 @@ class SteamAudio:
 				self.initialized = True
 				self.sample_rate = sample_rate
 				self.frame_size = frame_size
+				if self.has_contexts and self.max_contexts > 0:
+					self.contexts = ContextPool(self, self.max_contexts)
 				log.debug(
 					f"Steam Audio initialized: {sample_rate}Hz, {frame_size} samples"
 				)
@@ -137,9 +341,13 @@ class SteamAudio:
 	def cleanup(self):
 		"""Cleanup Steam Audio resources"""
 		if self.initialized:
+			if self.contexts is not None:
+				contexts, self.contexts = self.contexts, None
+				contexts.close()
 			with _steam_audio_mutex:
 				self.dll.cleanup_steam_audio()
 				self.initialized = False
+				self.reverb_settings = None
 			log.debug("Steam Audio cleaned up")
 
 	def set_reverb_settings(self, room_size, damping, wet_level, dry_level, width):
@@ -153,17 +361,19 @@ class SteamAudio:
 		    width: Stereo width (0.0 to 1.0)
 
 		Returns:
-		    bool: True if successful
+		    bool: True if successful, or if the reverb already had these settings
 		"""
 		if not self.initialized:
 			log.error("Steam Audio not initialized")
 			return False
 
+		settings = (room_size, damping, wet_level, dry_level, width)
+		if settings == self.reverb_settings:
+			return True
 		with _steam_audio_mutex:
-			success = self.dll.set_reverb_settings(
-				room_size, damping, wet_level, dry_level, width
-			)
+			success = self.dll.set_reverb_settings(*settings)
 			if success:
+				self.reverb_settings = settings
 				log.debug(
 					f"Reverb settings updated: room_size={room_size}, damping={damping}, wet_level={wet_level}, dry_level={dry_level}, width={width}"
 				)
@@ -172,131 +382,204 @@ class SteamAudio:
 
 		return success
 
-	def process_sound(self, input_buffer, angle_x, angle_y):
+	def process_sound(self, input_buffer, angle_x, angle_y, out=None):
 		"""Process audio with 3D positioning (without reverb)
 
 		Args:
-		    input_buffer: list of float32 mono audio samples
+		    input_buffer: float32 mono audio samples, as a SoundBuffer, any object
+		        supporting the buffer protocol, or a list of floats
 		    angle_x: Horizontal angle in degrees (-90 to 90)
 		    angle_y: Vertical angle in degrees (-90 to 90)
+		    out: Optional writable buffer to receive the output, such as one taken from
+		        buffer_pool. It is only used if large enough to hold the result.
 
 		Returns:
-		    bytes: Stereo 16-bit audio samples as bytes, or None if failed
+		    Stereo 16-bit audio samples, as bytes or as a memoryview into out,
+		    or None if failed
 		"""
 		if not self.initialized:
 			log.error("Steam Audio not initialized")
 			return None
 
-		# Convert list to ctypes array
-		input_array = (c_float * len(input_buffer))(*input_buffer)
-		input_ptr = ctypes.cast(input_array, POINTER(c_float))
-		input_length = len(input_buffer)
-
 		# Prepare output parameters
 		output_buffer_ptr = POINTER(ctypes.c_int16)()
 		output_length = c_int()
 
-		# Call the DLL function
-		with _steam_audio_mutex:
-			success = self.dll.process_sound(
-				input_ptr,
-				input_length,
-				c_float(angle_x),
-				c_float(angle_y),
-				byref(output_buffer_ptr),
-				byref(output_length),
-			)
+		with _input_array(input_buffer, c_float, self.buffer_pool) as input_array:
+			# Call the DLL function
+			with _steam_audio_mutex:
+				success = self.dll.process_sound(
+					input_array,
+					len(input_array),
+					c_float(angle_x),
+					c_float(angle_y),
+					byref(output_buffer_ptr),
+					byref(output_length),
+				)
 
 		if not success or not output_buffer_ptr:
 			log.error("Failed to process sound")
 			return None
+		return self._take_output(output_buffer_ptr, output_length, out)
 
-		try:
-			# Convert output to bytes
-			output_samples = output_length.value
-			if output_samples > 0:
-				# Pack int16 samples into bytes
-				result = struct.pack(
-					f"<{output_samples}h",
-					*[output_buffer_ptr[i] for i in range(output_samples)],
-				)
+	def apply_reverb(self, input_buffer, out=None):
+		"""Apply reverb to stereo 16-bit audio
 
-				# Free the output buffer
-				with _steam_audio_mutex:
-					self.dll.free_output_sound(output_buffer_ptr)
+		Args:
+		    input_buffer: stereo 16-bit audio samples, as any object supporting the buffer protocol
+		    out: Optional writable buffer to receive the output, see process_sound
 
-				return result
-			else:
-				return b""
+		Returns:
+		    Stereo 16-bit audio samples with reverb, as bytes or as a memoryview into out,
+		    or None if failed
+		"""
+		if not self.initialized:
+			log.error("Steam Audio not initialized")
+			return None
 
-		except Exception as e:
-			log.error(f"Error processing output buffer: {e}")
-			# Make sure to free the buffer even if there's an error
-			if output_buffer_ptr:
-				with _steam_audio_mutex:
-					self.dll.free_output_sound(output_buffer_ptr)
+		# Prepare output parameters
+		output_buffer_ptr = POINTER(ctypes.c_int16)()
+		output_length = c_int()
+
+		with _input_array(input_buffer, ctypes.c_int16, self.buffer_pool) as input_array:
+			# Call the DLL function
+			with _steam_audio_mutex:
+				success = self.dll.apply_reverb(
+					input_array, len(input_array), byref(output_buffer_ptr), byref(output_length)
+				)
+
+		if not success or not output_buffer_ptr:
+			log.error("Failed to apply reverb")
 			return None
+		return self._take_output(output_buffer_ptr, output_length, out)
 
-	def apply_reverb(self, input_buffer):
-		"""Apply reverb to stereo 16-bit audio
+	def render(self, input_buffer, gain, angle_x, angle_y, reverb=False, out=None):
+		"""Render a mono sound to its final stereo form in one pass
+
+		Applies gain, 3D positioning and (optionally) reverb, quantizing to 16-bit once.
+		Uses the DLL's render_sound export when available, otherwise chains
+		process_sound and apply_reverb through a pooled intermediate buffer.
 
 		Args:
-		    input_buffer: bytes of stereo 16-bit audio samples
+		    input_buffer: float32 mono audio samples, see process_sound
+		    gain: Linear gain applied to the samples
+		    angle_x: Horizontal angle in degrees (-90 to 90)
+		    angle_y: Vertical angle in degrees (-90 to 90)
+		    reverb: Whether to apply reverb
+		    out: Optional writable buffer to receive the output, see process_sound
 
 		Returns:
-		    bytes: Stereo 16-bit audio samples with reverb, or None if failed
+		    Stereo 16-bit audio samples, as bytes or as a memoryview into out,
+		    or None if failed
 		"""
 		if not self.initialized:
 			log.error("Steam Audio not initialized")
 			return None
-
-		# Convert bytes to int16 array
-		import struct
-
-		samples = struct.unpack(f"<{len(input_buffer) // 2}h", input_buffer)
-		input_array = (ctypes.c_int16 * len(samples))(*samples)
-		input_ptr = ctypes.cast(input_array, POINTER(ctypes.c_int16))
-		input_length = len(samples)
+		if self.contexts is not None and self.contexts.size:
+			try:
+				return self._render_in_context(input_buffer, gain, angle_x, angle_y, reverb, out)
+			except RuntimeError:
+				log.error("Rendering without a Steam Audio context", exc_info=True)
+		if not self.has_native_render:
+			return self._render_fallback(input_buffer, gain, angle_x, angle_y, reverb, out)
 
 		# Prepare output parameters
 		output_buffer_ptr = POINTER(ctypes.c_int16)()
 		output_length = c_int()
 
-		# Call the DLL function
-		with _steam_audio_mutex:
-			success = self.dll.apply_reverb(
-				input_ptr, input_length, byref(output_buffer_ptr), byref(output_length)
-			)
+		with _input_array(input_buffer, c_float, self.buffer_pool) as input_array:
+			# Call the DLL function
+			with _steam_audio_mutex:
+				success = self.dll.render_sound(
+					input_array,
+					len(input_array),
+					c_float(gain),
+					c_float(angle_x),
+					c_float(angle_y),
+					reverb,
+					byref(output_buffer_ptr),
+					byref(output_length),
+				)
 
 		if not success or not output_buffer_ptr:
-			log.error("Failed to apply reverb")
+			log.error("Failed to render sound")
 			return None
+		return self._take_output(output_buffer_ptr, output_length, out)
 
-		try:
-			# Convert output to bytes
-			output_samples = output_length.value
-			if output_samples > 0:
-				# Pack int16 samples into bytes
-				result = struct.pack(
-					f"<{output_samples}h",
-					*[output_buffer_ptr[i] for i in range(output_samples)],
-				)
+	def forget_sounds(self, sounds):
+		"""Nothing is kept per sound in this process, see RenderServerClient.forget_sounds."""
 
-				# Free the output buffer
-				with _steam_audio_mutex:
-					self.dll.free_output_sound(output_buffer_ptr)
+	def _create_context(self):
+		with _steam_audio_mutex:
+			handle = self.dll.create_context()
+		return EngineContext(handle) if handle else None
 
-				return result
-			else:
-				return b""
+	def _render_in_context(self, input_buffer, gain, angle_x, angle_y, reverb, out):
+		output_buffer_ptr = POINTER(ctypes.c_int16)()
+		output_length = c_int()
+
+		with _input_array(input_buffer, c_float, self.buffer_pool) as input_array:
+			with self.contexts.acquire() as context:
+				success = self.dll.context_render_sound(
+					context.handle,
+					input_array,
+					len(input_array),
+					c_float(gain),
+					c_float(angle_x),
+					c_float(angle_y),
+					reverb,
+					byref(output_buffer_ptr),
+					byref(output_length),
+				)
+
+		if not success or not output_buffer_ptr:
+			log.error("Failed to render sound")
+			return None
+		return self._take_output(output_buffer_ptr, output_length, out)
 
+	def _render_fallback(self, input_buffer, gain, angle_x, angle_y, reverb, out):
+		if isinstance(input_buffer, SoundBuffer):
+			samples = input_buffer.scaled(gain)
+		elif gain != 1.0:
+			samples = _scaled_copy(input_buffer, gain)
+		else:
+			samples = input_buffer
+		if not reverb:
+			return self.process_sound(samples, angle_x, angle_y, out=out)
+		# The positioned audio is only an intermediate step,
+		# so render it into a reusable buffer instead of a new bytes object.
+		scratch = self.buffer_pool.acquire(len(samples) * 4)
+		try:
+			processed_audio = self.process_sound(samples, angle_x, angle_y, out=scratch)
+			if not processed_audio:
+				return processed_audio
+			reverb_audio = self.apply_reverb(processed_audio, out=out)
+			if reverb_audio:
+				return reverb_audio
+			return bytes(processed_audio)
+		finally:
+			self.buffer_pool.release(scratch)
+
+	def _take_output(self, output_buffer_ptr, output_length, out):
+		"""Copy a DLL allocated output buffer into out (or new bytes) and free it."""
+		try:
+			nbytes = output_length.value * ctypes.sizeof(ctypes.c_int16)
+			if out is None or memoryview(out).nbytes < nbytes:
+				return ctypes.string_at(output_buffer_ptr, nbytes)
+			target = memoryview(out).cast("B")[:nbytes]
+			ctypes.memmove((ctypes.c_char * nbytes).from_buffer(target), output_buffer_ptr, nbytes)
+			return target
 		except Exception as e:
-			log.error(f"Error processing reverb output buffer: {e}")
-			# Make sure to free the buffer even if there's an error
-			if output_buffer_ptr:
+			log.error(f"Error processing output buffer: {e}")
+			return None
+		finally:
+			# Make sure to free the buffer even if there's an error.
+			# Builds with engine contexts free their output thread safely.
+			if self.has_contexts:
+				self.dll.free_output_sound(output_buffer_ptr)
+			else:
 				with _steam_audio_mutex:
 					self.dll.free_output_sound(output_buffer_ptr)
-			return None
 
 	def __del__(self):
 		"""Cleanup when object is destroyed"""
@@ -0,0 +1,68 @@
+"""
+Stream renderer
+Renders the rest of streamed sounds on a background thread, while their first parts play
+"""
+
+import queue
+import threading
+from collections import deque
+
+try:
+	from logHandler import log
+except ImportError:
+	import logging as log
+
+_CLOSE = None
+
+
+class StreamRenderer(threading.Thread):
+	"""Runs the renders of streamed sounds, one sound at a time and one part per step.
+
+	Each job is an iterator that renders and queues one part of a sound per step. A job is
+	abandoned, by closing it, as soon as a newer sound of the same mixer group is submitted:
+	the mixer fades the old sound out, so the rest of it would never be heard.
+	"""
+
+	def __init__(self):
+		super().__init__(name="AudioThemesStreamRender", daemon=True)
+		self._queue = queue.Queue()
+		# Jobs taken off the queue while checking for newer sounds, in submission order
+		self._pending = deque()
+
+	def submit(self, parts, group=None):
+		"""Render parts, an iterator rendering one part per step, for a sound of group."""
+		self._queue.put((parts, group))
+
+	def close(self, timeout=None):
+		"""Abandon the sound being rendered and end the thread."""
+		self._queue.put(_CLOSE)
+		self.join(timeout)
+
+	def run(self):
+		while True:
+			job = self._pending.popleft() if self._pending else self._queue.get()
+			if job is _CLOSE:
+				return
+			parts, group = job
+			try:
+				# Checked before the first step too, a newer sound may already be waiting.
+				while not self._superseded(group):
+					next(parts)
+			except StopIteration:
+				pass
+			except Exception:
+				log.exception("Failed to render a streamed sound")
+			finally:
+				parts.close()
+
+	def _superseded(self, group):
+		"""Take newly submitted jobs, returning True if one supersedes a sound of group."""
+		while True:
+			try:
+				self._pending.append(self._queue.get_nowait())
+			except queue.Empty:
+				break
+		for job in self._pending:
+			if job is _CLOSE or (group is not None and job[1] == group):
+				return True
+		return False
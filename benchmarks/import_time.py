@@ -0,0 +1,80 @@
+"""
+Import time budget
+Imports the global plugin in fresh interpreters under -X importtime, with the NVDA stand-ins
+installed first, and reports its cumulative import cost and its slowest modules. Fails when the
+fastest import goes over --budget, or when a module that should only be imported on first use
+(the studio, the settings panel, the render server) is imported with the plugin.
+
+Modules the stand-ins import themselves are not counted, as NVDA has its own already loaded.
+
+Usage: python benchmarks/import_time.py [--budget MS] [--repeat N] [--top N]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+PLUGIN = "globalPlugins.audiothemes"
+# Imported on first use of what they provide
+LAZY_MODULES = (
+	f"{PLUGIN}.studio",
+	f"{PLUGIN}.settings",
+	f"{PLUGIN}.unspoken.render_server",
+)
+_IMPORT = f"import nvda_env; nvda_env.install(); import {PLUGIN}"
+
+
+def import_times():
+	"""Import the plugin in a new interpreter, returning [(module, self us, cumulative us)]."""
+	result = subprocess.run(
+		[sys.executable, "-X", "importtime", "-c", _IMPORT],
+		cwd=os.path.dirname(os.path.abspath(__file__)),
+		capture_output=True,
+		text=True,
+		check=True,
+	)
+	times = []
+	for line in result.stderr.splitlines():
+		if not line.startswith("import time:") or "self [us]" in line:
+			continue
+		own, cumulative, name = line[len("import time:") :].split("|")
+		times.append((name.strip(), int(own), int(cumulative)))
+	# The plugin's imports end with the plugin itself, what comes before it is the stand-ins'.
+	end = next(index for index, (name, _, _) in enumerate(times) if name == PLUGIN)
+	start = max(
+		(index + 1 for index, (name, _, _) in enumerate(times[:end]) if name == "nvda_env"), default=0
+	)
+	return times[start : end + 1]
+
+
+def run(args):
+	runs = [import_times() for _ in range(args.repeat)]
+	best = min(runs, key=lambda times: times[-1][2])
+	total = best[-1][2] / 1000.0
+	print(f"{PLUGIN} imported in {total:.1f} ms (fastest of {args.repeat}), budget {args.budget:g} ms")
+	print("  slowest modules, by own time")
+	for name, own, _ in sorted(best, key=lambda entry: entry[1], reverse=True)[: args.top]:
+		print(f"    {own / 1000.0:>7.2f} ms  {name}")
+	imported = {name for name, _, _ in best}
+	eager = [name for name in LAZY_MODULES if name in imported]
+	for name in eager:
+		print(f"  imported with the plugin, should be on first use: {name}")
+	if eager or total > args.budget:
+		print("FAIL")
+		return 1
+	print("OK")
+	return 0
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument("--budget", type=float, default=40.0, help="most milliseconds the plugin's import may take")
+	parser.add_argument("--repeat", type=int, default=5, help="imports to take the fastest of")
+	parser.add_argument("--top", type=int, default=10, help="slowest modules to list")
+	args = parser.parse_args()
+	sys.exit(run(args))
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,131 @@
+"""
+Navigator polling benchmark
+Replays a scripted session against NavigatorTracker on a simulated clock and counts its timer
+wakeups, the main thread time they take and how long navigator movements take to be noticed,
+next to the fixed 100 ms timer the plugin used to run. Gestures are delivered from another
+thread, as NVDA's input threads do, and fail the benchmark if they touch the timer.
+
+Usage: python benchmarks/navigator_polling.py [--interval MS]
+"""
+
+import argparse
+import threading
+import time
+import types
+
+import nvda_env
+import workload
+
+FIXED_INTERVAL = 0.1
+
+
+class SimulatedTimer:
+	"""Stand-in for the tracker's wx.Timer, fired by the simulation loop."""
+
+	def __init__(self):
+		self.due = None
+		# Calls made off the main thread, which wx refuses
+		self.misused = 0
+
+	def StartOnce(self, milliseconds):
+		self._check_thread()
+		self.due = clock.now + milliseconds / 1000.0
+
+	def Stop(self):
+		self._check_thread()
+		self.due = None
+
+	def _check_thread(self):
+		if threading.current_thread() is not threading.main_thread():
+			self.misused += 1
+
+
+clock = types.SimpleNamespace(now=0.0, monotonic=lambda: clock.now)
+
+
+def session(step=0.25):
+	"""Yield (time, action, argument) for a one minute session.
+
+	Ten seconds of arrowing through a browse mode document, twenty seconds of listening,
+	a single key press, then twenty seconds in an application without documents.
+	"""
+	for index in range(40):
+		yield index * step, "move", index
+	yield 30.0, "move", 40
+	yield 40.0, "leave", None
+	yield 60.0, "end", None
+
+
+def run(interval):
+	env = nvda_env.install()
+	nvda_env.use_stand_in_steam_audio()
+	from globalPlugins.audiothemes import navigator
+
+	navigator.time = clock
+	# Calls queued for the main thread, run as soon as the gesture has been delivered
+	main_thread_calls = []
+	navigator.wx.CallAfter = lambda func, *args, **kwargs: main_thread_calls.append((func, args, kwargs))
+	document = types.SimpleNamespace(passThrough=False)
+	noticed = []
+	moved_at = [None]
+
+	def on_change(obj):
+		noticed.append(clock.now - moved_at[0])
+
+	tracker = navigator.NavigatorTracker(on_change, active_interval=interval)
+	tracker._timer = SimulatedTimer()
+
+	def focus(obj):
+		env.focus.current = obj
+		tracker.track_focus(obj)
+
+	start = workload.BenchObject(nvda_env.ROLES["ROLE_DOCUMENT"], "Page", (0, 0, 1920, 1080))
+	start.treeInterceptor = document
+	focus(start)
+	busy = 0.0
+	for at, action, argument in session():
+		while tracker._timer.due is not None and tracker._timer.due <= at:
+			clock.now = tracker._timer.due
+			tracker._timer.due = None
+			started = time.perf_counter()
+			tracker._on_timer(None)
+			busy += time.perf_counter() - started
+		clock.now = at
+		if action == "move":
+			gesture = threading.Thread(target=tracker._on_gesture)
+			gesture.start()
+			gesture.join()
+			for func, args, kwargs in main_thread_calls:
+				func(*args, **kwargs)
+			main_thread_calls.clear()
+			obj = workload.BenchObject(nvda_env.ROLES["ROLE_LINK"], f"Link {argument}", (0, argument * 20, 300, 20))
+			obj.treeInterceptor = document
+			env.focus.current = obj
+			moved_at[0] = at
+		elif action == "leave":
+			focus(workload.BenchObject(nvda_env.ROLES["ROLE_BUTTON"], "OK", (0, 0, 80, 30)))
+	duration = at
+	noticed.sort()
+	print(f"adaptive tracking, {interval * 1000:.0f} ms active interval, {duration:.0f} s session")
+	print(f"  wakeups         {tracker.polls}  ({tracker.polls / duration:.1f}/s)")
+	print(f"  main thread     {busy * 1000:.2f} ms in the tracker")
+	print(f"  changes         {tracker.changes}")
+	if noticed:
+		print(f"  noticed after   median {noticed[len(noticed) // 2] * 1000:.0f} ms  max {noticed[-1] * 1000:.0f} ms")
+	fixed = round(duration / FIXED_INTERVAL)
+	print(f"fixed {FIXED_INTERVAL * 1000:.0f} ms timer")
+	print(f"  wakeups         {fixed}  ({fixed / duration:.1f}/s)")
+	print(f"  noticed after   max {FIXED_INTERVAL * 1000:.0f} ms")
+	if tracker._timer.misused:
+		raise SystemExit(f"FAIL: the timer was used {tracker._timer.misused} times off the main thread")
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument("--interval", type=float, default=100, help="active poll interval in ms")
+	args = parser.parse_args()
+	run(args.interval / 1000.0)
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,441 @@
+"""
+Stand-ins for NVDA and the Steam Audio DLL
+Lets the add-on's play path run headless on any platform, for benchmarking
+"""
+
+import builtins
+import ctypes
+import logging
+import math
+import os
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import types
+from array import array
+from operator import add
+from unittest import mock
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ADDON_DIR = os.path.join(REPO_ROOT, "addon")
+DEFAULT_THEME_DIR = os.path.join(ADDON_DIR, "globalPlugins", "audiothemes", "Themes", "Default")
+
+# controlTypes role constants used by the benchmarks. Values match NVDA for the roles the
+# add-on treats specially (lists, list items, help balloons); the rest only need to be distinct.
+ROLES = {
+	"ROLE_UNKNOWN": 0,
+	"ROLE_CHECKBOX": 5,
+	"ROLE_RADIOBUTTON": 6,
+	"ROLE_EDITABLETEXT": 8,
+	"ROLE_BUTTON": 9,
+	"ROLE_MENUITEM": 11,
+	"ROLE_POPUPMENU": 12,
+	"ROLE_COMBOBOX": 13,
+	"ROLE_LIST": 14,
+	"ROLE_LISTITEM": 15,
+	"ROLE_HELPBALLOON": 17,
+	"ROLE_LINK": 19,
+	"ROLE_TREEVIEW": 20,
+	"ROLE_TREEVIEWITEM": 21,
+	"ROLE_TAB": 22,
+	"ROLE_SLIDER": 24,
+	"ROLE_TABLECELL": 29,
+	"ROLE_TOOLBAR": 35,
+	"ROLE_DROPDOWNBUTTON": 36,
+	"ROLE_CLOCK": 37,
+	"ROLE_DOCUMENT": 52,
+	"ROLE_CHECKMENUITEM": 60,
+	"ROLE_DATEEDITOR": 61,
+	"ROLE_DROPDOWNBUTTONGRID": 62,
+	"ROLE_DROPLIST": 63,
+	"ROLE_MENUBUTTON": 64,
+	"ROLE_PASSWORDEDIT": 65,
+	"ROLE_RADIOMENUITEM": 66,
+	"ROLE_RICHEDIT": 67,
+	"ROLE_SPINBUTTON": 68,
+	"ROLE_TERMINAL": 69,
+	"ROLE_TOGGLEBUTTON": 70,
+}
+STATE_PROTECTED = 16384
+SCREEN_SIZE = (1920, 1080)
+
+_CONFIG_SPEC_RE = re.compile(r"(\w+)\(\s*(?:default\s*=\s*)?(.*?)\s*(?:,|\)$)")
+
+
+class Action:
+	"""Stand-in for extensionPoints.Action."""
+
+	def __init__(self):
+		self.handlers = []
+
+	def register(self, handler):
+		self.handlers.append(handler)
+
+	def unregister(self, handler):
+		if handler in self.handlers:
+			self.handlers.remove(handler)
+
+	def notify(self, **kwargs):
+		for handler in list(self.handlers):
+			handler(**kwargs)
+
+
+def _spec_default(spec):
+	kind, default = _CONFIG_SPEC_RE.match(spec).groups()
+	if kind == "boolean":
+		return default == "True"
+	if kind == "integer":
+		return int(default)
+	if kind == "float":
+		return float(default)
+	return default.strip("'\"")
+
+
+class ConfigManager:
+	"""Stand-in for config.conf, sections are filled with the defaults of their spec."""
+
+	def __init__(self):
+		self.spec = {}
+		self._sections = {"audio": {"outputDevice": "default"}}
+
+	def __getitem__(self, name):
+		section = self._sections.setdefault(name, {})
+		for key, spec in self.spec.get(name, {}).items():
+			if key not in section:
+				section[key] = _spec_default(spec)
+		return section
+
+
+class Synth:
+	name = "benchmark"
+	volume = 80
+
+
+class SayAllHandler:
+	def __init__(self):
+		self.running = False
+		self.is_running_calls = 0
+
+	def isRunning(self):
+		self.is_running_calls += 1
+		return self.running
+
+	def readText(self, *args, **kwargs):
+		self.running = True
+
+	def readObjects(self, *args, **kwargs):
+		self.running = True
+
+	def stop(self):
+		self.running = False
+
+
+class AppModule:
+	def __init__(self, appName):
+		self.appName = appName
+
+
+class DesktopObject:
+	role = ROLES["ROLE_UNKNOWN"]
+	name = "Desktop"
+	location = (0, 0) + SCREEN_SIZE
+	windowHandle = 0
+	processID = 0
+
+
+class NullWavePlayer:
+	"""Stand-in for nvwave.WavePlayer that discards (or keeps) the audio it is fed.
+
+	Counters are class wide so they survive the output worker reopening the device.
+	"""
+
+	keep_audio = False
+	instances = 0
+	feeds = 0
+	fed_bytes = 0
+	audio = bytearray()
+
+	def __init__(self, channels, samplesPerSec, bitsPerSample, outputDevice=None, **kwargs):
+		NullWavePlayer.instances += 1
+
+	def feed(self, data, *args, **kwargs):
+		NullWavePlayer.feeds += 1
+		NullWavePlayer.fed_bytes += len(data)
+		if self.keep_audio:
+			NullWavePlayer.audio += data
+
+	def stop(self):
+		pass
+
+	def idle(self):
+		pass
+
+	def sync(self):
+		pass
+
+	def close(self):
+		pass
+
+	@classmethod
+	def reset_counters(cls):
+		cls.instances = cls.feeds = cls.fed_bytes = 0
+		cls.audio = bytearray()
+
+
+def _value(arg):
+	return getattr(arg, "value", arg)
+
+
+def _pointee(arg):
+	# byref() arguments wrap the object they point to.
+	return getattr(arg, "_obj", arg)
+
+
+class _Export:
+	"""A function of the stand-in DLL, which ctypes argtypes and restype can be set on."""
+
+	def __init__(self, function):
+		self.function = function
+		self.argtypes = None
+		self.restype = None
+
+	def __call__(self, *args):
+		return self.function(*args)
+
+
+class StandInSteamAudioDLL:
+	"""Pure Python stand-in for steam_audio.dll.
+
+	Exposes the DLL's functions with the same arguments, so the real ctypes wrapper runs
+	unchanged. Positioning is a constant power pan and reverb a single feedback echo: not
+	Steam Audio's output, but work proportional to the length of the sound, like the real
+	thing. delay adds a fixed simulated cost in seconds to every call, during which other
+	threads run, as they would while the real DLL works. Without dsp, renders output silence
+	and cost only the delay. With contexts, the engine context exports are there as well.
+	"""
+
+	def __init__(self, delay=0.0, native_render=False, contexts=False, dsp=True):
+		self.delay = delay
+		self.dsp = dsp
+		self.calls = 0
+		self.contexts = {}
+		self._lock = threading.Lock()
+		# Output buffers handed to the caller, by address, until free_output_sound
+		self._outputs = {}
+		self.initialize_steam_audio = _Export(lambda sample_rate, frame_size: True)
+		self.cleanup_steam_audio = _Export(lambda: None)
+		self.set_reverb_settings = _Export(lambda *settings: True)
+		self.process_sound = _Export(self._process_sound)
+		self.apply_reverb = _Export(self._apply_reverb)
+		self.free_output_sound = _Export(self._free_output_sound)
+		if native_render:
+			self.render_sound = _Export(self._render_sound)
+		if contexts:
+			self.create_context = _Export(self._create_context)
+			self.destroy_context = _Export(lambda context: self.contexts.pop(_value(context), None))
+			self.context_set_reverb_settings = _Export(self._context_set_reverb_settings)
+			self.context_render_sound = _Export(lambda context, *args: self._render_sound(*args))
+
+	def _create_context(self):
+		with self._lock:
+			handle = len(self.contexts) + 1
+			while handle in self.contexts:
+				handle += 1
+			self.contexts[handle] = None
+		return handle
+
+	def _context_set_reverb_settings(self, context, *settings):
+		self.contexts[_value(context)] = settings
+		return True
+
+	def _work(self):
+		with self._lock:
+			self.calls += 1
+		if self.delay:
+			time.sleep(self.delay)
+
+	def _emit(self, samples, output_buffer, output_length):
+		buffer = (ctypes.c_int16 * len(samples)).from_buffer_copy(samples)
+		self._outputs[ctypes.addressof(buffer)] = buffer
+		_pointee(output_buffer).contents = ctypes.c_int16.from_buffer(buffer)
+		_pointee(output_length).value = len(samples)
+		return True
+
+	@staticmethod
+	def _pan(samples, gain, angle_x):
+		theta = (max(-90.0, min(90.0, angle_x)) + 90.0) / 180.0 * (math.pi / 2)
+		stereo = array("h", bytes(len(samples) * 4))
+		for channel, channel_gain in enumerate((math.cos(theta), math.sin(theta))):
+			# Samples are within [-1, 1], so this never leaves the 16-bit range.
+			scale = min(channel_gain * gain, 1.0) * 32767.0
+			stereo[channel::2] = array("h", map(int, map(scale.__mul__, samples)))
+		return stereo
+
+	@staticmethod
+	def _echo(samples, delay_frames=2205, feedback=0.3):
+		out = array("h", samples)
+		offset = delay_frames * 2
+		if len(out) > offset:
+			dry = map((1.0 - feedback).__mul__, out[offset:])
+			out[offset:] = array("h", map(int, map(add, dry, map(feedback.__mul__, samples[:-offset]))))
+		return out
+
+	def _process_sound(self, input_buffer, input_length, angle_x, angle_y, output_buffer, output_length):
+		self._work()
+		samples = memoryview(input_buffer).cast("B").cast("f")[: _value(input_length)]
+		return self._emit(self._pan(samples, 1.0, _value(angle_x)), output_buffer, output_length)
+
+	def _apply_reverb(self, input_buffer, input_length, output_buffer, output_length):
+		self._work()
+		samples = memoryview(input_buffer).cast("B").cast("h")[: _value(input_length)]
+		return self._emit(self._echo(samples), output_buffer, output_length)
+
+	def _render_sound(
+		self, input_buffer, input_length, gain, angle_x, angle_y, reverb, output_buffer, output_length
+	):
+		self._work()
+		if not self.dsp:
+			return self._emit(array("h", bytes(_value(input_length) * 4)), output_buffer, output_length)
+		samples = memoryview(input_buffer).cast("B").cast("f")[: _value(input_length)]
+		stereo = self._pan(samples, _value(gain), _value(angle_x))
+		if _value(reverb):
+			stereo = self._echo(stereo)
+		return self._emit(stereo, output_buffer, output_length)
+
+	def _free_output_sound(self, buffer):
+		self._outputs.pop(ctypes.cast(buffer, ctypes.c_void_p).value, None)
+
+
+def _module(name, **attributes):
+	module = types.ModuleType(name)
+	module.__dict__.update(attributes)
+	sys.modules[name] = module
+	parent, _, child = name.rpartition(".")
+	if parent in sys.modules:
+		setattr(sys.modules[parent], child, module)
+	return module
+
+
+def _gui_module(name, **attributes):
+	"""A module whose every attribute is a MagicMock, for GUI code that is never exercised."""
+	module = mock.MagicMock(name=name)
+	for attribute, value in attributes.items():
+		setattr(module, attribute, value)
+	sys.modules[name] = module
+	return module
+
+
+class _Base:
+	"""Base class for plugin, settings panel and dialog classes."""
+
+	def __init__(self, *args, **kwargs):
+		pass
+
+
+def install(config_path=None, theme_dir=DEFAULT_THEME_DIR, foreground_app="explorer"):
+	"""Install the NVDA stand-ins and make the add-on importable.
+
+	The Default theme is copied into a temporary NVDA configuration directory.
+	Returns a namespace with the objects benchmarks need to drive or inspect.
+	"""
+	builtins._ = lambda text: text
+	builtins.ngettext = lambda singular, plural, count: singular if count == 1 else plural
+	builtins.pgettext = lambda context, text: text
+	config_path = config_path or tempfile.mkdtemp(prefix="audiothemes-bench-")
+	themes_dir = os.path.join(config_path, "audio-themes")
+	if theme_dir and not os.path.isdir(os.path.join(themes_dir, "Default")):
+		shutil.copytree(theme_dir, os.path.join(themes_dir, "Default"))
+
+	logging.basicConfig(level=logging.WARNING)
+	log = logging.getLogger("nvda")
+	log.debugWarning = log.warning
+	log.io = log.debug
+	_module("logHandler", log=log)
+	_module("globalVars", appArgs=types.SimpleNamespace(configPath=config_path))
+	_module("extensionPoints", Action=Action)
+	conf = ConfigManager()
+	_module(
+		"config",
+		conf=conf,
+		post_configSave=Action(),
+		post_configReset=Action(),
+		post_configProfileSwitch=Action(),
+		pre_configSave=Action(),
+	)
+	_module("addonHandler", initTranslation=lambda: None)
+	_module(
+		"controlTypes",
+		OutputReason=types.SimpleNamespace(QUERY="query"),
+		roleLabels={value: name[5:].lower() for name, value in ROLES.items()},
+		STATE_PROTECTED=STATE_PROTECTED,
+		**ROLES,
+	)
+
+	synth = Synth()
+	say_all = SayAllHandler()
+	_module("speech")
+	_module(
+		"speech.speech",
+		getSynth=lambda: synth,
+		getPropertiesSpeech=lambda reason=None, *args, **kwargs: [],
+	)
+	_module("speech.sayAll", SayAllHandler=say_all)
+	sys.modules["speech"].getSynth = lambda: synth
+	_module("synthDriverHandler", synthChanged=Action())
+	_module("nvwave", WavePlayer=NullWavePlayer)
+
+	desktop = DesktopObject()
+	foreground = types.SimpleNamespace(appModule=AppModule(foreground_app), windowHandle=1, processID=1)
+	focus = types.SimpleNamespace(current=None)
+	api = _module(
+		"api",
+		getDesktopObject=lambda: desktop,
+		getForegroundObject=lambda: foreground,
+		getFocusObject=lambda: focus.current,
+		getNavigatorObject=lambda: focus.current,
+	)
+	_module("NVDAObjects", api=api, controlTypes=sys.modules["controlTypes"], NVDAObject=object)
+	sys.modules["NVDAObjects.api"] = api
+	_module(
+		"appModuleHandler",
+		runningTable={foreground.processID: foreground.appModule},
+		getAppNameFromProcessID=lambda processID: foreground.appModule.appName,
+	)
+
+	_gui_module("globalPluginHandler", GlobalPlugin=_Base)
+	for name in ("wx", "wx.adv", "scriptHandler", "globalCommands", "eventHandler", "ui", "tones"):
+		_gui_module(name, Dialog=_Base)
+	for name in ("textInfos", "queueHandler", "winUser", "inputCore"):
+		_gui_module(name)
+	_gui_module("core", callLater=lambda delay, callable, *args, **kwargs: callable(*args, **kwargs))
+	settings_dialogs = _gui_module(
+		"gui.settingsDialogs",
+		SettingsPanel=_Base,
+		NVDASettingsDialog=types.SimpleNamespace(categoryClasses=[]),
+	)
+	_gui_module("gui", settingsDialogs=settings_dialogs)
+
+	if ADDON_DIR not in sys.path:
+		sys.path.insert(0, ADDON_DIR)
+	return types.SimpleNamespace(
+		config_path=config_path,
+		conf=conf,
+		synth=synth,
+		say_all=say_all,
+		desktop=desktop,
+		foreground=foreground,
+		focus=focus,
+		wave_player=NullWavePlayer,
+	)
+
+
+def use_stand_in_steam_audio(delay=0.0, native_render=False, contexts=False, dsp=True):
+	"""Make the add-on's shared SteamAudio instance drive a StandInSteamAudioDLL."""
+	from globalPlugins.audiothemes.unspoken import steam_audio
+
+	dll = StandInSteamAudioDLL(delay=delay, native_render=native_render, contexts=contexts, dsp=dsp)
+	steam_audio._steam_audio_instance = steam_audio.SteamAudio(dll=dll)
+	return dll
@@ -0,0 +1,95 @@
+"""
+Parallel pre-rendering benchmark
+Pre-renders the Default theme's sounds across the audio display with the stand-in DLL, once
+serialized on the global mutex as DLL builds without engine contexts do, and then on 1 to N
+threads each rendering in an engine context of its own.
+
+The stand-in's DSP holds the GIL, so by default renders only cost --render-delay, the simulated
+native work, which can overlap. --dsp adds the stand-in's DSP to it.
+
+Usage: python benchmarks/parallel_prerender.py [--threads N] [--render-delay MS] [--sounds N] [--dsp]
+"""
+
+import argparse
+import time
+
+import nvda_env
+
+
+def prerender(player, sounds, positions, threads):
+	from globalPlugins.audiothemes.unspoken.prerender import PrerenderWorker
+
+	player.render_cache.clear()
+	player.render_cache.max_bytes = 1 << 40
+	worker = PrerenderWorker(
+		player, sounds, positions, 1 << 40, player.compute_volume(), player.settings, threads=threads
+	)
+	started = time.perf_counter()
+	worker.start()
+	worker.join()
+	return worker.rendered, time.perf_counter() - started
+
+
+def run(args):
+	env = nvda_env.install()
+	env.conf["audiothemes"]["prerender"] = False
+	dll = nvda_env.use_stand_in_steam_audio(
+		delay=args.render_delay / 1000.0, native_render=True, contexts=True, dsp=args.dsp
+	)
+	import globalPlugins.audiothemes as plugin_module
+	from globalPlugins.audiothemes.unspoken import prerender as prerender_module
+	from globalPlugins.audiothemes.unspoken.steam_audio import ContextPool
+
+	# Measure rendering, not the pause the worker leaves between renders for live plays.
+	prerender_module._RENDER_INTERVAL = 0.0
+	plugin = plugin_module.GlobalPlugin()
+	plugin.handler.wait_for_startup()
+	player = plugin.handler.player
+	engine = player.steam_audio
+	sounds = list(player_sounds(plugin))[: args.sounds]
+	positions = player.prerender_positions(args.azimuth_step, args.elevation_step)
+	print(f"{len(sounds)} sounds at {len(positions)} positions, {args.render_delay:g} ms simulated per render")
+
+	pool = engine.contexts
+	engine.contexts = None
+	rendered, serial = prerender(player, sounds, positions, 1)
+	print(f"  global mutex       {serial * 1000:>8.0f} ms  {rendered / serial:>7.0f} renders/s")
+	rendered, elapsed = prerender(player, sounds, positions, args.threads)
+	print(
+		f"  global mutex, {args.threads} threads {elapsed * 1000:>5.0f} ms  {rendered / elapsed:>7.0f} renders/s"
+		f"  x{serial / elapsed:.2f}"
+	)
+	pool.close()
+	for threads in range(1, args.threads + 1):
+		engine.contexts = ContextPool(engine, threads)
+		rendered, elapsed = prerender(player, sounds, positions, threads)
+		print(
+			f"  {threads} context{'s' if threads > 1 else ' '}         {elapsed * 1000:>8.0f} ms"
+			f"  {rendered / elapsed:>7.0f} renders/s  x{serial / elapsed:.2f}"
+		)
+		engine.contexts.close()
+	print(f"  DLL calls          {dll.calls}")
+	engine.contexts = None
+	plugin.terminate()
+
+
+def player_sounds(plugin):
+	sounds = plugin.handler.active_theme.sounds
+	roles = sorted(sounds, key=lambda role: plugin.handler.role_usage[role], reverse=True)
+	return (sounds[role] for role in roles)
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument("--threads", type=int, default=4, help="most rendering threads to try")
+	parser.add_argument("--render-delay", type=float, default=2.0, help="simulated DLL cost per render, in ms")
+	parser.add_argument("--dsp", action="store_true", help="run the stand-in DLL's DSP as well")
+	parser.add_argument("--sounds", type=int, default=8, help="how many of the theme's sounds to render")
+	parser.add_argument("--azimuth-step", type=int, default=30)
+	parser.add_argument("--elevation-step", type=int, default=25)
+	args = parser.parse_args()
+	run(args)
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,330 @@
+"""
+Play path benchmark
+Drives the add-on with synthetic NVDA events on stand-in audio backends and reports throughput,
+per-call latency percentiles, allocations per play, peak RSS and output underruns.
+
+Usage: python benchmarks/play_path.py [--scenario NAME] [--events N] [--entry plugin|handler|player]
+       [--paced] [--main-stall MS]
+
+Underruns, times the output ran dry in the middle of a sound, only mean something with --paced.
+--main-stall keeps the main thread busy, holding the GIL, for MS after every event, as NVDA's
+main thread does while it handles a slow event.
+
+Each scenario runs in its own process, so peak RSS and caches are not shared between them.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import nvda_env
+import workload
+
+PERCENTILES = (50, 90, 99)
+
+
+def percentile(ordered, p):
+	"""Nearest rank percentile of an already sorted list."""
+	if not ordered:
+		return 0.0
+	return ordered[min(len(ordered) - 1, max(0, -(-p * len(ordered) // 100) - 1))]
+
+
+def peak_rss():
+	"""Peak resident set size of this process in bytes, or None if unknown."""
+	try:
+		import resource
+	except ImportError:
+		pass
+	else:
+		peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+		# Kilobytes on Linux, bytes on macOS
+		return peak if sys.platform == "darwin" else peak * 1024
+	try:
+		import ctypes
+		from ctypes import wintypes
+
+		class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+			_fields_ = [
+				("cb", wintypes.DWORD),
+				("PageFaultCount", wintypes.DWORD),
+				("PeakWorkingSetSize", ctypes.c_size_t),
+				("WorkingSetSize", ctypes.c_size_t),
+				("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+				("QuotaPagedPoolUsage", ctypes.c_size_t),
+				("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+				("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+				("PagefileUsage", ctypes.c_size_t),
+				("PeakPagefileUsage", ctypes.c_size_t),
+			]
+
+		counters = PROCESS_MEMORY_COUNTERS()
+		counters.cb = ctypes.sizeof(counters)
+		process = ctypes.windll.kernel32.GetCurrentProcess()
+		if ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+			return counters.PeakWorkingSetSize
+	except (AttributeError, OSError):
+		pass
+	return None
+
+
+def make_dispatch(plugin, entry):
+	"""Return a function delivering an Event to the add-on at the given entry point.
+
+	The plugin's event handlers start latency tracking themselves, the other entry points
+	start it here, so stage timings cover whatever part of the path is being driven.
+	"""
+	from globalPlugins.audiothemes.handler import SpecialProps
+	from globalPlugins.audiothemes.unspoken import FOCUS_GROUP, NOTIFICATION_GROUP
+	from globalPlugins.audiothemes.unspoken.latency import tracker
+
+	handler = plugin.handler
+
+	def next_handler():
+		pass
+
+	if entry == "plugin":
+
+		def dispatch(event):
+			if event.kind == "mouseMove":
+				plugin.event_mouseMove(event.obj, next_handler, 0, 0)
+			else:
+				getattr(plugin, "event_" + event.kind)(event.obj, next_handler)
+
+		return dispatch
+
+	def sound_for(event):
+		if event.kind == "show":
+			return SpecialProps.notify
+		order = plugin.getOrder(event.obj)
+		return order if order else event.obj.role
+
+	if entry == "handler":
+
+		def dispatch(event):
+			tracker.begin()
+			handler.play(event.obj, sound_for(event))
+
+		return dispatch
+
+	def dispatch(event):
+		tracker.begin()
+		sound = handler.active_theme.sounds.get(sound_for(event))
+		if sound is None:
+			return
+		if event.kind == "show":
+			handler.player.play(event.obj, sound, group=NOTIFICATION_GROUP, priority=1)
+		else:
+			handler.player.play(event.obj, sound, group=FOCUS_GROUP)
+
+	return dispatch
+
+
+def stall_main_thread(seconds):
+	"""Hold the GIL on this thread for about seconds, without letting other threads run."""
+	interval = sys.getswitchinterval()
+	sys.setswitchinterval(max(seconds, interval))
+	try:
+		end = time.perf_counter() + seconds
+		while time.perf_counter() < end:
+			pass
+	finally:
+		sys.setswitchinterval(interval)
+
+
+def drive(dispatch, events, paced, on_event=None):
+	"""Deliver events, returning the duration of every call."""
+	timings = []
+	due = time.perf_counter()
+	for event in events:
+		if paced:
+			due += event.delay
+			pause = due - time.perf_counter()
+			if pause > 0:
+				time.sleep(pause)
+		start = time.perf_counter()
+		dispatch(event)
+		timings.append(time.perf_counter() - start)
+		if on_event is not None:
+			on_event()
+	return timings
+
+
+def run_scenario(args):
+	"""Run one scenario in this process and return its results."""
+	env = nvda_env.install(theme_dir=args.theme)
+	dll = nvda_env.use_stand_in_steam_audio(delay=args.render_delay / 1000.0, native_render=args.native_render)
+	import globalPlugins.audiothemes as plugin_module
+	from globalPlugins.audiothemes.unspoken.latency import tracker
+
+	profile = workload.load_profile(args.profile)
+	events = workload.make_events(args.scenario, args.events, profile, seed=args.seed)
+	env.conf["audiothemes"]["prerender"] = False
+
+	# Timing pass
+	plugin = plugin_module.GlobalPlugin()
+	plugin.handler.wait_for_startup()
+	player = plugin.handler.player
+	tracker.enabled = args.stages
+	tracker.reset()
+	nvda_env.NullWavePlayer.reset_counters()
+	workload.BenchObject.remote_reads = 0
+	dispatch = make_dispatch(plugin, args.entry)
+	on_event = None
+	if args.main_stall:
+
+		def on_event():
+			stall_main_thread(args.main_stall / 1000.0)
+
+	started = time.perf_counter()
+	timings = drive(dispatch, events, args.paced, on_event=on_event)
+	elapsed = time.perf_counter() - started
+	player._output.flush()
+	ordered = sorted(timings)
+	result = {
+		"scenario": args.scenario,
+		"entry": args.entry,
+		"events": len(events),
+		"paced": args.paced,
+		"main_stall_ms": args.main_stall,
+		"plays_per_sec": len(events) / elapsed if elapsed else 0.0,
+		"mean_ms": sum(timings) / len(timings) * 1000 if timings else 0.0,
+		"max_ms": ordered[-1] * 1000 if ordered else 0.0,
+		"dll_calls": dll.calls,
+		"remote_reads": workload.BenchObject.remote_reads,
+		"played": player._output.played,
+		"coalesced": player._output.coalesced,
+		"dropped": player._output.dropped + player._output.mixer.dropped,
+		"preempted": player._output.mixer.preempted,
+		"underruns": player._output.underruns,
+		"underrun_ms": player._output.underrun_time * 1000,
+		"stream_lead_ms": player._output.lead * 1000,
+		"cache": player.render_cache.stats(),
+		"scheduler": plugin.handler.scheduler.stats(),
+	}
+	for p in PERCENTILES:
+		result[f"p{p}_ms"] = percentile(ordered, p) * 1000
+	if args.stages:
+		result["stages"] = tracker.summary()
+	tracker.enabled = False
+	plugin.terminate()
+
+	# Allocation pass, on a fresh plugin so the caches start cold again
+	plugin = plugin_module.GlobalPlugin()
+	plugin.handler.wait_for_startup()
+	dispatch = make_dispatch(plugin, args.entry)
+	tracemalloc.start()
+	peaks = []
+
+	def measure_peak():
+		current, peak = tracemalloc.get_traced_memory()
+		peaks.append(peak - before[0])
+		tracemalloc.reset_peak()
+		before[0] = current
+
+	before = [tracemalloc.get_traced_memory()[0]]
+	start_snapshot = tracemalloc.take_snapshot()
+	drive(dispatch, events, args.paced, on_event=measure_peak)
+	plugin.handler.player._output.flush()
+	end_snapshot = tracemalloc.take_snapshot()
+	tracemalloc.stop()
+	retained = end_snapshot.compare_to(start_snapshot, "filename")
+	result["alloc_peak_bytes_per_play"] = sum(peaks) / len(peaks) if peaks else 0.0
+	result["retained_bytes_per_play"] = sum(stat.size_diff for stat in retained) / len(events)
+	result["retained_blocks_per_play"] = sum(stat.count_diff for stat in retained) / len(events)
+	plugin.terminate()
+	result["peak_rss"] = peak_rss()
+	return result
+
+
+def format_result(result):
+	lines = [
+		f"{result['scenario']} ({result['entry']}, {result['events']} events"
+		+ (", paced" if result["paced"] else "")
+		+ (f", main thread stalled {result['main_stall_ms']:g} ms per event" if result["main_stall_ms"] else "")
+		+ ")",
+		f"  throughput      {result['plays_per_sec']:>12.0f} plays/s",
+		"  latency ms      "
+		+ "  ".join(f"p{p} {result[f'p{p}_ms']:.3f}" for p in PERCENTILES)
+		+ f"  mean {result['mean_ms']:.3f}  max {result['max_ms']:.3f}",
+		f"  alloc/play      peak {result['alloc_peak_bytes_per_play']:.0f} B"
+		f"  retained {result['retained_bytes_per_play']:.0f} B in {result['retained_blocks_per_play']:.1f} blocks",
+		f"  scheduler       played {result['scheduler']['played']}  coalesced {result['scheduler']['coalesced']}"
+		f"  dropped {result['scheduler']['dropped']}",
+		f"  output          played {result['played']}  coalesced {result['coalesced']}"
+		f"  preempted {result['preempted']}  dropped {result['dropped']}",
+		f"  underruns       {result['underruns']}, {result['underrun_ms']:.1f} ms of silence"
+		f"  lead now {result['stream_lead_ms']:.0f} ms",
+		f"  render cache    hit rate {result['cache']['hit_rate']:.2f}  entries {result['cache']['entries']}"
+		f"  DLL calls {result['dll_calls']}",
+		f"  object reads    {result['remote_reads']} of states, parent and siblings",
+	]
+	if result["peak_rss"] is not None:
+		lines.append(f"  peak RSS        {result['peak_rss'] / 1048576:.1f} MB")
+	for stage, stats in result.get("stages", {}).items():
+		lines.append(
+			f"  stage {stage:<12}"
+			+ "  ".join(f"p{p} {stats[f'p{p}'] * 1000:.3f}" for p in (50, 95, 99) if f"p{p}" in stats)
+		)
+	return "\n".join(lines)
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument("--scenario", choices=sorted(workload.SCENARIOS), action="append")
+	parser.add_argument("--events", type=int, default=2000, help="events per scenario")
+	parser.add_argument(
+		"--entry",
+		choices=("plugin", "handler", "player"),
+		default="plugin",
+		help="deliver events to the plugin's event handlers, AudioThemesHandler.play or UnspokenPlayer.play",
+	)
+	parser.add_argument("--paced", action="store_true", help="deliver events at the scenario's real rate")
+	parser.add_argument(
+		"--main-stall", type=float, default=0.0, help="hold the GIL on the main thread this long after each event, in ms"
+	)
+	parser.add_argument("--profile", default=workload.DEFAULT_PROFILE, help="role and location distribution")
+	parser.add_argument("--seed", type=int, default=0)
+	parser.add_argument("--theme", default=nvda_env.DEFAULT_THEME_DIR, help="audio theme directory to play")
+	parser.add_argument("--render-delay", type=float, default=0.0, help="simulated DLL cost per call, in ms")
+	parser.add_argument("--native-render", action="store_true", help="give the stand-in DLL render_sound")
+	parser.add_argument("--stages", action="store_true", help="also report per-stage latency")
+	parser.add_argument("--json", help="write the results to this file")
+	parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+	args = parser.parse_args()
+
+	if args.child:
+		args.scenario = args.scenario[0]
+		json.dump(run_scenario(args), sys.stdout)
+		return
+
+	results = []
+	for scenario in args.scenario or sorted(workload.SCENARIOS):
+		output = subprocess.run(
+			_child_command(args, scenario), check=True, stdout=subprocess.PIPE, text=True
+		).stdout
+		result = json.loads(output)
+		results.append(result)
+		print(format_result(result))
+	if args.json:
+		with open(args.json, "w", encoding="utf8") as f:
+			json.dump(results, f, indent="\t")
+
+
+def _child_command(args, scenario):
+	command = [sys.executable, os.path.abspath(__file__), "--child", "--scenario", scenario]
+	command += ["--events", str(args.events), "--entry", args.entry, "--profile", args.profile]
+	command += ["--seed", str(args.seed), "--render-delay", str(args.render_delay), "--theme", args.theme]
+	command += ["--main-stall", str(args.main_stall)]
+	for flag in ("paced", "native_render", "stages"):
+		if getattr(args, flag):
+			command.append("--" + flag.replace("_", "-"))
+	return command
+
+
+if __name__ == "__main__":
+	main()
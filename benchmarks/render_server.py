@@ -0,0 +1,145 @@
+"""
+Render server benchmark
+Measures how long NVDA's main thread is held up while sounds are pre-rendered in the background,
+with Steam Audio in the process and in the render server, and the latency of plays that miss
+the render cache in both cases. Both use the stand-in DLL, whose DSP holds the GIL like the
+add-on's Python sample loops. Then it freezes the server and checks that plays give up on it
+after the request timeout and render in NVDA's process from then on.
+
+Usage: python benchmarks/render_server.py [--ticks N] [--plays N] [--render-delay MS]
+"""
+
+import argparse
+import os
+import signal
+import sys
+import time
+
+import nvda_env
+import workload
+
+# Python work per main thread tick, standing in for handling an NVDA event
+TICK_WORK = 20000
+
+
+def percentiles(values):
+	ordered = sorted(values)
+	return {p: ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] for p in (50, 99)} | {
+		"max": ordered[-1]
+	}
+
+
+def main_thread_ticks(count):
+	"""Time count bits of pure Python work, as the main thread would handle events."""
+	durations = []
+	for _ in range(count):
+		started = time.perf_counter()
+		total = 0
+		for value in range(TICK_WORK):
+			total += value
+		durations.append(time.perf_counter() - started)
+		time.sleep(0.001)
+	return durations
+
+
+def measure(label, player, sounds, positions, args):
+	from globalPlugins.audiothemes.unspoken import prerender
+
+	player.render_cache.clear()
+	player.render_cache.max_bytes = 1 << 40
+	worker = prerender.PrerenderWorker(
+		player, sounds, positions, 1 << 40, player.compute_volume(), player.settings, threads=1
+	)
+	worker.start()
+	ticks = percentiles(main_thread_ticks(args.ticks))
+	worker.stop()
+	worker.join()
+	rendered = worker.rendered
+
+	plays = []
+	obj = workload.BenchObject(nvda_env.ROLES["ROLE_BUTTON"], "OK", (400, 300, 80, 30))
+	for index in range(args.plays):
+		player.render_cache.clear()
+		started = time.perf_counter()
+		player.play(obj, sounds[index % len(sounds)])
+		plays.append(time.perf_counter() - started)
+	player._output.flush()
+	plays = percentiles(plays)
+	print(label)
+	print(
+		f"  main thread tick   p50 {ticks[50] * 1000:.2f}  p99 {ticks[99] * 1000:.2f}  max {ticks['max'] * 1000:.2f} ms"
+		f"  ({rendered} background renders)"
+	)
+	print(f"  uncached play      p50 {plays[50] * 1000:.2f}  p99 {plays[99] * 1000:.2f}  max {plays['max'] * 1000:.2f} ms")
+
+
+def measure_hung_server(player, sounds):
+	"""Freeze the server, or kill it where processes can not be frozen, and time the plays after that."""
+	from globalPlugins.audiothemes.unspoken.render_server import REQUEST_TIMEOUT
+
+	client = player.steam_audio
+	if hasattr(signal, "SIGSTOP"):
+		label = "Frozen render server"
+		client.process.send_signal(signal.SIGSTOP)
+	else:
+		label = "Killed render server"
+		client.process.kill()
+	obj = workload.BenchObject(nvda_env.ROLES["ROLE_BUTTON"], "OK", (400, 300, 80, 30))
+	plays = []
+	for sound in sounds[:5]:
+		player.render_cache.clear()
+		started = time.perf_counter()
+		player.play(obj, sound)
+		plays.append(time.perf_counter() - started)
+		if not len(player.render_cache):
+			raise SystemExit(f"FAIL: {label.lower()}: a play rendered nothing")
+	player._output.flush()
+	print(label)
+	print(f"  first play         {plays[0] * 1000:.2f} ms, request timeout {REQUEST_TIMEOUT * 1000:.0f} ms")
+	print(f"  later plays        max {max(plays[1:]) * 1000:.2f} ms, rendered in NVDA's process")
+	if max(plays) > REQUEST_TIMEOUT + 1.0 or client.initialized:
+		raise SystemExit(f"FAIL: {label.lower()}: plays did not fall back to rendering in NVDA")
+
+
+def run(args):
+	os.environ["AUDIOTHEMES_RENDER_DELAY"] = str(args.render_delay / 1000.0)
+	env = nvda_env.install()
+	env.conf["audiothemes"]["prerender"] = False
+	nvda_env.use_stand_in_steam_audio(delay=args.render_delay / 1000.0, native_render=True)
+	import globalPlugins.audiothemes as plugin_module
+	from globalPlugins.audiothemes.unspoken.render_server import RenderServerClient
+
+	plugin = plugin_module.GlobalPlugin()
+	plugin.handler.wait_for_startup()
+	player = plugin.handler.player
+	sounds = list(plugin.handler.active_theme.sounds.values())
+	positions = player.prerender_positions(15, 10)
+	# Keep the play path off the streaming path, so both measure one full render.
+	player.stream_rendering = False
+	measure("Steam Audio in NVDA's process", player, sounds, positions, args)
+
+	in_process = player.steam_audio
+	script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "stand_in_render_server.py")
+	player.steam_audio = RenderServerClient.start(sys.executable, script=script)
+	player._update_reverb_settings()
+	try:
+		measure("Render server", player, sounds, positions, args)
+		print(f"  requests           {player.steam_audio.requests}")
+		measure_hung_server(player, sounds)
+	finally:
+		player.steam_audio.cleanup()
+		player.steam_audio = in_process
+	plugin.terminate()
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument("--ticks", type=int, default=300, help="main thread ticks to time")
+	parser.add_argument("--plays", type=int, default=50, help="uncached plays to time")
+	parser.add_argument("--render-delay", type=float, default=0.0, help="simulated DLL cost per call, in ms")
+	args = parser.parse_args()
+	run(args)
+
+
+if __name__ == "__main__":
+	main()
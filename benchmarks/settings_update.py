@@ -0,0 +1,129 @@
+"""
+Settings update check
+Changes the five reverb parameters on the player one by one and inside batch_update, and counts
+Steam Audio reverb reconfigurations and render cache invalidations. Then checks that a batch
+ending where it started changes nothing, and that a batch that raises discards its changes.
+Last, changes them in the configuration and has the add-on's handler configure the player, as
+it does after a profile switch.
+
+Usage: python benchmarks/settings_update.py
+"""
+
+import argparse
+
+import nvda_env
+
+CHANGES = {"room_size": 20, "damping": 80, "wet_level": 12, "dry_level": 40, "width": 90}
+# The configuration keys of CHANGES, in config.conf["unspoken"]
+CONFIG_KEYS = {
+	"room_size": "RoomSize",
+	"damping": "Damping",
+	"wet_level": "WetLevel",
+	"dry_level": "DryLevel",
+	"width": "Width",
+}
+
+
+class Counter:
+	"""Counts the calls to a method of an object, still calling it."""
+
+	def __init__(self, obj, name):
+		self.calls = 0
+		original = getattr(obj, name)
+
+		def counted(*args, **kwargs):
+			self.calls += 1
+			return original(*args, **kwargs)
+
+		setattr(obj, name, counted)
+
+
+def run(args):
+	env = nvda_env.install()
+	env.conf["audiothemes"]["prerender"] = False
+	nvda_env.use_stand_in_steam_audio()
+	import globalPlugins.audiothemes as plugin_module
+
+	plugin = plugin_module.GlobalPlugin()
+	plugin.handler.wait_for_startup()
+	player = plugin.handler.player
+	original = player.settings
+	reverb = Counter(player, "_update_reverb_settings")
+	invalidations = Counter(player.render_cache, "invalidate")
+	failed = []
+
+	def report(label, reconfigurations, invalidated, expected):
+		print(f"  {label:<34} reverb reconfigured {reconfigurations}, render cache invalidated {invalidated}")
+		if reconfigurations != expected[0] or expected[1] not in (None, invalidated):
+			failed.append(label)
+
+	def measure(label, expected, change):
+		reverb.calls = invalidations.calls = 0
+		change()
+		report(label, reverb.calls, invalidations.calls, expected)
+		player.apply_settings(original)
+
+	def one_by_one():
+		for name, value in CHANGES.items():
+			player.update(**{name: value})
+
+	def batched():
+		with player.batch_update():
+			for name, value in CHANGES.items():
+				player.update(**{name: value})
+
+	def nested():
+		with player.batch_update():
+			player.update(room_size=CHANGES["room_size"])
+			with player.batch_update():
+				player.update(damping=CHANGES["damping"])
+
+	def round_trip():
+		with player.batch_update():
+			player.update(room_size=CHANGES["room_size"])
+			player.update(room_size=original.room_size)
+
+	def raising():
+		try:
+			with player.batch_update():
+				player.update(**CHANGES)
+				raise RuntimeError("Raised inside batch_update")
+		except RuntimeError:
+			pass
+		if player.settings is not original or player._pending_settings is not None:
+			failed.append("batch that raised")
+
+	print("Changing the five reverb parameters")
+	measure("one by one", (5, 5), one_by_one)
+	measure("in batch_update", (1, 1), batched)
+	measure("in nested batch_update blocks", (1, 1), nested)
+	measure("in a batch ending where it started", (0, 0), round_trip)
+	measure("in a batch that raises", (0, 0), raising)
+
+	def configured(handler):
+		reverb.calls = invalidations.calls = 0
+		handler.configure()
+		return reverb.calls, invalidations.calls
+
+	unspoken_config = env.conf["unspoken"]
+	for name, value in CHANGES.items():
+		unspoken_config[CONFIG_KEYS[name]] = value
+	# configure also invalidates the renders of the theme sounds it reloads.
+	report("by configure", *configured(plugin.handler), (1, None))
+	report("by configure, nothing changed", *configured(plugin.handler), (0, None))
+	plugin.terminate()
+	if failed:
+		print("FAIL: " + ", ".join(failed))
+		return 1
+	print("OK")
+	return 0
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	args = parser.parse_args()
+	raise SystemExit(run(args))
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,73 @@
+"""
+Speech properties hook benchmark
+Times the add-on's getPropertiesSpeech hook, which runs for every property NVDA speaks,
+against calling NVDA's function directly, and counts the SayAllHandler.isRunning calls it makes.
+Then checks that SayAllHandler is wrapped once however many players observe it, and restored
+once the last of them is gone.
+
+Usage: python benchmarks/speech_hook.py [--calls N]
+"""
+
+import argparse
+import timeit
+
+import nvda_env
+
+
+def run(calls):
+	env = nvda_env.install()
+	nvda_env.use_stand_in_steam_audio()
+	import globalPlugins.audiothemes as plugin_module
+	from globalPlugins.audiothemes.unspoken.player_settings import SayAllObserver
+	from speech.sayAll import SayAllHandler
+
+	unwrapped = SayAllHandler.readText
+
+	plugin = plugin_module.GlobalPlugin()
+	plugin.handler.wait_for_startup()
+	handler = plugin.handler
+	hook = handler._hook_getSpeechTextForProperties
+	original = handler._NVDA_getSpeechTextForProperties
+	themed = nvda_env.ROLES["ROLE_BUTTON"]
+	unthemed = nvda_env.ROLES["ROLE_UNKNOWN"]
+	assert themed in handler.suppressed_roles and unthemed not in handler.suppressed_roles
+	cases = [
+		("NVDA's function, no hook", lambda: original("query", name="OK")),
+		("no role", lambda: hook("query", name="OK")),
+		("role without a sound", lambda: hook("query", role=unthemed)),
+		("role with a sound", lambda: hook("query", role=themed)),
+	]
+	print(f"{calls} calls each")
+	for label, call in cases:
+		env.say_all.is_running_calls = 0
+		elapsed = min(timeit.repeat(call, number=calls, repeat=5))
+		print(f"  {label:<28} {elapsed / calls * 1e9:>8.0f} ns/call  isRunning calls {env.say_all.is_running_calls}")
+	SayAllHandler.readText(None)
+	env.say_all.is_running_calls = 0
+	elapsed = min(timeit.repeat(cases[-1][1], number=calls, repeat=5))
+	print(f"  {'role with a sound, say all':<28} {elapsed / calls * 1e9:>8.0f} ns/call  isRunning calls {env.say_all.is_running_calls}")
+
+	wrapped = SayAllHandler.readText
+	observer = SayAllObserver()
+	same = SayAllHandler.readText is wrapped
+	plugin.terminate()
+	kept = SayAllHandler.readText is wrapped
+	observer.terminate()
+	restored = SayAllHandler.readText == unwrapped
+	print(
+		f"SayAllHandler hooks: shared by a second observer {same}, kept while it remains {kept},"
+		f" restored after the last {restored}"
+	)
+	if not (same and kept and restored):
+		raise SystemExit("FAIL")
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument("--calls", type=int, default=100000)
+	args = parser.parse_args()
+	run(args.calls)
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,24 @@
+"""
+Render server entry point driving the stand-in DLL, see render_server.py
+The simulated cost per call is read from the AUDIOTHEMES_RENDER_DELAY environment variable, in seconds.
+"""
+
+import os
+import sys
+import types
+
+import nvda_env
+
+
+def main():
+	package = types.ModuleType("unspoken")
+	package.__path__ = [os.path.join(nvda_env.ADDON_DIR, "globalPlugins", "audiothemes", "unspoken")]
+	sys.modules["unspoken"] = package
+	from unspoken import render_server
+
+	delay = float(os.environ.get("AUDIOTHEMES_RENDER_DELAY", "0"))
+	render_server.main(dll=nvda_env.StandInSteamAudioDLL(delay=delay, native_render=True))
+
+
+if __name__ == "__main__":
+	main()
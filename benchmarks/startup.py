@@ -0,0 +1,109 @@
+"""
+Startup benchmark
+Times how long constructing the global plugin holds NVDA up, how long until it is ready to play,
+and the startup phases the add-on logs. A play requested during startup is held by the
+startup gate, and made once the add-on is ready with the queue policy.
+
+Calls the add-on leaves to NVDA's main thread with core.callLater are run on this thread once
+the startup thread is done, as NVDA would, and the benchmark fails if the startup thread reads
+or writes the configuration or its spec. With --prerender, the configure phase includes starting
+the pre-rendering worker, which should leave decoding the theme to the worker's threads.
+
+Usage: python benchmarks/startup.py [--eager] [--prerender] [--policy queue|drop] [--render-delay MS]
+"""
+
+import argparse
+import threading
+import time
+
+import nvda_env
+import workload
+
+
+def run(args):
+	env = nvda_env.install()
+	env.conf["audiothemes"]["prerender"] = args.prerender
+	env.conf["audiothemes"]["startup_plays"] = args.policy
+	if args.eager:
+		# Decode the whole theme while starting, as before sounds were decoded on first use
+		env.conf["audiothemes"]["lazy_sounds"] = False
+		env.conf["audiothemes"]["pcm_cache_size"] = 0
+	nvda_env.use_stand_in_steam_audio(delay=args.render_delay / 1000.0)
+	import core
+	import globalPlugins.audiothemes as plugin_module
+
+	main_thread_calls = []
+	core.callLater = lambda delay, func, *args, **kwargs: main_thread_calls.append((func, args, kwargs))
+	config_access = watch_config(env.conf, "AudioThemesStartup")
+
+	started = time.perf_counter()
+	plugin = plugin_module.GlobalPlugin()
+	inline = time.perf_counter() - started
+	handler = plugin.handler
+	obj = workload.BenchObject(nvda_env.ROLES["ROLE_BUTTON"], "OK", (400, 300, 80, 30))
+	held = not handler.startup.ready
+	plugin.playObject(obj)
+	handler._startup_thread.join()
+	for func, call_args, kwargs in main_thread_calls:
+		func(*call_args, **kwargs)
+	handler.wait_for_startup()
+	ready = time.perf_counter() - started
+	timer = handler.startup_timer
+	print(f"Startup, {'eager' if args.eager else 'lazy'} theme load, {args.policy} policy")
+	print(f"  inline             {inline * 1000:>8.2f} ms")
+	print(f"  ready              {ready * 1000:>8.2f} ms")
+	for name, seconds in timer.phases:
+		print(f"    {name:<16} {seconds * 1000:>8.2f} ms")
+	if held:
+		print(f"  held play          made {handler.scheduler.played}  dropped {handler.startup.dropped}")
+	else:
+		print("  held play          none, ready before the play was requested")
+	print(f"  config accessed on the startup thread: {', '.join(sorted(config_access)) or 'never'}")
+	plugin.terminate()
+	if config_access:
+		raise SystemExit("FAIL")
+
+
+def watch_config(conf, thread_name):
+	"""Record the configuration sections and spec entries the named thread touches."""
+	accessed = set()
+
+	def note(what):
+		if threading.current_thread().name == thread_name:
+			accessed.add(what)
+
+	class WatchedSpec(dict):
+		def __getitem__(self, name):
+			note(f"spec[{name!r}]")
+			return super().__getitem__(name)
+
+		def __setitem__(self, name, value):
+			note(f"spec[{name!r}]")
+			super().__setitem__(name, value)
+
+		def __contains__(self, name):
+			note(f"spec[{name!r}]")
+			return super().__contains__(name)
+
+	class WatchedConfig(type(conf)):
+		def __getitem__(self, name):
+			note(f"conf[{name!r}]")
+			return super().__getitem__(name)
+
+	conf.spec = WatchedSpec(conf.spec)
+	conf.__class__ = WatchedConfig
+	return accessed
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument("--eager", action="store_true", help="decode the whole theme without the sound cache")
+	parser.add_argument("--prerender", action="store_true", help="pre-render the theme once ready")
+	parser.add_argument("--policy", choices=("queue", "drop"), default="queue", help="startup_plays setting")
+	parser.add_argument("--render-delay", type=float, default=0.0, help="simulated DLL cost per call, in ms")
+	args = parser.parse_args()
+	run(args)
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,97 @@
+"""
+Streamed play benchmark
+Plays the theme's long sounds uncached, one at a time and in real time, with and without stream
+rendering, and reports how long play calls take to queue audio, how long the first part took
+to render, and the output's underruns: with streaming, parts that arrived after the audio
+queued ahead of them had run out.
+
+Usage: python benchmarks/streamed_play.py [--render-delay MS] [--plays N] [--sound NAME]
+"""
+
+import argparse
+import time
+
+import nvda_env
+import workload
+
+
+def percentiles(durations):
+	ordered = sorted(durations)
+	if not ordered:
+		return {50: 0.0, 99: 0.0, "max": 0.0}
+	return {
+		50: ordered[len(ordered) // 2],
+		99: ordered[min(len(ordered) - 1, len(ordered) * 99 // 100)],
+		"max": ordered[-1],
+	}
+
+
+def measure(label, player, sounds, args, streaming):
+	from globalPlugins.audiothemes.unspoken.output import SAMPLE_RATE
+
+	player.stream_rendering = streaming
+	output = player._output
+	obj = workload.BenchObject(nvda_env.ROLES["ROLE_BUTTON"], "OK", (400, 300, 80, 30))
+	# Give the render cost estimate a render to start from, as any earlier play would.
+	player.play(obj, sounds[0])
+	output.flush()
+	time.sleep(len(sounds[0]) / SAMPLE_RATE + output.lead)
+	player.first_block_times.clear()
+	underruns = output.underruns
+	silence = output.underrun_time
+	calls = []
+	for index in range(args.plays):
+		sound = sounds[index % len(sounds)]
+		player.render_cache.clear()
+		started = time.perf_counter()
+		player.play(obj, sound)
+		calls.append(time.perf_counter() - started)
+		output.flush()
+		# Let the sound play out, so each one starts on an idle device.
+		time.sleep(max(len(sound) / SAMPLE_RATE + output.lead - (time.perf_counter() - started), 0.0))
+	calls = percentiles(calls)
+	print(label)
+	print(f"  play call          p50 {calls[50] * 1000:.2f}  p99 {calls[99] * 1000:.2f}  max {calls['max'] * 1000:.2f} ms")
+	if player.first_block_times:
+		first = percentiles(player.first_block_times)
+		print(
+			f"  first part queued  p50 {first[50] * 1000:.2f}  p99 {first[99] * 1000:.2f}  max {first['max'] * 1000:.2f} ms"
+			f"  ({len(player.first_block_times)} of {args.plays} plays streamed)"
+		)
+	print(f"  underruns          {output.underruns - underruns}, {(output.underrun_time - silence) * 1000:.1f} ms of silence")
+
+
+def run(args):
+	env = nvda_env.install()
+	env.conf["audiothemes"]["prerender"] = False
+	nvda_env.use_stand_in_steam_audio(delay=args.render_delay / 1000.0)
+	import globalPlugins.audiothemes as plugin_module
+	from globalPlugins.audiothemes.unspoken import STREAM_MIN_BLOCKS
+
+	plugin = plugin_module.GlobalPlugin()
+	plugin.handler.wait_for_startup()
+	player = plugin.handler.player
+	minimum = STREAM_MIN_BLOCKS * player.steam_audio.frame_size
+	theme = plugin.handler.active_theme.sounds
+	sounds = [theme[role] for role in theme if len(theme[role]) > minimum]
+	if args.sound:
+		sounds = [sound for sound in sounds if sound.path and args.sound in sound.path]
+	if not sounds:
+		raise SystemExit("No sound long enough to be streamed")
+	print(f"{len(sounds)} sounds longer than {minimum} samples, {args.render_delay:g} ms per DLL call")
+	measure("Rendered at once", player, sounds, args, streaming=False)
+	measure("Streamed", player, sounds, args, streaming=True)
+	plugin.terminate()
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument("--render-delay", type=float, default=30.0, help="simulated DLL cost per call, in ms")
+	parser.add_argument("--plays", type=int, default=20, help="uncached plays to time")
+	parser.add_argument("--sound", help="only play sounds whose file name contains this")
+	args = parser.parse_args()
+	run(args)
+
+
+if __name__ == "__main__":
+	main()
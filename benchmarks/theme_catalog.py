@@ -0,0 +1,110 @@
+"""
+Theme catalog benchmark
+Installs a library of copies of the Default theme and times listing the installed themes and
+looking one up, the way the settings panel and configure do, against reading every info file
+on each call as before the catalog. Then touches one theme and lists them again, which only
+reads that theme's info file, and rewrites another theme's info file in place, which must only
+invalidate that theme.
+
+Usage: python benchmarks/theme_catalog.py [--themes N] [--repeat N]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import time
+
+import nvda_env
+
+
+def uncached_themes(handler_module):
+	"""List the installed themes by reading every info file, as before the catalog."""
+	themes = []
+	for folder in os.listdir(handler_module.THEMES_DIR):
+		info_file = os.path.join(handler_module.THEMES_DIR, folder, handler_module.INFO_FILE_NAME)
+		if os.path.isfile(info_file):
+			with open(info_file, "r", encoding="utf8") as f:
+				info = json.load(f)
+			themes.append(handler_module.AudioTheme(directory=os.path.dirname(info_file), **info))
+	return themes
+
+
+def best_of(repeat, func):
+	durations = []
+	for _ in range(repeat):
+		started = time.perf_counter()
+		func()
+		durations.append(time.perf_counter() - started)
+	return min(durations)
+
+
+def run(args):
+	env = nvda_env.install()
+	env.conf["audiothemes"]["prerender"] = False
+	nvda_env.use_stand_in_steam_audio()
+	import globalPlugins.audiothemes.handler as handler_module
+
+	themes_dir = handler_module.THEMES_DIR
+	default_dir = os.path.join(themes_dir, "Default")
+	for index in range(args.themes):
+		directory = os.path.join(themes_dir, f"theme-{index:04}")
+		os.makedirs(directory, exist_ok=True)
+		for filename in os.listdir(default_dir):
+			shutil.copy(os.path.join(default_dir, filename), directory)
+		handler_module.AudioThemesHandler.write_info_file(
+			os.path.join(directory, handler_module.INFO_FILE_NAME),
+			{"name": f"Theme {index}", "author": "Benchmark", "summary": "Copy of the Default theme"},
+		)
+	Handler = handler_module.AudioThemesHandler
+	catalog = handler_module.theme_catalog
+	catalog.invalidate()
+
+	def list_themes():
+		return sorted(Handler.get_installed_themes())
+
+	count = len(uncached_themes(handler_module))
+	print(f"{count} installed themes")
+	uncached = best_of(args.repeat, lambda: uncached_themes(handler_module))
+	print(f"  list, reading every info file  {uncached * 1000:>8.2f} ms")
+	started = time.perf_counter()
+	list_themes()
+	cold = time.perf_counter() - started
+	print(f"  list, catalog cold             {cold * 1000:>8.2f} ms")
+	parses = catalog.parses
+	warm = best_of(args.repeat, list_themes)
+	print(f"  list, catalog warm             {warm * 1000:>8.2f} ms  x{uncached / warm:.1f}  info files read {catalog.parses - parses}")
+	lookup = best_of(args.repeat, lambda: Handler.get_theme_from_folder("theme-0000"))
+	print(f"  look up one theme              {lookup * 1e6:>8.1f} us")
+
+	# Adding a file changes the theme folder's modification time.
+	with open(os.path.join(themes_dir, "theme-0000", "notes.txt"), "w") as f:
+		f.write("touched")
+	parses = catalog.parses
+	started = time.perf_counter()
+	list_themes()
+	touched = time.perf_counter() - started
+	print(f"  list after touching one theme  {touched * 1000:>8.2f} ms  info files read {catalog.parses - parses}")
+
+	# Rewriting an info file in place leaves the folder's modification time as it was.
+	Handler.write_info_file(
+		os.path.join(themes_dir, "theme-0001", handler_module.INFO_FILE_NAME),
+		{"name": "Renamed theme", "author": "Benchmark", "summary": "Copy of the Default theme"},
+	)
+	parses = catalog.parses
+	renamed = [theme.name for theme in list_themes() if theme.folder == "theme-0001"]
+	print(f"  list after rewriting one info file  info files read {catalog.parses - parses}  name {renamed}")
+	if catalog.parses - parses != 1 or renamed != ["Renamed theme"]:
+		raise SystemExit("FAIL")
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument("--themes", type=int, default=300, help="copies of the Default theme to install")
+	parser.add_argument("--repeat", type=int, default=5, help="calls to take the fastest of")
+	args = parser.parse_args()
+	run(args)
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,96 @@
+"""
+Theme load benchmark
+Times loading the Default theme by decoding its wave files, then through the decoded sound
+cache: once filling it, and then from the memory-mapped entries. Then loads it lazily, which only
+indexes the files, and times the first play of each sound, which decodes it. Last, renders
+every sound within a memory budget that holds the samples but not all of the scaled copies
+renders keep, and checks that the sound bank counts those copies and stays within it.
+
+Usage: python benchmarks/theme_load.py [--repeat N]
+"""
+
+import argparse
+import time
+
+import nvda_env
+
+
+def time_loads(handler, repeat, lazy=False):
+	theme = handler.get_theme_from_folder("Default")
+	durations = []
+	for _ in range(repeat):
+		theme.unload()
+		started = time.perf_counter()
+		theme.load(handler.player, lazy=lazy)
+		durations.append(time.perf_counter() - started)
+	return min(durations), theme
+
+
+def first_hits(theme):
+	"""Look up every sound of a lazily loaded theme, returning the first-hit decode times."""
+	for role in theme.sounds:
+		theme.sounds.get(role)
+	return sorted(theme.sounds.decode_times.values())
+
+
+def run(repeat):
+	env = nvda_env.install()
+	env.conf["audiothemes"]["prerender"] = False
+	nvda_env.use_stand_in_steam_audio()
+	import globalPlugins.audiothemes as plugin_module
+
+	plugin = plugin_module.GlobalPlugin()
+	plugin.handler.wait_for_startup()
+	handler = plugin.handler
+	cache = handler.pcm_cache
+	cache.clear()
+
+	handler.player.pcm_cache = None
+	decoded, theme = time_loads(handler, repeat)
+	nbytes = sum(sound.nbytes for sound in theme.sounds.loaded())
+	print(f"Default theme, {len(theme.sounds)} sounds, {nbytes / 1024:.0f} KB of samples")
+	print(f"  decoding           {decoded * 1000:>8.2f} ms")
+	handler.player.pcm_cache = cache
+	cache.clear()
+	cold, _ = time_loads(handler, 1)
+	print(f"  filling the cache  {cold * 1000:>8.2f} ms")
+	warm, _ = time_loads(handler, repeat)
+	print(f"  memory-mapped      {warm * 1000:>8.2f} ms  x{decoded / warm:.1f}")
+	print(f"  cache              {cache.hits} hits  {cache.misses} misses")
+
+	for label, pcm_cache in (("decoding", None), ("memory-mapped", cache)):
+		handler.player.pcm_cache = pcm_cache
+		indexed, theme = time_loads(handler, repeat, lazy=True)
+		hits = first_hits(theme)
+		print(f"Lazy load, {label}")
+		print(f"  indexing           {indexed * 1000:>8.2f} ms  x{decoded / indexed:.1f}")
+		print(
+			f"  first play         p50 {hits[len(hits) // 2] * 1000:.3f}  max {hits[-1] * 1000:.3f} ms"
+			f"  total {sum(hits) * 1000:.2f} ms"
+		)
+
+	handler.player.pcm_cache = None
+	theme.unload()
+	theme.load(handler.player, lazy=True, max_bytes=nbytes * 3 // 2)
+	sounds = theme.sounds
+	for role in sounds:
+		sound = sounds[role]
+		# The stand-in DLL has no render_sound, so this keeps a scaled copy of the samples.
+		handler.player.steam_audio.render(sound, 0.5, 0, 0)
+	actual = sum(sound.nbytes for sound in sounds.loaded())
+	print(f"Rendering every sound within {sounds.max_bytes / 1024:.0f} KB")
+	print(f"  counted {sounds.nbytes / 1024:.0f} KB  held {actual / 1024:.0f} KB  evictions {sounds.evictions}")
+	plugin.terminate()
+	if sounds.nbytes != actual or actual > sounds.max_bytes:
+		raise SystemExit("FAIL")
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument("--repeat", type=int, default=5, help="loads to take the fastest of")
+	args = parser.parse_args()
+	run(args.repeat)
+
+
+if __name__ == "__main__":
+	main()
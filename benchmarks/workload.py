@@ -0,0 +1,168 @@
+"""
+Synthetic NVDA objects and event scenarios for the play path benchmarks
+"""
+
+import json
+import os
+import random
+from collections import namedtuple
+
+from nvda_env import ROLES, SCREEN_SIZE
+
+DEFAULT_PROFILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "profiles", "desktop.json")
+
+# kind is the NVDA event ("gainFocus", "becomeNavigatorObject", "mouseMove" or "show"),
+# delay the time since the previous event
+Event = namedtuple("Event", "kind obj delay")
+
+
+class BenchObject:
+	"""A synthetic NVDAObject with the attributes the add-on reads.
+
+	Reads of states, parent, previous and next, which cost cross-process calls in NVDA, are
+	counted in remote_reads across all instances.
+	"""
+
+	treeInterceptor = None
+	remote_reads = 0
+
+	def __init__(self, role, name, location, states=(), parent=None, windowHandle=1, processID=1):
+		self.role = role
+		self.name = name
+		self.location = location
+		self._states = set(states)
+		self._parent = parent
+		self._previous = None
+		self._next = None
+		self.windowHandle = windowHandle
+		self.processID = processID
+
+	def _remote(name):
+		def get(self):
+			BenchObject.remote_reads += 1
+			return getattr(self, name)
+
+		def set(self, value):
+			setattr(self, name, value)
+
+		return property(get, set)
+
+	states = _remote("_states")
+	parent = _remote("_parent")
+	previous = _remote("_previous")
+	next = _remote("_next")
+	del _remote
+
+	def __repr__(self):
+		return f"<BenchObject {self.name!r} role={self.role}>"
+
+
+def role_value(name):
+	return ROLES["ROLE_" + name.upper()]
+
+
+def load_profile(path=DEFAULT_PROFILE):
+	"""Load a role and location distribution, see profiles/desktop.json for the format."""
+	with open(path, encoding="utf8") as f:
+		profile = json.load(f)
+	for entry in profile["objects"]:
+		entry["role"] = role_value(entry["role"])
+		entry["location"] = tuple(entry["location"])
+	return profile
+
+
+def _list_item(parent, index, count, rect):
+	x, y, width, height = rect
+	item = BenchObject(role_value("listitem"), f"Item {index}", (x, y + index * height, width, height), parent=parent)
+	# Only the neighbours' roles are read, to find the first and last items.
+	if index > 0:
+		item.previous = BenchObject(role_value("listitem"), f"Item {index - 1}", None, parent=parent)
+	if index < count - 1:
+		item.next = BenchObject(role_value("listitem"), f"Item {index + 1}", None, parent=parent)
+	return item
+
+
+def burst_arrowing(profile, count, rng, items=40, interval=1 / 30):
+	"""Holding the arrow keys down in a list, at keyboard repeat rate, down and back up.
+
+	As in NVDA, every focus change also makes the item the navigator object.
+	"""
+	rect = (240, 160, 720, 22)
+	parent = BenchObject(role_value("list"), "Files", (240, 160, 720, items * 22))
+	events = []
+	index, step = 0, 1
+	while len(events) < count:
+		item = _list_item(parent, index, items, rect)
+		events.append(Event("gainFocus", item, interval))
+		events.append(Event("becomeNavigatorObject", item, 0.0))
+		if not 0 <= index + step < items:
+			step = -step
+		index += step
+	return events[:count]
+
+
+def mouse_sweep(profile, count, rng, step=8, interval=1 / 125):
+	"""Sweeping the mouse across the screen over the profile's objects, row by row."""
+	objects = [
+		BenchObject(entry["role"], f"Object {index}", entry["location"])
+		for index, entry in enumerate(profile["objects"])
+	]
+	width, height = profile.get("screen", SCREEN_SIZE)
+	events = []
+	x, y, direction = 0, 0, step
+	while len(events) < count:
+		hit = None
+		for obj in objects:
+			left, top, obj_width, obj_height = obj.location
+			if left <= x < left + obj_width and top <= y < top + obj_height:
+				hit = obj
+				break
+		if hit is not None:
+			events.append(Event("mouseMove", hit, interval))
+		x += direction
+		if not 0 <= x < width:
+			direction = -direction
+			x += direction
+			y = (y + 3 * step) % height
+	return events
+
+
+def notification_storm(profile, count, rng, interval=0.005, focus_every=6):
+	"""A burst of toasts and help balloons, interleaved with focus changes."""
+	focus = [entry for entry in profile["objects"] if entry["role"] != role_value("helpballoon")]
+	events = []
+	for index in range(count):
+		if index % focus_every == 0:
+			entry = rng.choice(focus)
+			obj = BenchObject(entry["role"], f"Focus {index}", entry["location"])
+			events.append(Event("gainFocus", obj, interval))
+			continue
+		obj = BenchObject(role_value("helpballoon"), f"Notification {index}", (1500, 900, 400, 120))
+		events.append(Event("show", obj, interval))
+		# Toasts are often shown twice in a row.
+		if index % 2:
+			events.append(Event("show", obj, 0.0))
+	return events[:count]
+
+
+def profile_mix(profile, count, rng, interval=0.05):
+	"""Focus changes drawn from the profile's role and location distribution."""
+	entries = profile["objects"]
+	weights = [entry["count"] for entry in entries]
+	events = []
+	for index, entry in enumerate(rng.choices(entries, weights, k=count)):
+		obj = BenchObject(entry["role"], f"Object {index}", entry["location"])
+		events.append(Event("gainFocus", obj, interval))
+	return events
+
+
+SCENARIOS = {
+	"burst_arrowing": burst_arrowing,
+	"mouse_sweep": mouse_sweep,
+	"notification_storm": notification_storm,
+	"profile_mix": profile_mix,
+}
+
+
+def make_events(scenario, count, profile, seed=0):
+	return SCENARIOS[scenario](profile, count, random.Random(seed))